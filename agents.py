@@ -0,0 +1,125 @@
+# start of agents.py
+import logging
+
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from config import settings
+from tools.rag_tool import query_knowledge_base, query_knowledge_base_batch
+from tools.nocodb_tools import (
+    get_open_job_positions, 
+    get_job_details, 
+    get_application_status,
+    apply_for_job_position
+)
+from tools.feedback_tool import record_feedback 
+from tools.recommendation_tool import recommend_jobs
+from utils.llm_scheduler import scheduled_chat_model
+from utils.router import TIER_SMALLTALK, Route
+from utils.token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# --- THE FIX: ESCAPE CURLY BRACES IN THE PROMPT ---
+AGENT_SYSTEM_PROMPT = """
+You are a specialized AI assistant trained to provide accurate information based on a collection of internal company documents for "میهن" company. Your knowledge is strictly confined to the content within this provided knowledge base.
+You are a smart, friendly, professional, and empathetic HR assistant for our company.
+Your primary goal is to provide a seamless and helpful experience for candidates, making them feel welcomed and supported.
+
+**Your Persona:**
+- **Conversational & Natural:** Speak like a helpful colleague, not a robot. Avoid technical jargon.
+- **Proactive:** Anticipate the user's needs. If you provide job details, suggest the next logical step, like applying.
+- **Knowledgeable:** Use the knowledge base to answer questions about company culture, benefits, and processes.
+
+**Core Instructions:**
+1.  **You know the user:** You are speaking to an authenticated user. You already know who they are. **Never ask for their name, phone number, or ID.** Act as if you have their file right in front of you. Do not mention their internal ID number or phone number in your responses.
+2.  **Be User-Friendly:** Always communicate in a clear and human-readable way. When you use a tool and get information back, summarize it and present it beautifully using Markdown. **Never show raw data like JSON to the user.**
+3.  **Know your capabilities:** You can help users by:
+    - Finding open job positions.
+    - Providing detailed information about a specific job.
+    - Recommending the open jobs that best match their expertise and work experience.
+    - Applying for a job on their behalf when they ask.
+    - Checking their application status.
+    - Answering general questions about the company.
+
+**Boundaries and Limitations (Very Important):**
+- **Only offer actions you can actually perform.** You have tools to apply for jobs and check status. You DO NOT have tools for other tasks like applying for leave, changing personal data, etc.
+- **If asked to do something you cannot do,** you must state your limitation clearly and politely, then guide the user to the correct process. For example: "من نمی‌توانم درخواست مرخصی را ثبت کنم، اما طبق اطلاعات من، شما باید برای این کار با واحد منابع انسانی به طور مستقیم در تماس باشید." (I cannot register a leave request, but according to my information, you should contact the HR department directly for this.)
+"""
+
+SMALLTALK_SYSTEM_PROMPT = """
+You are the friendly HR assistant of "میهن" company, talking with an authenticated job candidate.
+The user is making small talk (a greeting, thanks or goodbye). Reply in one or two warm sentences in the
+user's language. If it fits, mention that you can show open positions, recommend suitable jobs, apply on their
+behalf, check their application status and answer questions about the company.
+"""
+
+ALL_TOOLS = [
+    query_knowledge_base, 
+    query_knowledge_base_batch,
+    get_open_job_positions, 
+    get_job_details,
+    recommend_jobs,
+    get_application_status, 
+    record_feedback,
+    apply_for_job_position
+]
+_TOOLS_BY_NAME = {t.name: t for t in ALL_TOOLS}
+
+def tools_for_route(route: Route) -> list:
+    """The tools bound for a route: the route's own tools, or all of them for the full agent."""
+    if route.tier == TIER_SMALLTALK:
+        return []
+    if route.tools:
+        return [_TOOLS_BY_NAME[name] for name in route.tools]
+    return list(ALL_TOOLS)
+
+def tool_schema_tokens(tools: list) -> int:
+    """Approximate prompt tokens spent on the tool definitions sent with every LLM call."""
+    return sum(count_tokens(str(convert_to_openai_tool(t))) for t in tools)
+
+def create_hr_agent(tools: list = None, llm=None):
+    tools = list(ALL_TOOLS) if tools is None else tools
+    llm = llm or scheduled_chat_model(settings.OPENAI_API_MODEL, temperature=0.1)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", AGENT_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    # Full prompts are logged only for a sample of turns (utils/tracing.py::AgentTraceLogger).
+    return AgentExecutor(agent=agent, tools=tools, verbose=False, handle_parsing_errors=True)
+
+class SmallTalkResponder:
+    """
+    Answers small talk with the minimal prompt and no tools. Streams like an AgentExecutor
+    (dicts with an "output" key), so callers can treat both the same way.
+    """
+
+    def __init__(self, llm=None):
+        self.llm = llm or scheduled_chat_model(settings.OPENAI_API_MODEL, temperature=0.3)
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SMALLTALK_SYSTEM_PROMPT),
+            ("human", "{input}"),
+        ])
+        self.chain = self.prompt | self.llm
+
+    async def astream(self, inputs: dict, config: dict | None = None):
+        async for chunk in self.chain.astream({"input": inputs["input"]}, config=config):
+            if chunk.content:
+                yield {"output": chunk.content}
+
+def create_executor(route: Route, llm=None):
+    """Builds the executor for a routing tier (see utils/router.py)."""
+    if route.tier == TIER_SMALLTALK:
+        return SmallTalkResponder(llm)
+    return create_hr_agent(tools_for_route(route), llm)
+
+def prompt_overhead_tokens(route: Route) -> int:
+    """Tokens of system prompt and tool definitions a route sends with every LLM call."""
+    if route.tier == TIER_SMALLTALK:
+        return count_tokens(SMALLTALK_SYSTEM_PROMPT)
+    return count_tokens(AGENT_SYSTEM_PROMPT) + tool_schema_tokens(tools_for_route(route))
+# end of agents.py
@@ -1,87 +1,128 @@
 # start of app.py
 import chainlit as cl
+import asyncio
 import json
 import logging
-import os
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferWindowMemory
+import time
+import uuid
 
 from config import settings
-from config.logging_config import setup_logging
-from ingest import ingest_data
-from tools.rag_tool import query_knowledge_base
-from tools.nocodb_tools import (
-    get_open_job_positions, 
-    get_job_details, 
-    get_application_status,
-    apply_for_job_position
-)
-from tools.feedback_tool import record_feedback 
+from config.logging_config import log_context, setup_logging, update_log_context
+from tools.feedback_tool import record_feedback
+from tools.rag_tool import retrieve_context
+from tools.nocodb_tools import fetch_open_jobs, fetch_job_details
 from auth_page import run_auth_and_onboarding_flow
-from ui_components import display_job_listings
+from ui_components import display_job_details, display_job_listings
+from utils import metrics, tracing, warmup
+from utils.answer_cache import depends_on_history, get_answer_cache, is_cacheable_turn
+from utils.job_index import get_job_index
+from utils.llm_scheduler import (
+    PRIORITY_ACTION,
+    PRIORITY_BACKGROUND,
+    LLMQueueFullError,
+    llm_priority
+)
+from utils.memory import TokenBudgetMemory
+from utils.router import TIER_SMALLTALK, route_message
+from utils.session_registry import SessionConflictError, get_session_registry
+from utils.speculative_retrieval import start_prefetch, finish_prefetch
+from utils.token_counter import count_tokens, count_message_tokens
+from utils.tool_budget import log_tool_output
+from utils.warm_start import KB_QUESTION_FIELD
 
 setup_logging()
+settings.validate()
 logger = logging.getLogger(__name__)
 
-vector_store_path = settings.VECTOR_STORE_PATH
-logger.info(f"Checking for vector store at path: '{vector_store_path}'")
-if not (os.path.isdir(vector_store_path) and os.listdir(vector_store_path)):
-    logger.info("Vector store path does not exist or is empty. Running ingestion process.")
-    ingest_data()
-else:
-    logger.info("Vector store directory exists and is not empty. Skipping ingestion.")
+# Ingestion (when the vector store is missing), the agent stack and the first connections
+# are loaded after the server starts listening, in the warmup (see utils/warmup.py and
+# on_app_startup below); importing this module only loads what the login flow needs.
+
+# Keeps references to fire-and-forget tasks (e.g. memory summarization) so they are not garbage collected.
+_background_tasks = set()
+
+def run_in_background(coro):
+    """Schedules a coroutine to run after the current handler without blocking the reply."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
     
-# --- THE FIX: ESCAPE CURLY BRACES IN THE PROMPT ---
-AGENT_SYSTEM_PROMPT = """
-You are a specialized AI assistant trained to provide accurate information based on a collection of internal company documents for "میهن" company. Your knowledge is strictly confined to the content within this provided knowledge base.
-You are a smart, friendly, professional, and empathetic HR assistant for our company.
-Your primary goal is to provide a seamless and helpful experience for candidates, making them feel welcomed and supported.
-
-**Your Persona:**
-- **Conversational & Natural:** Speak like a helpful colleague, not a robot. Avoid technical jargon.
-- **Proactive:** Anticipate the user's needs. If you provide job details, suggest the next logical step, like applying.
-- **Knowledgeable:** Use the knowledge base to answer questions about company culture, benefits, and processes.
-
-**Core Instructions:**
-1.  **You know the user:** You are speaking to an authenticated user. You already know who they are. **Never ask for their name, phone number, or ID.** Act as if you have their file right in front of you. Do not mention their internal ID number or phone number in your responses.
-2.  **Be User-Friendly:** Always communicate in a clear and human-readable way. When you use a tool and get information back, summarize it and present it beautifully using Markdown. **Never show raw data like JSON to the user.**
-3.  **Know your capabilities:** You can help users by:
-    - Finding open job positions.
-    - Providing detailed information about a specific job.
-    - Applying for a job on their behalf when they ask.
-    - Checking their application status.
-    - Answering general questions about the company.
-
-**Boundaries and Limitations (Very Important):**
-- **Only offer actions you can actually perform.** You have tools to apply for jobs and check status. You DO NOT have tools for other tasks like applying for leave, changing personal data, etc.
-- **If asked to do something you cannot do,** you must state your limitation clearly and politely, then guide the user to the correct process. For example: "من نمی‌توانم درخواست مرخصی را ثبت کنم، اما طبق اطلاعات من، شما باید برای این کار با واحد منابع انسانی به طور مستقیم در تماس باشید." (I cannot register a leave request, but according to my information, you should contact the HR department directly for this.)
-"""
-
-def create_hr_agent():
-    tools = [
-        query_knowledge_base, 
-        get_open_job_positions, 
-        get_job_details,
-        get_application_status, 
-        record_feedback,
-        apply_for_job_position
-    ]
-    llm = ChatOpenAI(model=settings.OPENAI_API_MODEL, temperature=0.1, api_key=settings.OPENAI_API_KEY)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", AGENT_SYSTEM_PROMPT),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    return AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+# --- Session State ---
+# Conversation state is kept in the session store (in-memory or SQLite, see
+# utils/session_store.py) under the Chainlit session id, so any worker process can
+# serve any session and a restart does not log users out. The session registry
+# (utils/session_registry.py) keeps the active sessions in memory and compacts idle
+# ones. The executors hold no per-user state and are shared by all sessions.
+
+session_registry = get_session_registry()
+answer_cache = get_answer_cache()
+
+metrics.describe("hr_onboarding_ready_seconds", "Time from successful authentication until the job list is shown.")
+_executors = {}
+# Times every model and tool call of a turn (see utils/tracing.py); shared, keyed by run id.
+_tracing_handler = tracing.TracingCallbackHandler()
+_agent_trace_logger = tracing.AgentTraceLogger()
+
+def get_agent_executor(route):
+    """Returns the shared executor for a routing tier (see utils/router.py), created on first use."""
+    from agents import create_executor
+    key = (route.tier, route.tools)
+    if key not in _executors:
+        _executors[key] = create_executor(route)
+    return _executors[key]
+
+def load_session_state() -> dict | None:
+    return session_registry.get(cl.context.session.id)
+
+def save_session_state(state: dict):
+    try:
+        session_registry.put(cl.context.session.id, state)
+    except SessionConflictError as e:
+        # Another worker served a newer turn of this session meanwhile; its state wins.
+        logger.warning(f"Session state not saved: {e}")
+
+async def summarize_and_save(session_id: str, memory: TokenBudgetMemory, version: int):
+    """Summarizes memory in the background and stores it, unless a newer turn was saved meanwhile."""
+    with llm_priority(PRIORITY_BACKGROUND):
+        await memory.asummarize()
+    state = session_registry.peek(session_id)
+    if state and state.get("version") == version:
+        state["memory"] = memory.to_dict()
+        try:
+            session_registry.put(session_id, state)
+        except SessionConflictError as e:
+            logger.info(f"Discarding background summary: {e}")
+
+async def warm_up():
+    """Prepares the worker and reports it ready (see utils/warmup.py), then embeds the open jobs."""
+    await warmup.run_warmup()
+    # Embed the open jobs before the first recommendation is requested.
+    with llm_priority(PRIORITY_BACKGROUND):
+        await asyncio.to_thread(get_job_index().ensure_fresh)
+
+@cl.on_app_startup
+async def on_app_startup():
+    metrics.start_metrics_server(settings.METRICS_PORT, settings.METRICS_HOST, settings.METRICS_PORT_ATTEMPTS)
+    session_registry.start_sweeper()
+    run_in_background(warm_up())
 
 @cl.on_chat_start
 async def start_chat():
+    existing_state = load_session_state()
+    if existing_state and existing_state.get("user_profile"):
+        # The client reconnected (e.g. after a server restart or to another worker).
+        first_name = existing_state["user_profile"].get("FirstName", "کاربر")
+        logger.info(f"Restored session state for candidate {existing_state['user_profile'].get('Id')}")
+        await cl.Message(content=f"**{first_name}** عزیز، خوش برگشتید! می‌توانید گفتگو را ادامه دهید.", author="هوشمند").send()
+        return
+
+    # Fetch the open jobs while the user is authenticating; they are shown right after.
+    jobs_task = asyncio.create_task(asyncio.to_thread(fetch_open_jobs))
+
     await cl.Message(content="به سیستم استخدام خوش آمدید. لطفاً ابتدا احراز هویت کنید.").send()
     user_profile = await run_auth_and_onboarding_flow()
+    authenticated_at = time.monotonic()
     
     if not user_profile:
         logger.warning("User failed or abandoned the authentication flow.")
@@ -89,63 +130,139 @@ async def start_chat():
         return
         
     logger.info(f"User authenticated. Profile: {user_profile}")
-    cl.user_session.set("user_profile", user_profile)
-    
-    agent_executor = create_hr_agent()
-    cl.user_session.set("agent_executor", agent_executor)
-    
-    memory = ConversationBufferWindowMemory(k=5, return_messages=True, memory_key="chat_history")
-    cl.user_session.set("memory", memory)
+    save_session_state({
+        "user_profile": user_profile,
+        "memory": TokenBudgetMemory(memory_key="chat_history").to_dict(),
+        "last_query": None,
+        "last_response": None,
+    })
     
     first_name = user_profile.get("FirstName", "کاربر")
     await cl.Message(
-        content=f"سلام **{first_name}**! پروفایل شما تکمیل شد. به دستیار هوشمند استخدام خوش آمدید.",
-        author="هوشمند"
-    ).send()
-
-    await cl.Message(
-        content="شما می‌توانید سوالات خود را در مورد شرکت بپرسید یا برای موقعیت‌های شغلی موجود درخواست دهید. \n\nدر اینجا لیست موقعیت‌های شغلی باز فعلی آمده است:",
+        content=f"سلام **{first_name}**! پروفایل شما تکمیل شد. به دستیار هوشمند استخدام خوش آمدید.\n\n"
+                "شما می‌توانید سوالات خود را در مورد شرکت بپرسید یا برای موقعیت‌های شغلی موجود درخواست دهید. \n\nدر اینجا لیست موقعیت‌های شغلی باز فعلی آمده است:",
         author="هوشمند"
     ).send()
     
-    jobs_json_string = get_open_job_positions.invoke({})
-    await display_job_listings(jobs_json_string)
+    prefetched = jobs_task.done()
+    await display_job_listings(await jobs_task)
+
+    ready_seconds = time.monotonic() - authenticated_at
+    metrics.observe("hr_onboarding_ready_seconds", ready_seconds)
+    logger.info(f"Onboarding-to-ready took {ready_seconds * 1000:.0f} ms (job list prefetched: {prefetched}).")
 
 @cl.on_message
 async def main(message: cl.Message):
-    agent_executor = cl.user_session.get("agent_executor")
-    memory = cl.user_session.get("memory")
-    user_profile = cl.user_session.get("user_profile")
+    # A message sent while the worker is still warming up (e.g. building the index) waits for it.
+    await warmup.wait_until_done()
+    # Every log line of the turn carries these ids; every span below (model calls, tools,
+    # retrieval, HTTP) is collected into one latency breakdown.
+    with log_context(session_id=cl.context.session.id, turn_id=uuid.uuid4().hex[:12]):
+        with tracing.turn_trace("chat_turn") as trace:
+            await handle_turn(message, trace)
+
+async def handle_turn(message: cl.Message, trace: tracing.TurnTrace):
+    state = load_session_state()
     
-    if not all([agent_executor, memory, user_profile]):
+    if not state or not state.get("user_profile"):
         await cl.Message(content="سیستم آماده نیست یا احراز هویت انجام نشده. لطفاً صفحه را رفرش کنید.").send()
         return
+
+    memory = TokenBudgetMemory.from_dict(state.get("memory"), memory_key="chat_history")
+    user_profile = state["user_profile"]
         
     phone_number = user_profile.get("PhoneNumber")
     candidate_id = user_profile.get("Id")
+    update_log_context(candidate_id=candidate_id)
     
     memory_variables = memory.load_memory_variables({})
-    
-    agent_input = {
-        "input": f"User's phone number is {phone_number} and their candidate_id is {candidate_id}. User's query is: {message.content}",
-        "chat_history": memory_variables.get("chat_history", [])
-    }
-    
+
+    # Small talk gets a minimal prompt without tools or history; single-intent turns only the tools they need.
+    has_history = bool(memory.turns or memory.summary)
+    route = route_message(message.content, has_history=has_history)
+    trace.attrs.update(tier=route.tier, intent=route.intent)
+    agent_executor = get_agent_executor(route)
+    if route.tier == TIER_SMALLTALK:
+        agent_input = {"input": message.content, "chat_history": []}
+    else:
+        agent_input = {
+            "input": f"User's phone number is {phone_number} and their candidate_id is {candidate_id}. User's query is: {message.content}",
+            "chat_history": memory_variables.get("chat_history", [])
+        }
+
     response_msg = cl.Message(content="", author="هوشمند")
     final_answer = ""
-    
-    async for chunk in agent_executor.astream(agent_input):
-        token = chunk.get("output", "")
-        if token:
-            final_answer += token
-            await response_msg.stream_token(token)
+
+    # Generic knowledge-base questions may already have an answer; a hit skips the LLM entirely.
+    # Follow-ups are answered from the conversation, so they are neither looked up nor stored.
+    standalone = route.tier != TIER_SMALLTALK and not depends_on_history(message.content, has_history)
+    question_vector = None
+    if settings.ANSWER_CACHE_ENABLED and standalone:
+        try:
+            with tracing.span(tracing.STAGE_CACHE, "answer_cache"):
+                question_vector = await answer_cache.aembed(message.content)
+                final_answer = answer_cache.lookup(question_vector) or ""
+        except Exception as e:
+            logger.error(f"Answer cache lookup failed, continuing with the agent: {e}")
+
+    if final_answer:
+        logger.info("Answered from the answer cache.", extra={KB_QUESTION_FIELD: message.content})
+        await response_msg.stream_token(final_answer)
+    else:
+        from agents import prompt_overhead_tokens
+        system_tokens = prompt_overhead_tokens(route)
+        history_tokens = count_message_tokens(agent_input["chat_history"])
+        input_tokens = count_tokens(agent_input["input"])
+        logger.info(
+            f"Prompt tokens for turn (route={route.tier}/{route.intent}): system+tools={system_tokens}, "
+            f"chat_history={history_tokens}, input={input_tokens}, total={system_tokens + history_tokens + input_tokens}"
+        )
+
+        # Most free-text turns start with a knowledge-base lookup; overlap it with the first LLM call.
+        may_query_kb = route.tier != TIER_SMALLTALK and (not route.tools or "query_knowledge_base" in route.tools)
+        prefetch = (
+            start_prefetch(message.content, retrieve_context)
+            if settings.SPECULATIVE_RETRIEVAL_ENABLED and may_query_kb else None
+        )
+
+        tools_used = set()
+        # An agent step is one model decision plus the tools it called; the last one writes the answer.
+        step_count, step_started = 0, time.perf_counter()
+        callbacks = [_tracing_handler, _agent_trace_logger] if tracing.sample_agent_trace() else [_tracing_handler]
+        try:
+            async for chunk in agent_executor.astream(agent_input, config={"callbacks": callbacks}):
+                for agent_action in chunk.get("actions", []):
+                    tools_used.add(agent_action.tool)
+                for step in chunk.get("steps", []):
+                    log_tool_output(step.action.tool, step.observation)
+                if chunk.get("steps"):
+                    step_count += 1
+                    tracing.record_span(tracing.STAGE_AGENT_STEP, f"step_{step_count}", time.perf_counter() - step_started)
+                    step_started = time.perf_counter()
+                token = chunk.get("output", "")
+                if token:
+                    final_answer += token
+                    await response_msg.stream_token(token)
+        except LLMQueueFullError as e:
+            # The model is saturated; tell the user right away instead of queueing them indefinitely.
+            logger.warning(f"Turn rejected by the LLM scheduler ({e.reason}).")
+            await response_msg.stream_token(("\n\n" if final_answer else "") + e.user_message)
+            await response_msg.update()
+            return
+        finally:
+            if prefetch:
+                finish_prefetch(prefetch)
+            tracing.record_span(tracing.STAGE_AGENT_STEP, f"step_{step_count + 1}", time.perf_counter() - step_started)
+
+        if standalone and is_cacheable_turn(tools_used):
+            if settings.ANSWER_CACHE_ENABLED:
+                answer_cache.add(message.content, final_answer, question_vector)
+            # Mined by utils/warm_start.py; only generic knowledge-base questions are logged.
+            logger.info("Answered from the knowledge base.", extra={KB_QUESTION_FIELD: message.content})
 
     if final_answer:
         response_msg.content = final_answer
         
-    cl.user_session.set("last_query", message.content)
-    cl.user_session.set("last_response", final_answer)
-
     feedback_actions = [
         cl.Action(name="feedback_good", value="good", label="👍 پاسخ خوب بود", payload={}),
         cl.Action(name="feedback_bad", value="bad", label="👎 پاسخ خوب نبود", payload={}),
@@ -154,17 +271,37 @@ async def main(message: cl.Message):
     await response_msg.update()
 
     memory.save_context({"input": message.content}, {"output": final_answer})
+    state.update({"memory": memory.to_dict(), "last_query": message.content, "last_response": final_answer})
+    save_session_state(state)
+    # Older turns are compressed only after the reply has been delivered.
+    run_in_background(summarize_and_save(cl.context.session.id, memory, state["version"]))
 
-@cl.action_callback("view_job_details")
 @cl.action_callback("apply_for_job")
 async def on_action(action: cl.Action):
     agent_instruction = action.payload.get("agent_instruction")
     if agent_instruction:
         msg = cl.Message(content=agent_instruction, author="user")
-        await main(msg)
+        # A button click is a single explicit request; it is served before queued free-text turns.
+        with llm_priority(PRIORITY_ACTION):
+            await main(msg)
     else:
         logger.warning(f"Action '{action.name}' was clicked but had no agent_instruction in payload.")
 
+@cl.action_callback("view_job_details")
+async def on_view_job_details(action: cl.Action):
+    # The full record is rendered directly; the agent only ever sees a budgeted projection of it.
+    job_id = action.payload.get("job_id")
+    job = await asyncio.to_thread(fetch_job_details, job_id) if job_id else None
+    if job:
+        await display_job_details(job)
+    else:
+        await on_action(action)
+
+@cl.action_callback("show_more_jobs")
+async def on_show_more_jobs(action: cl.Action):
+    jobs = await asyncio.to_thread(fetch_open_jobs)
+    await display_job_listings(jobs, page=action.payload.get("page", 0))
+
 @cl.action_callback("feedback_good")
 @cl.action_callback("feedback_bad")
 async def on_feedback(action: cl.Action):
@@ -173,11 +310,12 @@ async def on_feedback(action: cl.Action):
         message.actions = []
         await message.update()
 
-    last_query = cl.user_session.get("last_query")
-    last_response = cl.user_session.get("last_response")
+    state = load_session_state() or {}
+    last_query = state.get("last_query")
+    last_response = state.get("last_response")
     rating = "good" if action.name == "feedback_good" else "bad"
     
-    user_profile = cl.user_session.get("user_profile")
+    user_profile = state.get("user_profile")
     phone_number = user_profile.get("PhoneNumber", "unknown") if user_profile else "unknown"
 
     if not all([last_query, last_response]):
@@ -1,13 +1,15 @@
 # start of auth_page.py
+import asyncio
 import chainlit as cl
 import requests
 import logging
-import random
-import re
 
 # Import configurations and the translator utility
 from config import settings
+from utils import http_client
 from utils.api_translator import to_api_format, from_api_format
+from utils.otp_service import get_otp_service, OTPError, OTP_VALID, OTP_INVALID, OTP_EXPIRED
+from utils.text_normalizer import normalize_phone, normalize_text
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,7 @@ def check_user_exists(phone_number: str):
     headers = {"xc-token": settings.NOCODB_API_TOKEN}
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, service="nocodb", headers=headers, params=params, timeout=10)
         response.raise_for_status()
         data = response.json().get("list", [])
         
@@ -49,7 +51,7 @@ def create_new_candidate(profile: dict):
     api_payload = to_api_format(profile, settings.CANDIDATE_FIELD_MAP)
     
     try:
-        response = requests.post(url, headers=headers, json=api_payload)
+        response = http_client.post(url, service="nocodb", headers=headers, json=api_payload)
         response.raise_for_status()
         logger.info(f"Successfully created new candidate: {profile.get('PhoneNumber')}")
         
@@ -73,45 +75,51 @@ async def run_auth_and_onboarding_flow():
             
         phone_input = phone_res['output'].strip()
 
-        if re.match(r"^09\d{9}$", phone_input):
-            phone_number = phone_input
+        # Accepts Persian/Arabic digits, spaces or dashes and a +98 prefix; stored as 09XXXXXXXXX.
+        phone_number = normalize_phone(phone_input)
+        if phone_number:
             break
         else:
             await cl.Message(
                 content=f"فرمت شماره «{phone_input}» نامعتبر است. لطفاً یک شماره ۱۱ رقمی صحیح وارد کنید."
             ).send()
 
+    otp_service = get_otp_service()
+    await cl.Message(content="در حال ارسال کد تایید...").send()
     try:
-        otp_code = str(random.randint(100000, 999999))
-        cl.user_session.set("otp_code", otp_code)
-        logger.info(f"Generated OTP {otp_code} for {phone_number}")
-
-        sms_message = f"کد ورود شما به سیستم استخدام: {otp_code}"
-        payload = {"sms": sms_message, "who": phone_number}
-        
-        await cl.Message(content="در حال ارسال کد تایید...").send()
-        send_res = requests.post(settings.N8N_SMS_WEBHOOK_URL, json=payload)
-        send_res.raise_for_status()
-        
-        otp_res = await cl.AskUserMessage(content="کد ۶ رقمی ارسال شده را وارد کنید:", timeout=180).send()
-        if not otp_res: return None
-        user_entered_code = otp_res['output'].strip()
+        await otp_service.send_code(phone_number)
+    except OTPError as e:
+        await cl.Message(content=e.user_message).send()
+        return None
 
-        saved_otp = cl.user_session.get("otp_code")
-        cl.user_session.set("otp_code", None)
+    # Look the candidate up while the user is typing the code, so returning
+    # users are admitted as soon as the code is verified.
+    profile_task = asyncio.create_task(asyncio.to_thread(check_user_exists, phone_number))
 
-        if user_entered_code != saved_otp:
-            await cl.Message(content="کد وارد شده نامعتبر است. لطفاً صفحه را رفرش کرده و دوباره تلاش کنید.").send()
+    while True:
+        otp_res = await cl.AskUserMessage(content="کد ۶ رقمی ارسال شده را وارد کنید:", timeout=180).send()
+        if not otp_res:
+            profile_task.cancel()
             return None
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"OTP flow failed during API call: {e}")
-        await cl.Message(content="مشکلی در فرآیند ارسال کد پیش آمد. لطفاً دقایقی دیگر مجددا تلاش کنید.").send()
+        result = otp_service.verify(phone_number, otp_res['output'])
+        if result == OTP_VALID:
+            break
+        if result == OTP_INVALID:
+            remaining = otp_service.remaining_attempts(phone_number)
+            await cl.Message(content=f"کد وارد شده نامعتبر است. {remaining} تلاش دیگر باقی مانده است.").send()
+            continue
+
+        profile_task.cancel()
+        if result == OTP_EXPIRED:
+            await cl.Message(content="کد تایید منقضی شده است. لطفاً صفحه را رفرش کرده و دوباره تلاش کنید.").send()
+        else:
+            await cl.Message(content="تعداد تلاش‌های ناموفق بیش از حد مجاز است. لطفاً صفحه را رفرش کرده و دوباره تلاش کنید.").send()
         return None
 
     await cl.Message(content="احراز هویت با موفقیت انجام شد!").send()
     
-    user_profile = check_user_exists(phone_number)
+    user_profile = await profile_task
     
     if user_profile:
         logger.info(f"Returning user authenticated: {phone_number}")
@@ -140,14 +148,14 @@ async def run_auth_and_onboarding_flow():
         if not experience_res: return None
         
         new_profile_data = {
-            "FirstName": first_name_res['output'].strip(),
-            "LastName": last_name_res['output'].strip(),
+            "FirstName": normalize_text(first_name_res['output']),
+            "LastName": normalize_text(last_name_res['output']),
             "PhoneNumber": phone_number,
-            "Expertise": expertise_res['output'].strip(),
-            "WorkExperience": experience_res['output'].strip()
+            "Expertise": normalize_text(expertise_res['output']),
+            "WorkExperience": normalize_text(experience_res['output'])
         }
         
-        created_profile = create_new_candidate(new_profile_data)
+        created_profile = await asyncio.to_thread(create_new_candidate, new_profile_data)
         if not created_profile:
              await cl.Message(content="متاسفانه در ساخت پروفایل شما مشکلی پیش آمد.").send()
              return None
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: NocoDB record translation on large list pages.
+
+Compares the original per-call translator (inverted map rebuilt for every row),
+the cached `from_api_format`, and the compiled codecs in utils/record_codec.py.
+
+Run from the project root:
+    python -m benchmarks.bench_record_codec [--rows 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+import tracemalloc
+
+from config import settings
+from utils.api_translator import from_api_format
+from utils.record_codec import get_codec
+
+
+def legacy_from_api_format(api_object: dict, field_map: dict) -> dict:
+    """The translator as it was before the codec: rebuilds the inverted map on every call."""
+    inverted_map = {v: k for k, v in field_map.items()}
+    internal_data = {}
+    for api_key, value in api_object.items():
+        if api_key in inverted_map:
+            internal_data[inverted_map[api_key]] = value
+    return internal_data
+
+
+def make_page(rows: int) -> list:
+    """Builds a JobOpportunities list page shaped like a real NocoDB response (system columns included)."""
+    fm = settings.JOB_OPPORTUNITY_FIELD_MAP
+    rng = random.Random(42)
+    page = []
+    for i in range(rows):
+        page.append({
+            fm["Id"]: i,
+            fm["Title"]: f"کارشناس شماره {i}",
+            fm["Description"]: "توضیحات کوتاه " * rng.randint(1, 5),
+            fm["FullDescription"]: "شرح وظایف " * rng.randint(20, 80),
+            fm["Status"]: "باز",
+            fm["Department"]: {"Id": rng.randint(1, 9), "Title": "فناوری اطلاعات"},
+            "CreatedAt": "2025-01-01 10:00:00+00:00",
+            "UpdatedAt": "2025-01-02 10:00:00+00:00",
+            "nc_created_by": "usr_1",
+            "nc_order": i,
+        })
+    return page
+
+
+def peak_bytes(fn, page) -> int:
+    tracemalloc.start()
+    result = fn(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field_map = settings.JOB_OPPORTUNITY_FIELD_MAP
+    codec = get_codec("JobOpportunities")
+    candidates = {
+        "legacy translator": lambda page: [legacy_from_api_format(row, field_map) for row in page],
+        "cached translator": lambda page: [from_api_format(row, field_map) for row in page],
+        "codec -> dicts": codec.decode_many_dicts,
+        "codec -> records": codec.decode_many,
+    }
+
+    print(f"{'rows':>7}  {'implementation':<20} {'best ms':>9} {'us/row':>8} {'speedup':>8} {'peak KiB':>9}")
+    for rows in args.rows:
+        page = make_page(rows)
+        baseline = None
+        for name, fn in candidates.items():
+            best = min(timeit.repeat(lambda: fn(page), number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print(
+                f"{rows:>7}  {name:<20} {best * 1000:>9.2f} {best / rows * 1e6:>8.2f} "
+                f"{baseline / best:>7.1f}x {peak_bytes(fn, page) / 1024:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Offline retrieval evaluation built from the FAQ in data/company_faq.md.
+
+Every "**سوال:** / **پاسخ:**" pair becomes a labelled query: a chunk is relevant if it
+contains the start of the pair's answer. Each question is also asked in rule-based
+paraphrases (colloquial, keywords only, Arabic letter forms). The index is built with
+the real ingestion pipeline (ingest.py) into a temporary directory; queries go through
+the vector store and through the query_knowledge_base tool.
+
+Reports recall@k, MRR@10, index build time and size, and query latency. Each run is
+appended to benchmarks/results/retrieval_history.jsonl and compared with the previous
+run of the same configuration.
+
+Embeddings:
+    local   the local hashed n-gram embeddings (utils/embeddings.py), no network (default)
+    openai  the configured OpenAI model, cached on disk (benchmarks/.embedding_cache),
+            so runs after the first one are offline
+
+Run from the project root:
+    python -m benchmarks.eval_retrieval [--embeddings local] [--chunk-size 1000]
+        [--chunk-overlap 200] [--fail-on-regression]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from langchain_community.document_loaders import TextLoader
+from langchain_core.embeddings import Embeddings
+
+from benchmarks import history
+from config import settings
+from utils.embeddings import PROVIDER_LOCAL, PROVIDERS, create_embeddings, embedding_model_name
+from utils.text_normalizer import normalize_text
+
+FAQ_PATH = os.path.join(settings.DOCUMENT_SOURCE_PATH, "company_faq.md")
+HISTORY = "retrieval_history"
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+KS = (1, 3, 5, 10)
+# Relative drop in a quality metric that counts as a regression.
+REGRESSION_TOLERANCE = 0.02
+
+_PAIR_RE = re.compile(r"\*\*سوال:\s*(.+?)\*\*\s*\n\s*\*\*پاسخ:\*\*(.*?)(?=\n\s*\*\*سوال:|\Z)", re.S)
+_MARKUP_RE = re.compile(r"[*_`#>|]")
+
+# --- Evaluation Set ---
+
+
+def plain(text: str) -> str:
+    """Normalized text without markdown markup, for matching answers inside chunks."""
+    return " ".join(_MARKUP_RE.sub(" ", normalize_text(text)).split())
+
+
+def load_faq_pairs(path: str = FAQ_PATH) -> list:
+    """Returns (question, answer key) pairs; the key is the first 60 characters of the answer."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    pairs = []
+    for question, answer in _PAIR_RE.findall(text):
+        key = plain(answer)[:60]
+        if key:
+            pairs.append((question.strip(), key))
+    return pairs
+
+
+_FORMAL_TO_COLLOQUIAL = [("چیست", "چیه"), ("چگونه", "چطور"), ("می‌توانم", "میتونم"), ("است", "هست"), ("آیا ", "")]
+_STOPWORDS = {"آیا", "چیست", "چیه", "چه", "است", "را", "در", "به", "از", "که", "و", "با", "برای", "این", "می‌شود",
+              "هستند", "چگونه", "کدام", "من", "ما", "شما", "یک", "هم", "یا"}
+
+
+def paraphrases(question: str) -> dict:
+    """Rule-based variants of a question, keyed by variant name."""
+    colloquial = question.rstrip("؟?")
+    for formal, informal in _FORMAL_TO_COLLOQUIAL:
+        colloquial = colloquial.replace(formal, informal)
+    words = [w.strip('"«»،,.؟?()') for w in question.split()]
+    keywords = " ".join(w for w in words if w and w not in _STOPWORDS)
+    arabic = question.replace("ی", "ي").replace("ک", "ك")
+    return {
+        "original": question,
+        "colloquial": f"میخواستم بدونم {colloquial}",
+        "keywords": keywords,
+        "arabic_letters": arabic,
+    }
+
+
+def build_queries(pairs: list) -> list:
+    """(variant, query, answer key) for every question and paraphrase."""
+    return [(variant, query, key) for question, key in pairs for variant, query in paraphrases(question).items()]
+
+
+# --- Embeddings ---
+
+def make_embeddings(provider: str) -> Embeddings:
+    embeddings = create_embeddings(provider)
+    if provider == PROVIDER_LOCAL:
+        return embeddings
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+    return CacheBackedEmbeddings.from_bytes_store(
+        embeddings, LocalFileStore(CACHE_PATH), namespace=embedding_model_name(provider),
+        query_embedding_cache=True,
+    )
+
+
+# --- Measurement ---
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(q * len(values) + 0.999999) - 1))]
+
+
+def evaluate(store, queries: list) -> dict:
+    """Ranks the top 10 chunks for every query; returns recall@k and MRR overall and per variant."""
+    ranks, latencies = [], []
+    for variant, query, key in queries:
+        started = time.perf_counter()
+        docs = store.similarity_search(normalize_text(query), k=max(KS))
+        latencies.append(time.perf_counter() - started)
+        rank = next((i + 1 for i, doc in enumerate(docs) if key in plain(doc.page_content)), None)
+        ranks.append((variant, rank))
+
+    def summarize(selected):
+        result = {f"recall@{k}": sum(1 for r in selected if r and r <= k) / len(selected) for k in KS}
+        result["mrr@10"] = sum(1 / r for r in selected if r) / len(selected)
+        return result
+
+    by_variant = {}
+    for variant, rank in ranks:
+        by_variant.setdefault(variant, []).append(rank)
+    return {
+        "overall": summarize([rank for _, rank in ranks]),
+        "by_variant": {variant: summarize(selected) for variant, selected in by_variant.items()},
+        "search_ms_p50": percentile(latencies, 0.5) * 1000,
+        "search_ms_p95": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def tool_latency(store, queries: list) -> dict:
+    """End-to-end latency of the query_knowledge_base tool (search, dedupe, budget) against the test index."""
+    import tools.rag_tool as rag_tool
+    rag_tool.get_vector_store = lambda: store
+    latencies = []
+    for _, query, _ in queries:
+        started = time.perf_counter()
+        rag_tool.query_knowledge_base.invoke({"query": query})
+        latencies.append(time.perf_counter() - started)
+    return {"tool_ms_p50": percentile(latencies, 0.5) * 1000, "tool_ms_p95": percentile(latencies, 0.95) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", choices=PROVIDERS, default=PROVIDER_LOCAL)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    from ingest import ingest_data, open_index
+
+    pairs = load_faq_pairs()
+    queries = build_queries(pairs)
+    embeddings = make_embeddings(args.embeddings)
+    config = {"embeddings": args.embeddings, "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap}
+
+    with tempfile.TemporaryDirectory(prefix="hr-retrieval-eval-") as workdir:
+        started = time.perf_counter()
+        # Markdown is read as plain text: the Unstructured loader needs a model download.
+        stats = ingest_data(
+            persist_directory=workdir, embeddings=embeddings, loader_cls=TextLoader,
+            loader_kwargs={"encoding": "utf-8"}, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+            use_parse_cache=False,
+        )
+        build_seconds = time.perf_counter() - started
+
+        store = open_index(workdir, embeddings)
+        quality = evaluate(store, queries)
+        latency = tool_latency(store, queries)
+        index = {"chunks": stats["chunks"], "build_seconds": build_seconds, "size_bytes": directory_size(workdir)}
+
+    print(f"\n{len(pairs)} FAQ pairs, {len(queries)} queries, {index['chunks']} chunks, "
+          f"built in {index['build_seconds']:.2f}s, {index['size_bytes'] / 1e6:.1f} MB on disk")
+    header = "".join(f"{m:>11}" for m in quality["overall"])
+    print(f"\n{'variant':<16}{header}")
+    for variant, metrics in [("all", quality["overall"])] + list(quality["by_variant"].items()):
+        print(f"{variant:<16}" + "".join(f"{v:>11.3f}" for v in metrics.values()))
+    print(f"\nvector search: p50 {quality['search_ms_p50']:.1f} ms, p95 {quality['search_ms_p95']:.1f} ms; "
+          f"query_knowledge_base: p50 {latency['tool_ms_p50']:.1f} ms, p95 {latency['tool_ms_p95']:.1f} ms")
+
+    entry = history.new_entry(config, index=index, quality=quality, latency=latency)
+    previous = history.previous_result(HISTORY, config)
+    regressions = []
+    if previous:
+        print(f"\ncompared with {history.describe(previous)}:")
+        regressions = history.compare(quality["overall"], previous["quality"]["overall"], REGRESSION_TOLERANCE)
+    if not args.no_history:
+        history.append_result(HISTORY, entry)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Offline evaluation of the turn router (utils/router.py) on held-out candidate turns.
+
+The turns are labelled with the tools a correct answer needs, not with a tier or an
+intent, so the labels do not follow the router's keyword rules:
+    - the questions of data/company_faq.md, as written there: answered from the knowledge base;
+    - TURNS, candidate messages labelled by what answering them requires.
+A turn is routed correctly if its tier binds every tool it needs. Misroutes of personal
+questions (application status, applying, recommendations) are listed: the cheap tier
+answers them without the candidate's data.
+
+Each turn is also run through both the routed executor and the full agent, backed by a
+stub chat model (benchmarks/fake_llm.py), to measure the prompt tokens of the first LLM
+call: system prompt, bound tool definitions, chat history and input. Savings are
+reported over the whole set, and net of misroutes, counting each misrouted turn as
+retried on the full agent.
+
+Run from the project root:
+    python -m benchmarks.eval_router [--verbose]
+"""
+import argparse
+import asyncio
+from collections import Counter
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents import create_executor, tools_for_route
+from benchmarks.eval_retrieval import load_faq_pairs
+from benchmarks.fake_llm import FakeChatModel
+from utils.router import FULL_ROUTE, TIER_FOCUSED, TIER_FULL, TIER_SMALLTALK, route_message
+
+KB = "query_knowledge_base"
+JOBS = "get_open_job_positions"
+DETAILS = "get_job_details"
+APPLY = "apply_for_job_position"
+STATUS = "get_application_status"
+RECOMMEND = "recommend_jobs"
+# Tools that read or change the candidate's own records.
+PERSONAL_TOOLS = {APPLY, STATUS, RECOMMEND}
+
+# (message, has_history, tools the answer needs). With history, the previous turns are HISTORY.
+TURNS = [
+    # Greetings, thanks, goodbyes: no tool.
+    ("سلام", False, ()),
+    ("سلام وقتتون بخیر", False, ()),
+    ("درود", False, ()),
+    ("ممنون از راهنماییتون", True, ()),
+    ("دستت درد نکنه", True, ()),
+    ("مرسی خیلی کمک کرد", True, ()),
+    ("خدانگهدار", True, ()),
+    ("شب خوش", True, ()),
+    ("hello", False, ()),
+    ("thank you so much", True, ()),
+    ("نه ممنون، فعلا سوالی ندارم", True, ()),
+    # Open positions.
+    ("چه موقعیت‌های شغلی باز دارید؟", False, (JOBS,)),
+    ("الان دنبال چه نیروهایی هستید؟", False, (JOBS,)),
+    ("برای برنامه‌نویس جای خالی دارید؟", False, (JOBS,)),
+    ("آگهی‌های جدیدتون رو ببینم", False, (JOBS,)),
+    ("تو بخش فروش نیرو می‌گیرید؟", False, (JOBS,)),
+    ("what jobs are open right now?", False, (JOBS,)),
+    # One position.
+    ("شرایط موقعیت کارشناس حسابداری چیه؟", True, (DETAILS,)),
+    ("حقوق موقعیت برنامه‌نویس پایتون چقدره؟", True, (DETAILS,)),
+    ("اون شغل دومی رو بیشتر توضیح بده", True, (DETAILS,)),
+    ("برای طراح رابط کاربری چه مهارت‌هایی لازمه؟", True, (DETAILS,)),
+    ("what are the requirements for job 12?", True, (DETAILS,)),
+    # Applying.
+    ("می‌خوام برای برنامه‌نویس پایتون درخواست بدم", True, (APPLY,)),
+    ("منو برای همون اولی ثبت کن", True, (APPLY,)),
+    ("رزومه‌ام رو برای حسابداری بفرست", True, (APPLY,)),
+    ("I'd like to apply for job 7", True, (APPLY,)),
+    # The candidate's applications.
+    ("وضعیت درخواست من چیه؟", True, (STATUS,)),
+    ("نتیجه مصاحبه من مشخص شد؟", True, (STATUS,)),
+    ("کی جواب مصاحبه‌ام رو میدید؟", True, (STATUS,)),
+    ("رزومه‌ام بررسی شد؟", True, (STATUS,)),
+    ("از درخواستی که هفته پیش دادم خبری نشد", True, (STATUS,)),
+    ("درخواستم قبول شد یا رد؟", True, (STATUS,)),
+    ("did my application go through?", True, (STATUS,)),
+    # Recommendations from the candidate's profile.
+    ("چه شغلی به سابقه من می‌خوره؟", True, (RECOMMEND,)),
+    ("من پنج سال سابقه کار با پایتون دارم، کدوم موقعیت مناسبمه؟", True, (RECOMMEND,)),
+    ("با مدرک حسابداری من کجا می‌تونم کار کنم؟", True, (RECOMMEND,)),
+    ("which role fits my profile?", True, (RECOMMEND,)),
+    # Company questions not worded as in the FAQ.
+    ("بیمه تکمیلی دارید؟", False, (KB,)),
+    ("چند روز مرخصی سالانه میدید؟", False, (KB,)),
+    ("امکان دورکاری هست؟", False, (KB,)),
+    ("ناهار شرکت میده؟", False, (KB,)),
+    ("سرویس رفت و آمد دارید؟", False, (KB,)),
+    # Several needs in one message.
+    ("شغل‌های باز رو بگو و وضعیت درخواستم رو هم چک کن", True, (JOBS, STATUS)),
+    ("حقوق برنامه‌نویس چقدره و چطور درخواست بدم؟", True, (DETAILS, APPLY)),
+    ("بیمه دارید؟ اگه آره می‌خوام برای حسابداری درخواست بدم", True, (KB, APPLY)),
+]
+
+
+def held_out_turns() -> list:
+    """TURNS and the FAQ questions, as (message, has_history, needed tools, source)."""
+    faq = [(question, False, (KB,), "faq") for question, _ in load_faq_pairs()]
+    return [(*turn, "hand") for turn in TURNS] + faq
+
+
+HISTORY = [
+    HumanMessage(content="سلام، چه موقعیت‌های شغلی باز دارید؟"),
+    AIMessage(content="در حال حاضر موقعیت‌های برنامه‌نویس پایتون، کارشناس حسابداری و طراح رابط کاربری باز هستند."),
+]
+
+
+async def first_call_tokens(route, message: str, has_history: bool) -> int:
+    llm = FakeChatModel(calls=[])
+    executor = create_executor(route, llm=llm)
+    history = HISTORY if has_history and route.tier != TIER_SMALLTALK else []
+    text = message if route.tier == TIER_SMALLTALK else (
+        f"User's phone number is 09120000000 and their candidate_id is 1. User's query is: {message}"
+    )
+    async for _ in executor.astream({"input": text, "chat_history": history}):
+        pass
+    return llm.calls[0]["prompt_tokens"]
+
+
+async def evaluate(verbose: bool) -> None:
+    turns = held_out_turns()
+    tiers = Counter()
+    misroutes = []  # (message, tier, intent, missing tools)
+    routed_tokens = full_tokens = net_tokens = 0
+    personal = 0
+
+    for message, has_history, needs, source in turns:
+        route = route_message(message, has_history=has_history)
+        tiers[route.tier] += 1
+        missing = set(needs) - {tool.name for tool in tools_for_route(route)}
+        personal += bool(PERSONAL_TOOLS & set(needs))
+
+        routed = await first_call_tokens(route, message, has_history)
+        full = await first_call_tokens(FULL_ROUTE, message, has_history)
+        routed_tokens += routed
+        full_tokens += full
+        # A misrouted turn has to be answered again by the full agent.
+        net_tokens += routed + full if missing else routed
+        if missing:
+            misroutes.append((message, route.tier, route.intent, missing))
+        if verbose or missing:
+            mark = "MISS" if missing else "ok  "
+            print(f"{mark} {source:<4} {route.tier:<9} {route.intent or '-':<11} {routed:>5}/{full:<5} {message}")
+
+    n = len(turns)
+    personal_misroutes = [m for m in misroutes if PERSONAL_TOOLS & m[3]]
+    hand = sum(1 for turn in turns if turn[3] == "hand")
+    print()
+    print(f"held-out turns:       {n} ({hand} hand-labelled, {n - hand} FAQ questions)")
+    print(f"routed correctly:     {1 - len(misroutes) / n:.1%} (the tier binds every tool the answer needs)")
+    print("tiers:                " + ", ".join(f"{tiers[t]} {t}" for t in (TIER_SMALLTALK, TIER_FOCUSED, TIER_FULL)))
+    print(f"personal misroutes:   {len(personal_misroutes)} of {personal} personal questions "
+          f"sent to a tier without their tool")
+    print(f"avg prompt tokens:    {full_tokens / n:.0f} full agent -> {routed_tokens / n:.0f} routed")
+    print(f"avg tokens saved:     {(full_tokens - routed_tokens) / n:.0f} per turn "
+          f"({1 - routed_tokens / full_tokens:.0%} of the first LLM call)")
+    print(f"net of misroutes:     {(full_tokens - net_tokens) / n:.0f} per turn "
+          f"({1 - net_tokens / full_tokens:.0%}), each misroute retried on the full agent")
+    if personal_misroutes:
+        print("\npersonal questions answered without the candidate's data:")
+        for message, tier, intent, missing in personal_misroutes:
+            print(f"  {tier}/{intent or '-'}, missing {', '.join(sorted(missing))}: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every case, not only misrouted ones")
+    args = parser.parse_args()
+    asyncio.run(evaluate(args.verbose))
+
+
+if __name__ == "__main__":
+    main()
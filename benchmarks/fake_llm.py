@@ -0,0 +1,54 @@
+"""
+A stub chat model for offline benchmarks and evaluations.
+
+It never calls a provider: every call records the prompt it would have sent (message
+tokens plus the bound tool definitions) and answers with a canned reply after an
+optional simulated latency. Supports `bind_tools`, so it can drive a real AgentExecutor.
+"""
+import asyncio
+import time
+from typing import Any, Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils.token_counter import count_message_tokens, count_tokens
+
+
+class FakeChatModel(BaseChatModel):
+    reply: str = "پاسخ آزمایشی."
+    # Optional: (messages, bound tool schemas) -> AIMessage, e.g. to emit tool calls.
+    respond: Callable | None = None
+    latency: float = 0.0
+    bound_tools: list = []
+    # Shared by all copies made by bind_tools(): one dict per call.
+    calls: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.model_copy(update={"bound_tools": [convert_to_openai_tool(t) for t in tools]})
+
+    def _respond(self, messages) -> ChatResult:
+        prompt_tokens = count_message_tokens(messages) + sum(count_tokens(str(t)) for t in self.bound_tools)
+        self.calls.append({"prompt_tokens": prompt_tokens, "tools": [t["function"]["name"] for t in self.bound_tools]})
+        message = self.respond(messages, self.bound_tools) if self.respond else AIMessage(content=self.reply)
+        output_tokens = count_tokens(str(message.content))
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens, "output_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
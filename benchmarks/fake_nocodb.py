@@ -0,0 +1,164 @@
+"""
+A local stand-in for the NocoDB REST API and the SMS webhook, for offline benchmarks.
+
+Serves the subset of the v2 records API the app uses (list with where/fields/limit/
+offset, read by id, create) from in-memory tables keyed by the table ids in
+config/settings.py, with an optional simulated latency per request. SMS webhook
+calls are kept in an inbox, so a simulated user can read the OTP code it was sent.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config import settings
+
+_RECORDS_PATH_RE = re.compile(r"^/api/v2/tables/([^/]+)/records(?:/([^/]+))?$")
+_WHERE_RE = re.compile(r"\(([^,]+),eq,([^)]*)\)")
+
+JOB_TITLES = [
+    "برنامه‌نویس پایتون", "کارشناس حسابداری", "طراح رابط کاربری", "کارشناس منابع انسانی",
+    "مهندس DevOps", "کارشناس فروش", "تحلیل‌گر داده", "مدیر محصول",
+]
+
+
+class FakeNocoDB:
+    def __init__(self, latency: float = 0.0, jobs: int = 8, candidates: int = 0):
+        self.latency = latency
+        self.tables = {table_id: {} for table_id in settings.NOCODB_TABLE_IDS.values()}
+        self.sms_inbox = {}  # phone number -> last message
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._server = None
+        self._seed(jobs, candidates)
+
+    # --- Data ---
+
+    def _table(self, name: str) -> dict:
+        return self.tables[settings.NOCODB_TABLE_IDS[name]]
+
+    def insert(self, table_name: str, record: dict) -> dict:
+        with self._lock:
+            record = {**record, "Id": self._next_id}
+            self._next_id += 1
+            self._table(table_name)[record["Id"]] = record
+        return record
+
+    def _seed(self, jobs: int, candidates: int) -> None:
+        job_fields = settings.JOB_OPPORTUNITY_FIELD_MAP
+        for i in range(jobs):
+            title = JOB_TITLES[i % len(JOB_TITLES)]
+            self.insert("JobOpportunities", {
+                job_fields["Title"]: title,
+                job_fields["Status"]: "باز",
+                job_fields["Description"]: f"موقعیت {title} در شرکت میهن، تمام‌وقت و حضوری.",
+                job_fields["FullDescription"]: f"شرح وظایف {title}: " + "همکاری با تیم و انجام پروژه‌های شرکت. " * 20,
+            })
+        for i in range(candidates):
+            self.add_candidate(f"0912{i:07d}", f"کارجو{i}", "آزمایشی")
+
+    def add_candidate(self, phone_number: str, first_name: str, last_name: str) -> dict:
+        fields = settings.CANDIDATE_FIELD_MAP
+        return self.insert("Candidates", {
+            fields["PhoneNumber"]: phone_number,
+            fields["FirstName"]: first_name,
+            fields["LastName"]: last_name,
+            fields["Expertise"]: "برنامه‌نویس پایتون",
+            fields["WorkExperience"]: "۳ سال توسعه نرم‌افزار",
+        })
+
+    def list_records(self, table_id: str, query: dict) -> dict:
+        with self._lock:
+            records = list(self.tables.get(table_id, {}).values())
+        for field, value in _WHERE_RE.findall(query.get("where", [""])[0]):
+            records = [r for r in records if str(r.get(field)) == value]
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["25"])[0])
+        page = records[offset:offset + limit]
+        if "fields" in query:
+            fields = set(query["fields"][0].split(",")) | {"Id"}
+            page = [{k: v for k, v in r.items() if k in fields} for r in page]
+        return {"list": page, "pageInfo": {"isLastPage": offset + limit >= len(records)}}
+
+    def create_record(self, table_id: str, payload: dict) -> dict:
+        table_name = next(name for name, tid in settings.NOCODB_TABLE_IDS.items() if tid == table_id)
+        if table_name == "HiringRecords":
+            # NocoDB returns the linked job as a nested record; status lookups read its title from there.
+            job_id = payload.get(settings.HIRING_RECORD_LINK_FIELDS["JobOpportunityId"])
+            job = self._table("JobOpportunities").get(int(job_id)) if str(job_id).isdigit() else None
+            if job:
+                payload = {**payload, settings.HIRING_RECORD_FIELD_MAP["JobOpportunity"]: job}
+        return self.insert(table_name, payload)
+
+    # --- HTTP ---
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def sms_url(self) -> str:
+        return f"{self.base_url}/sms"
+
+    def start(self) -> "FakeNocoDB":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-nocodb", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _make_handler(db: FakeNocoDB):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _begin(self):
+            with db._lock:
+                db.requests += 1
+            if db.latency:
+                time.sleep(db.latency)
+            url = urlsplit(self.path)
+            return url.path, parse_qs(url.query)
+
+        def do_GET(self):
+            path, query = self._begin()
+            match = _RECORDS_PATH_RE.match(path)
+            if not match:
+                return self._reply(404, {"msg": "not found"})
+            table_id, record_id = match.groups()
+            if record_id is None:
+                return self._reply(200, db.list_records(table_id, query))
+            record = db.tables.get(table_id, {}).get(int(record_id)) if record_id.isdigit() else None
+            return self._reply(200, record) if record else self._reply(404, {"msg": "Record not found"})
+
+        def do_POST(self):
+            path, _ = self._begin()
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if path == "/sms":
+                db.sms_inbox[payload.get("who")] = payload.get("sms", "")
+                return self._reply(200, {"ok": True})
+            match = _RECORDS_PATH_RE.match(path)
+            if not match or match.group(2):
+                return self._reply(404, {"msg": "not found"})
+            return self._reply(200, db.create_record(match.group(1), payload))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,68 @@
+"""
+Run history for the benchmarks that track a number over time (retrieval quality,
+time to ready). Each run is one JSON line in benchmarks/results/<name>.jsonl; a run
+is compared with the previous one of the same configuration.
+"""
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def results_path(name: str) -> str:
+    return os.path.join(RESULTS_DIR, f"{name}.jsonl")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def new_entry(config: dict, **results) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": config,
+        **results,
+    }
+
+
+def previous_result(name: str, config: dict) -> dict | None:
+    path = results_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        matching = [entry for entry in map(json.loads, f) if entry["config"] == config]
+    return matching[-1] if matching else None
+
+
+def append_result(name: str, entry: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(results_path(name), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def describe(entry: dict) -> str:
+    return f"{entry['timestamp']} ({entry.get('commit') or 'unknown commit'})"
+
+
+def compare(current: dict, previous: dict, tolerance: float, higher_is_better: bool = True) -> list:
+    """
+    Prints old -> new for every metric in `current` and returns the names of those that
+    got worse by more than `tolerance` (relative).
+    """
+    regressions = []
+    for metric, value in current.items():
+        before = previous.get(metric)
+        if before is None:
+            continue
+        worse = value < before * (1 - tolerance) if higher_is_better else value > before * (1 + tolerance)
+        if worse:
+            regressions.append(metric)
+        print(f"  {metric:<22} {before:.3f} -> {value:.3f}{'  REGRESSION' if worse else ''}")
+    return regressions
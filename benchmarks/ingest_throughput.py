@@ -0,0 +1,113 @@
+"""
+Ingestion throughput and memory: files/sec and peak RSS of ingest.py on a synthetic corpus.
+
+The corpus is data/ copied --copies times (each copy made unique, so nothing is shared
+through the parse cache). Each configuration runs in a fresh process, so peak RSS is its
+own:
+    cold, 1 worker      every file parsed in the ingesting process
+    cold, N workers     files parsed in the process pool
+    warm, N workers     every file read back from the parse cache
+
+Parsing markdown as text costs next to nothing, unlike Unstructured on PDFs (which
+needs a model download here), so the loader can burn --parse-cost-ms of CPU per file
+to stand in for it. Embeddings are the local provider.
+
+Run from the project root:
+    python -m benchmarks.ingest_throughput [--copies 50] [--workers 4] [--parse-cost-ms 50]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_community.document_loaders import TextLoader
+
+from config import settings
+
+
+class CpuBoundTextLoader(TextLoader):
+    """TextLoader that also spends `parse_cost_ms` of CPU, like a PDF parser would."""
+
+    def __init__(self, file_path, parse_cost_ms: float = 0, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self.parse_cost_ms = parse_cost_ms
+
+    def load(self):
+        deadline = time.process_time() + self.parse_cost_ms / 1000
+        while time.process_time() < deadline:
+            pass
+        return super().load()
+
+
+def make_corpus(target: str, copies: int) -> int:
+    sources = [name for name in sorted(os.listdir(settings.DOCUMENT_SOURCE_PATH)) if not name.startswith(".")]
+    for i in range(copies):
+        for name in sources:
+            with open(os.path.join(settings.DOCUMENT_SOURCE_PATH, name), encoding="utf-8") as f:
+                text = f.read()
+            stem, ext = os.path.splitext(name)
+            with open(os.path.join(target, f"{stem}-{i:04d}{ext}"), "w", encoding="utf-8") as f:
+                f.write(f"{text}\n\nنسخه {i}\n")
+    return copies * len(sources)
+
+
+def run_single(args) -> None:
+    """One ingestion in this process; prints its stats as JSON on the last line."""
+    from ingest import ingest_data
+    from utils.embeddings import HashedNgramEmbeddings
+    settings.INGEST_PARSE_CACHE_PATH = args.cache
+    stats = ingest_data(
+        source_path=args.corpus, persist_directory=args.store, embeddings=HashedNgramEmbeddings(),
+        loader_cls=CpuBoundTextLoader, loader_kwargs={"encoding": "utf-8", "parse_cost_ms": args.parse_cost_ms},
+        workers=args.workers, use_parse_cache=True,
+    )
+    print(json.dumps(stats))
+
+
+def run_config(label: str, corpus: str, cache: str, workdir: str, workers: int, parse_cost_ms: float) -> dict:
+    store = tempfile.mkdtemp(dir=workdir)
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.ingest_throughput", "--single", "--corpus", corpus, "--store", store,
+         "--cache", cache, "--workers", str(workers), "--parse-cost-ms", str(parse_cost_ms)],
+        cwd=settings.PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{label} failed:\n{result.stderr[-3000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=50, help="copies of data/ in the corpus")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--parse-cost-ms", type=float, default=50, help="simulated parse CPU time per file")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--cache", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        return run_single(args)
+
+    with tempfile.TemporaryDirectory(prefix="hr-ingest-") as workdir:
+        corpus, cache = os.path.join(workdir, "corpus"), os.path.join(workdir, "parse_cache")
+        os.makedirs(corpus)
+        files = make_corpus(corpus, args.copies)
+        print(f"{files} files, {args.parse_cost_ms:.0f} ms simulated parse CPU per file, {os.cpu_count()} CPUs\n")
+        print(f"{'configuration':<22}{'files/s':>9}{'seconds':>9}{'chunks':>8}{'peak RSS MB':>13}{'workers MB':>12}")
+        configs = [("cold, 1 worker", 1), (f"cold, {args.workers} workers", args.workers),
+                   (f"warm, {args.workers} workers", args.workers)]
+        for label, workers in configs:
+            if label.startswith("cold"):
+                shutil.rmtree(cache, ignore_errors=True)
+            stats = run_config(label, corpus, cache, workdir, workers, args.parse_cost_ms)
+            print(f"{label:<22}{stats['files_per_second']:>9.1f}{stats['seconds']:>9.2f}{stats['chunks']:>8}"
+                  f"{stats['peak_rss_mb']:>13.0f}{stats['peak_worker_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
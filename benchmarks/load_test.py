@@ -0,0 +1,297 @@
+"""
+End-to-end load test: simulated candidates driving the real app.py handlers.
+
+Every simulated session goes through the registered Chainlit handlers as the UI would:
+the OTP login (with onboarding for new candidates), the welcome job list, free-text
+turns, a click on a job's details button, the apply button on that job, and a feedback
+rating. Chainlit's emitter is replaced by one that answers the app's questions and
+records what it is sent. The chat model is benchmarks/fake_llm.py with a simulated
+latency (admitted through the real LLM scheduler), embeddings are the local provider
+(utils/embeddings.py, no API calls), and NocoDB and the SMS webhook are benchmarks/fake_nocodb.py.
+
+At each concurrency level it reports p50/p99 latency per stage, turn throughput,
+event-loop lag and resident memory.
+
+Run from the project root:
+    python -m benchmarks.load_test [--concurrency 1 5 10 25 50] [--turns 4]
+        [--llm-latency 0.8] [--nocodb-latency 0.05] [--think-time 0]
+"""
+import os
+
+# Settings refuse to load without these; nothing here talks to the real services.
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+os.environ.setdefault("NOCODB_API_TOKEN", "load-test")
+
+import argparse
+import asyncio
+import importlib
+import random
+import re
+import resource
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from chainlit.config import config as chainlit_config
+from chainlit.context import ChainlitContext, context_var
+from chainlit.emitter import BaseChainlitEmitter
+from chainlit.session import HTTPSession
+from langchain_community.document_loaders import TextLoader
+from langchain_core.messages import AIMessage
+
+from benchmarks.eval_router import TURNS
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.fake_nocodb import FakeNocoDB
+from config import settings
+from utils import metrics
+from utils.llm_scheduler import SchedulerRateLimiter, TokenUsageHandler, get_llm_scheduler
+
+STAGES = ["login", "turn", "first_token", "view_details", "apply", "feedback"]
+MESSAGES = [turn[0] for turn in TURNS]
+REPLY = "بر اساس اطلاعات موجود، پاسخ سوال شما آماده است. " * 6
+
+# --- Fakes ---
+
+# The arguments the stub model passes to each tool, from the ids in the agent input.
+_TOOL_ARGS = {
+    "query_knowledge_base": lambda query, ids: {"query": query},
+    "get_open_job_positions": lambda query, ids: {},
+    "get_job_details": lambda query, ids: {"position_id": str(ids["job"])},
+    "apply_for_job_position": lambda query, ids: {"position_id": ids["job"], "candidate_id": ids["candidate"]},
+    "get_application_status": lambda query, ids: {"phone_number": ids["phone"]},
+    "recommend_jobs": lambda query, ids: {"candidate_id": ids["candidate"]},
+}
+
+
+def agent_policy(messages, tools):
+    """Calls the route's first tool once, then answers. Deterministic, like a well-behaved model."""
+    names = [t["function"]["name"] for t in tools]
+    if not names or messages[-1].type == "tool":
+        return AIMessage(content=REPLY)
+    text = str(messages[-1].content)
+    ids = {
+        "phone": (re.search(r"phone number is (\S+)", text) or [None, ""])[1],
+        "candidate": int((re.search(r"candidate_id is (\d+)", text) or [None, "0"])[1]),
+        "job": int((re.search(r"(?:ID|شناسه)\s*(\d+)", text) or [None, "1"])[1]),
+    }
+    query = text.split("User's query is:", 1)[-1].strip()
+    tool = names[0] if names[0] in _TOOL_ARGS else "query_knowledge_base"
+    return AIMessage(content="", tool_calls=[{"name": tool, "args": _TOOL_ARGS[tool](query, ids), "id": uuid.uuid4().hex}])
+
+
+def make_chat_model(latency: float) -> FakeChatModel:
+    scheduler = get_llm_scheduler()
+    return FakeChatModel(
+        respond=agent_policy, latency=latency, calls=[],
+        rate_limiter=SchedulerRateLimiter(scheduler), callbacks=[TokenUsageHandler(scheduler)],
+    )
+
+
+def load_app(workdir: str, db: FakeNocoDB, args):
+    """Points the settings at the fakes, then imports app.py with its fakes installed."""
+    settings.NOCODB_BASE_URL = db.base_url
+    settings.N8N_SMS_WEBHOOK_URL = db.sms_url
+    settings.VECTOR_STORE_PATH = os.path.join(workdir, "vector_store")
+    settings.INDEX_VERSION_FILE = os.path.join(settings.VECTOR_STORE_PATH, ".index_version")
+    settings.EMBEDDING_PROVIDER = "local"
+    settings.JOB_INDEX_PATH = os.path.join(workdir, "job_index", "jobs.npz")
+    settings.SESSION_STORE_BACKEND = "memory"
+    settings.METRICS_PORT = 0
+    settings.LOG_LEVEL = "WARNING"
+    settings.OTP_GLOBAL_MAX_SENDS_PER_MINUTE = 10 ** 9
+    if args.rpm:
+        settings.LLM_REQUESTS_PER_MINUTE = args.rpm
+
+    import utils.memory as memory
+    from ingest import ingest_data
+    memory.scheduled_chat_model = lambda model, **kwargs: make_chat_model(args.llm_latency)
+    # Markdown is read as plain text: the Unstructured loader needs a model download.
+    ingest_data(loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"}, use_parse_cache=False)
+
+    app = importlib.import_module("app")
+    agents = importlib.import_module("agents")
+    create_executor = agents.create_executor
+    agents.create_executor = lambda route: create_executor(route, llm=make_chat_model(args.llm_latency))
+    return app
+
+
+# --- Simulated Sessions ---
+
+class SimulatedCandidate(BaseChainlitEmitter):
+    """Stands in for the browser: answers the app's questions and records what it is sent."""
+
+    def __init__(self, session, db: FakeNocoDB, phone_number: str, think_time: float):
+        super().__init__(session)
+        self.db = db
+        self.phone_number = phone_number
+        self.think_time = think_time
+        self.actions = []
+        self.errors = 0
+        self.first_token_at = None
+
+    def _answer(self, prompt: str) -> str:
+        if "شماره تلفن" in prompt:
+            return self.phone_number
+        if "کد" in prompt:
+            return re.search(r"\d{6}", self.db.sms_inbox.get(self.phone_number, "")).group(0)
+        if "نام خانوادگی" in prompt:
+            return "آزمایشی"
+        if "نام" in prompt:
+            return "کارجو"
+        if "تخصص" in prompt:
+            return "برنامه‌نویس پایتون"
+        return "۳ سال توسعه نرم‌افزار"
+
+    async def send_ask_user(self, step_dict, spec, raise_on_timeout=False):
+        if self.think_time:
+            await asyncio.sleep(self.think_time)
+        return {"id": str(uuid.uuid4()), "type": "user_message", "output": self._answer(step_dict.get("output", ""))}
+
+    async def emit(self, event, data):
+        if event == "action":
+            self.actions.append(data)
+
+    async def send_step(self, step_dict):
+        self.errors += bool(step_dict.get("isError"))
+
+    async def stream_start(self, step_dict):
+        self.first_token_at = self.first_token_at or time.perf_counter()
+
+    def take_action(self, name: str):
+        import chainlit as cl
+        data = next((a for a in reversed(self.actions) if a["name"] == name), None)
+        return cl.Action(name=name, payload=data["payload"], label=data.get("label", "")) if data else None
+
+
+async def run_session(db: FakeNocoDB, index: int, args, timings: dict, rng: random.Random) -> int:
+    import chainlit as cl
+    phone_number = f"0935{index:07d}"
+    if index % 2:
+        db.add_candidate(phone_number, "کارجو", f"شماره {index}")  # a returning candidate
+    session = HTTPSession(id=str(uuid.uuid4()), client_type="webapp")
+    user = SimulatedCandidate(session, db, phone_number, args.think_time)
+    context_var.set(ChainlitContext(session, user))
+    code = chainlit_config.code
+
+    async def timed(stage, handler, *handler_args):
+        started = time.perf_counter()
+        await handler(*handler_args)
+        timings[stage].append(time.perf_counter() - started)
+
+    await timed("login", code.on_chat_start)
+    for _ in range(args.turns):
+        if args.think_time:
+            await asyncio.sleep(args.think_time)
+        user.first_token_at = None
+        started = time.perf_counter()
+        await timed("turn", code.on_message, cl.Message(content=rng.choice(MESSAGES), author="user"))
+        if user.first_token_at:
+            timings["first_token"].append(user.first_token_at - started)
+
+    for stage, name in (("view_details", "view_job_details"), ("apply", "apply_for_job"), ("feedback", "feedback_good")):
+        if name == "feedback_good":
+            user.actions.append({"name": name, "payload": {}})
+        action = user.take_action(name)
+        if action:
+            await timed(stage, code.action_callbacks[name], action)
+    return user.errors
+
+
+# --- Measurement ---
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(q * len(values) + 0.999999) - 1))] if values else float("nan")
+
+
+def rss_mb() -> float:
+    """Current resident set size; the peak if /proc is not available."""
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+async def run_level(db: FakeNocoDB, concurrency: int, first_index: int, args) -> dict:
+    timings = defaultdict(list)
+    lag = []
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+    rejected_before = metrics.get_value("hr_llm_admissions_total", result="rejected") + \
+        metrics.get_value("hr_llm_admissions_total", result="timeout")
+    started = time.perf_counter()
+    errors = await asyncio.gather(*[
+        run_session(db, first_index + i, args, timings, random.Random(args.seed + first_index + i))
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+    rejected = metrics.get_value("hr_llm_admissions_total", result="rejected") + \
+        metrics.get_value("hr_llm_admissions_total", result="timeout") - rejected_before
+    return {
+        "timings": timings, "elapsed": elapsed, "lag": lag, "errors": sum(errors), "rejected": rejected,
+        "turns": len(timings["turn"]) + len(timings["apply"]),
+    }
+
+
+def report(concurrency: int, result: dict) -> None:
+    print(f"\n=== {concurrency} concurrent sessions "
+          f"({result['elapsed']:.1f}s, {result['turns'] / result['elapsed']:.2f} agent turns/s, "
+          f"RSS {rss_mb():.0f} MB) ===")
+    print(f"{'stage':<14} {'n':>5} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage in STAGES:
+        values = result["timings"].get(stage, [])
+        if values:
+            print(f"{stage:<14} {len(values):>5} {percentile(values, 0.5) * 1000:>9.0f} "
+                  f"{percentile(values, 0.99) * 1000:>9.0f} {max(values) * 1000:>9.0f}")
+    lag = result["lag"]
+    print(f"event-loop lag: p50 {percentile(lag, 0.5) * 1000:.1f} ms, p99 {percentile(lag, 0.99) * 1000:.1f} ms, "
+          f"max {max(lag, default=0) * 1000:.1f} ms")
+    print(f"errors: {result['errors']}, model calls rejected by admission control: {result['rejected']:.0f}")
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory(prefix="hr-load-test-") as workdir:
+        db = FakeNocoDB(latency=args.nocodb_latency, jobs=args.jobs).start()
+        try:
+            load_app(workdir, db, args)
+            if chainlit_config.code.on_app_startup:
+                await chainlit_config.code.on_app_startup()
+            # Traffic starts once the worker reports ready, as behind a readiness probe.
+            from utils import warmup
+            await warmup.wait_until_done()
+            print(f"fake LLM latency {args.llm_latency * 1000:.0f} ms, fake NocoDB latency "
+                  f"{args.nocodb_latency * 1000:.0f} ms, {args.turns} free-text turns per session, "
+                  f"baseline RSS {rss_mb():.0f} MB")
+            first_index = 0
+            for concurrency in args.concurrency:
+                report(concurrency, await run_level(db, concurrency, first_index, args))
+                first_index += concurrency
+        finally:
+            db.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--turns", type=int, default=4, help="free-text turns per session")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per fake model call")
+    parser.add_argument("--nocodb-latency", type=float, default=0.05, help="seconds per fake NocoDB request")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds a user waits before each answer")
+    parser.add_argument("--jobs", type=int, default=8, help="open jobs in the fake NocoDB")
+    parser.add_argument("--rpm", type=int, default=0, help="override LLM_REQUESTS_PER_MINUTE")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
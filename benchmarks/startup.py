@@ -0,0 +1,199 @@
+"""
+Startup profile and time-to-ready of the app.
+
+1. Import profile: `python -X importtime -c "import app"`, summarized as the total
+   import time, the slowest third-party packages (self time) and the app's own modules
+   (cumulative time, including what they import).
+2. Time to ready: starts `chainlit run app.py --headless` and measures how long it takes
+   until the server accepts connections and until the worker reports ready on /ready
+   (after the warmup in utils/warmup.py), plus the duration of each warmup step.
+
+The app runs against benchmarks/fake_nocodb.py and an index of data/ built beforehand with
+the local embeddings, so no network is needed. The OpenAI warmup step fails quickly without it.
+Each run is appended to benchmarks/results/startup_history.jsonl and compared with the
+previous one.
+
+Run from the project root:
+    python -m benchmarks.startup [--runs 3] [--top 15] [--fail-on-regression]
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import requests
+from langchain_community.document_loaders import TextLoader
+
+from benchmarks import history
+from benchmarks.fake_nocodb import FakeNocoDB
+from config import settings
+
+PROJECT_ROOT = settings.PROJECT_ROOT
+HISTORY = "startup_history"
+# Timings are noisy; only a clearly slower start counts as a regression.
+REGRESSION_TOLERANCE = 0.25
+READY_TIMEOUT_SECONDS = 180
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+_WARMUP_STEP_RE = re.compile(r'^hr_warmup_step_seconds\{step="([^"]+)"\} (\S+)$', re.M)
+FIRST_PARTY = ("app", "agents", "auth", "auth_page", "ingest", "ui_components", "config", "tools", "utils")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare(workdir: str, db: FakeNocoDB) -> dict:
+    """Builds the index with the local embeddings; returns the environment for the app processes."""
+    env = {
+        **os.environ,
+        "EMBEDDING_PROVIDER": "local",
+        "VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "JOB_INDEX_PATH": os.path.join(workdir, "job_index", "jobs.npz"),
+        "SESSION_STORE_BACKEND": "memory",
+        "NOCODB_BASE_URL": db.base_url,
+        "NOCODB_API_TOKEN": "startup-benchmark",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "startup-benchmark"),
+        "LOG_LEVEL": "WARNING",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    settings.EMBEDDING_PROVIDER = "local"
+    settings.VECTOR_STORE_PATH = env["VECTOR_STORE_PATH"]
+    settings.INDEX_VERSION_FILE = os.path.join(settings.VECTOR_STORE_PATH, ".index_version")
+    from ingest import ingest_data
+    # Markdown is read as plain text: the Unstructured loader needs a model download.
+    ingest_data(loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"}, use_parse_cache=False)
+    return env
+
+
+# --- Import Profile ---
+
+def import_profile(env: dict) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"importing app failed:\n{result.stderr[-3000:]}")
+    packages, first_party, total = Counter(), {}, 0
+    for self_us, cumulative_us, indent, module in _IMPORTTIME_RE.findall(result.stderr):
+        top = module.split(".")[0]
+        total += int(self_us)
+        if top in FIRST_PARTY:
+            first_party[module] = int(cumulative_us) / 1e6
+        else:
+            packages[top] += int(self_us) / 1e6
+    return {"wall": wall, "imports": total / 1e6, "packages": packages, "first_party": first_party}
+
+
+def print_import_profile(profile: dict, top: int) -> None:
+    print(f"\nimport app: {profile['imports']:.2f}s importing, {profile['wall']:.2f}s process wall time")
+    print(f"\nslowest packages (self time):")
+    for package, seconds in profile["packages"].most_common(top):
+        print(f"  {seconds * 1000:7.0f} ms  {package}")
+    print(f"\napp modules (cumulative):")
+    for module, seconds in sorted(profile["first_party"].items(), key=lambda item: -item[1])[:top]:
+        print(f"  {seconds * 1000:7.0f} ms  {module}")
+
+
+# --- Time To Ready ---
+
+def _listening(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+def _ready(metrics_port: int) -> bool:
+    try:
+        return requests.get(f"http://127.0.0.1:{metrics_port}/ready", timeout=0.5).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def time_to_ready(env: dict) -> dict:
+    """Starts the server and polls until it listens and reports ready."""
+    port, metrics_port = free_port(), free_port()
+    env = {**env, "METRICS_PORT": str(metrics_port)}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "chainlit", "run", "app.py", "--headless", "--port", str(port)],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    listening = ready = None
+    try:
+        while ready is None:
+            elapsed = time.perf_counter() - started
+            if process.poll() is not None:
+                raise RuntimeError(f"the server exited with {process.returncode}:\n{process.stderr.read()[-3000:]}")
+            if elapsed > READY_TIMEOUT_SECONDS:
+                raise RuntimeError(f"the server was not ready after {READY_TIMEOUT_SECONDS}s")
+            if listening is None and _listening(port):
+                listening = elapsed
+            if _ready(metrics_port):
+                ready = elapsed
+                listening = listening or elapsed
+            time.sleep(0.02)
+        scrape = requests.get(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5).text
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    steps = {step: float(value) for step, value in _WARMUP_STEP_RE.findall(scrape)}
+    return {"listening": listening, "ready": ready, "steps": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="server starts to measure (the median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="packages and modules listed in the import profile")
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hr-startup-") as workdir:
+        db = FakeNocoDB().start()
+        try:
+            env = prepare(workdir, db)
+            profile = import_profile(env)
+            print_import_profile(profile, args.top)
+            runs = [time_to_ready(env) for _ in range(args.runs)]
+        finally:
+            db.stop()
+
+    median = lambda key: statistics.median(run[key] for run in runs)
+    timings = {"import_seconds": profile["imports"], "listening_seconds": median("listening"),
+               "ready_seconds": median("ready")}
+    print(f"\n{args.runs} server starts (median): listening after {timings['listening_seconds']:.2f}s, "
+          f"ready after {timings['ready_seconds']:.2f}s")
+    steps = {step: statistics.median(run["steps"].get(step, 0.0) for run in runs) for step in runs[-1]["steps"]}
+    print("warmup steps (median, they run concurrently): " + ", ".join(
+        f"{step} {seconds * 1000:.0f} ms" for step, seconds in sorted(steps.items(), key=lambda item: -item[1])))
+
+    config = {"embeddings": "local", "runs": args.runs}
+    entry = history.new_entry(config, timings=timings, warmup_steps=steps)
+    previous = history.previous_result(HISTORY, config)
+    regressions = []
+    if previous:
+        print(f"\ncompared with {history.describe(previous)}:")
+        regressions = history.compare(timings, previous["timings"], REGRESSION_TOLERANCE, higher_is_better=False)
+    if not args.no_history:
+        history.append_result(HISTORY, entry)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,127 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import queue
 import sys
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+from config import settings
+
+# Context fields (session, candidate, turn) added to every log line emitted while they are set.
+_log_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+# Attributes every LogRecord has; anything else was passed with `extra=` and is logged as a field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "context"}
+
+_listener = None
+_dropped_records = 0
+
+
+@contextmanager
+def log_context(**fields):
+    """Adds fields to every log line emitted inside the block (including threads started from it)."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def update_log_context(**fields) -> None:
+    """Adds fields to the current log context, e.g. once the candidate is known."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def bound(value, max_chars: int = None):
+    """Shortens long strings so one payload cannot flood the log."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    value = value if isinstance(value, str) else str(value)
+    max_chars = max_chars or settings.LOG_MAX_FIELD_CHARS
+    if len(value) <= max_chars:
+        return value
+    return f"{value[:max_chars]}... [{len(value) - max_chars} chars truncated]"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object; quotes and newlines in messages are escaped properly."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "module": record.module,
+            "logger": record.name,
+            "message": bound(record.getMessage()),
+        }
+        entry.update(getattr(record, "context", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = bound(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = bound(record.exc_text, settings.LOG_MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without blocking. The log context is captured
+    here, in the caller's context; the writer thread has none of its own.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.context = _log_context.get()
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block the event loop on a slow stdout; count what was lost instead.
+            _dropped_records += 1
+
+
+def dropped_records() -> int:
+    return _dropped_records
+
 
 def setup_logging():
     """
-    Configures structured logging to standard output.
-    In a containerized environment, logs are typically sent to stdout/stderr
-    and collected by the container orchestrator.
+    Configures JSON logging to standard output through a queue: handlers only enqueue
+    records, and a background thread serializes and writes them. In a containerized
+    environment, stdout is collected by the container orchestrator.
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format='{"timestamp": "%(asctime)s", "level": "%(levelname)s", "module": "%(module)s", "message": "%(message)s"}',
-        stream=sys.stdout, # Log to standard output
-        datefmt='%Y-%m-%dT%H:%M:%S%z'
-    )
-    
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE)
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_ContextQueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL)
+
     # You can also customize the log level for noisy libraries if needed
-    # logging.getLogger("some_library").setLevel(logging.WARNING)
-    
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
     logger = logging.getLogger(__name__)
-    logger.info("Logging configured successfully.")
\ No newline at end of file
+    logger.info("Logging configured successfully.")
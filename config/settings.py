@@ -18,13 +18,168 @@ logger.info(f"PROJECT_ROOT calculated as: {PROJECT_ROOT}")
 # --- LLM & Embedding Model Configuration ---
 OPENAI_API_MODEL = "gpt-5-nano"
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+# "openai" or "local" (hashed character n-grams, no network or API key; see utils/embeddings.py).
+# Changing it requires re-running ingestion.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "2048"))
 N8N_SMS_WEBHOOK_URL = os.getenv("N8N_SMS_WEBHOOK_URL")
+
+# --- Conversation Memory Configuration ---
+# Upper bound (in tokens) for the chat_history sent to the agent on every turn.
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+# Part of the budget reserved for the running summary of older turns.
+MEMORY_SUMMARY_TOKEN_BUDGET = int(os.getenv("MEMORY_SUMMARY_TOKEN_BUDGET", "400"))
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", OPENAI_API_MODEL)
+
+# --- Session State Store ---
+# "memory" keeps state inside the worker process; "sqlite" shares it between
+# all worker processes on the host and survives restarts.
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(PROJECT_ROOT, "session_state", "sessions.db"))
+SESSION_STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL_SECONDS", str(7 * 24 * 3600)))
+# With the "memory" backend, evicted (compacted) sessions still live in the worker and
+# count against no cap, so they are only kept this long.
+SESSION_COMPACTED_TTL_SECONDS = int(os.getenv("SESSION_COMPACTED_TTL_SECONDS", "3600"))
+
+# --- OTP Limits ---
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "180"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "3"))
+OTP_MIN_RESEND_INTERVAL_SECONDS = int(os.getenv("OTP_MIN_RESEND_INTERVAL_SECONDS", "60"))
+OTP_MAX_SENDS_PER_HOUR = int(os.getenv("OTP_MAX_SENDS_PER_HOUR", "5"))
+OTP_GLOBAL_MAX_SENDS_PER_MINUTE = int(os.getenv("OTP_GLOBAL_MAX_SENDS_PER_MINUTE", "60"))
+OTP_SMS_TIMEOUT_SECONDS = float(os.getenv("OTP_SMS_TIMEOUT_SECONDS", "10"))
+
+# --- Active Session Limits ---
+# Sessions idle for longer than this are compacted (memory folded into its summary,
+# last response dropped) and released from worker memory. They resume from the store.
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+# Global caps per worker; the least recently used sessions are compacted first.
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "500"))
+SESSION_MAX_TOTAL_BYTES = int(os.getenv("SESSION_MAX_TOTAL_BYTES", str(64 * 1024 * 1024)))
+
 # --- Vector Store Configuration ---
-VECTOR_STORE_PATH = os.path.join(PROJECT_ROOT, "vectorstore")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(PROJECT_ROOT, "vectorstore"))
 DOCUMENT_SOURCE_PATH = os.path.join(PROJECT_ROOT, "data")
+# Names the served collection and its version. Rewritten when an ingestion completes;
+# caches derived from the index are invalidated by the version.
+INDEX_VERSION_FILE = os.path.join(VECTOR_STORE_PATH, ".index_version")
+# Per-request checks re-read it at most this often (a re-ingestion in another process is seen this late).
+INDEX_VERSION_CHECK_SECONDS = float(os.getenv("INDEX_VERSION_CHECK_SECONDS", "5"))
+# Degraded mode: with the openai provider, ingestion also builds an index with the local
+# embeddings, and retrieval uses it for a while when the embeddings API is unavailable.
+EMBEDDING_FALLBACK_ENABLED = os.getenv("EMBEDDING_FALLBACK_ENABLED", "true").lower() == "true"
+FALLBACK_VECTOR_STORE_PATH = os.getenv("FALLBACK_VECTOR_STORE_PATH", os.path.join(PROJECT_ROOT, "vectorstore_local"))
+EMBEDDING_FALLBACK_COOLDOWN_SECONDS = int(os.getenv("EMBEDDING_FALLBACK_COOLDOWN_SECONDS", "60"))
 
 logger.info(f"VECTOR_STORE_PATH is set to: {VECTOR_STORE_PATH}")
 
+# --- Ingestion ---
+# Documents are parsed in this many worker processes (Unstructured's PDF parsing is CPU-bound).
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Parsed files waiting to be chunked, and chunks embedded per request; these bound the memory used.
+INGEST_MAX_PENDING_FILES = int(os.getenv("INGEST_MAX_PENDING_FILES", str(2 * INGEST_WORKERS)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+# Parsed files, keyed by content hash; re-ingestion only parses files that changed.
+INGEST_PARSE_CACHE_PATH = os.getenv("INGEST_PARSE_CACHE_PATH", os.path.join(PROJECT_ROOT, "ingest_cache"))
+
+# --- Job Listing ---
+# How long the list of open positions is served from cache before NocoDB is queried again.
+JOB_CATALOG_TTL_SECONDS = int(os.getenv("JOB_CATALOG_TTL_SECONDS", "300"))
+# Jobs shown per page in the welcome listing.
+JOB_LIST_PAGE_SIZE = int(os.getenv("JOB_LIST_PAGE_SIZE", "10"))
+
+# --- Job Recommendations ---
+# Embeddings of the open job descriptions, re-synced with NocoDB at this interval
+# (only jobs whose text changed are embedded again).
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", os.path.join(PROJECT_ROOT, "job_index", "jobs.npz"))
+JOB_INDEX_SYNC_SECONDS = int(os.getenv("JOB_INDEX_SYNC_SECONDS", "300"))
+# After a failed sync (NocoDB or the embeddings unavailable), the next attempt waits this long.
+JOB_INDEX_RETRY_SECONDS = int(os.getenv("JOB_INDEX_RETRY_SECONDS", "60"))
+JOB_RECOMMENDATION_TOP_K = int(os.getenv("JOB_RECOMMENDATION_TOP_K", "5"))
+
+# --- Semantic Answer Cache ---
+# Answers to generic knowledge-base questions are reused for semantically
+# equivalent questions (cosine similarity of the question embeddings).
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.93"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+# --- Warm Start ---
+# `python -m utils.warm_start` mines the feedback table and the JSON logs for frequent,
+# well-rated knowledge-base questions and saves their embeddings, retrieved context and
+# approved answers here; warmup loads the snapshot into the caches (see utils/warm_start.py).
+WARM_START_SNAPSHOT_PATH = os.getenv("WARM_START_SNAPSHOT_PATH", os.path.join(PROJECT_ROOT, "warm_start", "snapshot.npz"))
+WARM_START_MAX_QUESTIONS = int(os.getenv("WARM_START_MAX_QUESTIONS", "200"))
+# Questions asked (or rated) fewer times than this are not worth a snapshot entry.
+WARM_START_MIN_COUNT = int(os.getenv("WARM_START_MIN_COUNT", "2"))
+# Word overlap a knowledge-base tool query needs with a snapshot question to reuse its context.
+WARM_START_QUERY_MATCH_THRESHOLD = float(os.getenv("WARM_START_QUERY_MATCH_THRESHOLD", "0.7"))
+
+# --- Speculative Retrieval ---
+# When enabled, knowledge-base retrieval for the user's message starts together with
+# the first LLM call; the agent's tool call reuses it if its query is similar enough.
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.5"))
+SPECULATIVE_RETRIEVAL_WORKERS = int(os.getenv("SPECULATIVE_RETRIEVAL_WORKERS", "4"))
+
+# --- Batch Retrieval ---
+# query_knowledge_base_batch answers the parts of a compound question in one call: one
+# embedding request, one matrix product against the index, then MMR selection.
+KB_BATCH_MAX_QUERIES = int(os.getenv("KB_BATCH_MAX_QUERIES", "5"))
+KB_BATCH_CHUNKS_PER_QUERY = int(os.getenv("KB_BATCH_CHUNKS_PER_QUERY", "3"))
+# Best-scoring chunks per query that MMR chooses from.
+KB_BATCH_CANDIDATES = int(os.getenv("KB_BATCH_CANDIDATES", "12"))
+# 0 ranks by relevance only; higher values trade relevance for chunks unlike those already chosen.
+KB_MMR_DIVERSITY = float(os.getenv("KB_MMR_DIVERSITY", "0.3"))
+
+# --- LLM Admission Control ---
+# Process-wide limits shared by all chat and embedding calls (set them a little below
+# the provider's limits). Calls beyond them wait in a priority queue; when the queue
+# is full or a call waits too long, the user is asked to try again shortly.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "450"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "180000"))
+LLM_QUEUE_MAX_SIZE = int(os.getenv("LLM_QUEUE_MAX_SIZE", "100"))
+LLM_QUEUE_MAX_WAIT_SECONDS = float(os.getenv("LLM_QUEUE_MAX_WAIT_SECONDS", "20"))
+
+# --- Tool Output Budgets ---
+# Maximum tokens a tool may return to the agent. Tool outputs are re-sent to the model
+# on every later step, so long records and retrieved context are trimmed to these limits.
+TOOL_OUTPUT_DEFAULT_TOKEN_BUDGET = int(os.getenv("TOOL_OUTPUT_DEFAULT_TOKEN_BUDGET", "600"))
+TOOL_OUTPUT_TOKEN_BUDGETS = {
+    "get_job_details": int(os.getenv("JOB_DETAILS_TOKEN_BUDGET", "500")),
+    "query_knowledge_base": int(os.getenv("KNOWLEDGE_BASE_TOKEN_BUDGET", "700")),
+    # Shared by all the queries of one call.
+    "query_knowledge_base_batch": int(os.getenv("KNOWLEDGE_BASE_BATCH_TOKEN_BUDGET", "1400")),
+}
+# Job fields the agent sees from get_job_details (the UI renders the full record).
+JOB_DETAILS_AGENT_FIELDS = ("Id", "Title", "Status", "Description", "FullDescription")
+
+# --- Observability ---
+# Prometheus metrics (per-stage latency percentiles, token counts, cache hits) are
+# served on http://METRICS_HOST:METRICS_PORT/metrics. Set METRICS_PORT=0 to disable.
+# All interfaces by default, so container and kubelet probes can reach /ready.
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Several workers on one host each take the first free port from METRICS_PORT on,
+# trying this many; every worker logs the port it serves on.
+METRICS_PORT_ATTEMPTS = int(os.getenv("METRICS_PORT_ATTEMPTS", "8"))
+
+# --- Startup ---
+# Before a worker reports ready on http://METRICS_HOST:METRICS_PORT/ready it opens the
+# vector store and connects to NocoDB and OpenAI (see utils/warmup.py). Each step may
+# take this long; a step that fails or times out is logged and skipped.
+WARMUP_STEP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_STEP_TIMEOUT_SECONDS", "15"))
+
+# --- Logging ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Records waiting for the background writer; when full, new records are dropped rather than blocking.
+LOG_QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+# Longer messages and extra fields (payloads, responses) are truncated to this many characters.
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+# Share of agent turns whose prompts, tool calls and outputs are logged in full (0 disables).
+AGENT_TRACE_SAMPLE_RATE = float(os.getenv("AGENT_TRACE_SAMPLE_RATE", "0.02"))
+
 # --- API Keys & Base URL (loaded from .env) ---
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 NOCODB_API_TOKEN = os.getenv("NOCODB_API_TOKEN")
@@ -71,6 +226,19 @@ HIRING_RECORD_FIELD_MAP = {
     "Title": "عنوان" 
 }
 
+# Foreign-key columns NocoDB generates for the HiringRecords links. They are
+# written when a hiring record is created and used to filter by candidate.
+HIRING_RECORD_LINK_FIELDS = {
+    "CandidateId": "nc__0jr___کاندیدها_id",
+    "JobOpportunityId": "nc__0jr___فرصت های شغلی_id"
+}
+
+# Relation fields whose value is a nested record of another table (internal key -> table name).
+HIRING_RECORD_RELATIONS = {
+    "Candidate": "Candidates",
+    "JobOpportunity": "JobOpportunities"
+}
+
 FEEDBACK_FIELD_MAP = {
     "User": "کاربر", 
     "Query": "پبام",       # Maps to "Message" in the API
@@ -79,8 +247,16 @@ FEEDBACK_FIELD_MAP = {
 }
 
 # --- Sanity Checks ---
-if not OPENAI_API_KEY:
-    raise ValueError("FATAL ERROR: OPENAI_API_KEY is not set in the .env file.")
+def validate():
+    """
+    Raises ValueError if a required setting is missing. Called by the app and the ingestion
+    script at startup rather than on import, so tests and benchmarks can import the settings.
+    """
+    if not OPENAI_API_KEY:
+        if EMBEDDING_PROVIDER == "openai":
+            raise ValueError("FATAL ERROR: OPENAI_API_KEY is not set in the .env file.")
+        # Local embeddings work without it (ingestion, retrieval); chat calls will not.
+        logger.warning("OPENAI_API_KEY is not set; only the local embedding provider is usable.")
 
-if not NOCODB_API_TOKEN:
-    raise ValueError("FATAL ERROR: NOCODB_API_TOKEN is not set in the .env file.")
\ No newline at end of file
+    if not NOCODB_API_TOKEN:
+        raise ValueError("FATAL ERROR: NOCODB_API_TOKEN is not set in the .env file.")
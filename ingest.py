@@ -1,64 +1,369 @@
+import hashlib
+import json
+import multiprocessing
 import os
-from langchain_openai import OpenAIEmbeddings
+import resource
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
-from langchain_chroma import Chroma
+from langchain_community.document_loaders import UnstructuredFileLoader
+from langchain_core.documents import Document
 
 # Import settings from our centralized config file
 from config import settings
+from utils import embeddings as embedding_providers
+from utils.index_version import LEGACY_COLLECTION, bump_index_version, index_version_file, read_index_state
+from utils.llm_scheduler import PRIORITY_INGESTION, llm_priority
+from utils.text_normalizer import normalize_text
+
+# Ingestion is a pipeline that never holds the whole corpus in memory:
+#   files -> parse (process pool, or the parse cache) -> normalize and chunk -> batches -> index
+# Parsing (Unstructured: PDFs, OCR) is CPU-bound, so it runs in worker processes. At most
+# INGEST_MAX_PENDING_FILES parsed files wait for the chunker, and chunks are embedded and
+# written in batches of INGEST_BATCH_SIZE, so memory stays bounded however large the corpus.
+
+# --- Parsing ---
+
+def list_source_files(source_path: str) -> list:
+    """Every file under `source_path` (hidden files excluded), in a stable order."""
+    paths = []
+    for root, dirs, names in os.walk(source_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        paths.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith("."))
+    return paths
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def try_file_hash(path: str) -> str | None:
+    try:
+        return file_hash(path)
+    except OSError:
+        return None  # Unreadable; parsing it reports the error.
 
-def ingest_data():
+
+def loader_id(loader_cls, loader_kwargs: dict) -> str:
+    return f"{loader_cls.__module__}.{loader_cls.__qualname__}:{json.dumps(loader_kwargs, sort_keys=True)}"
+
+
+def content_version(source_path: str, hashes: dict, embedding_model: str, **params) -> str:
+    """
+    The version of an index of these files (path -> content hash) built with this
+    embedding model and these parameters. Identical rebuilds, e.g. at every start of a
+    container without a persistent vector store, keep the version, and with it the
+    caches derived from the index (answer cache, warm-start snapshot).
+    """
+    record = {
+        "files": [[os.path.relpath(path, source_path), content_hash] for path, content_hash in hashes.items()],
+        "embedding_model": embedding_model,
+        **params,
+    }
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def parse_file(path: str, loader_cls, loader_kwargs: dict) -> list:
+    """Parses one file into (text, metadata) pairs. Runs in a worker process."""
+    return [(doc.page_content, doc.metadata) for doc in loader_cls(path, **loader_kwargs).load()]
+
+
+class ParseCache:
+    """
+    Parsed files on disk, keyed by the file's content hash and the loader that parsed
+    it, so re-ingesting only parses files that changed. One JSON file per entry.
+    """
+
+    def __init__(self, path: str, loader_cls, loader_kwargs: dict):
+        self.path = path
+        self._loader_key = hashlib.sha256(loader_id(loader_cls, loader_kwargs).encode("utf-8")).hexdigest()[:16]
+
+    def _entry_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, f"{content_hash}-{self._loader_key}.json")
+
+    def get(self, content_hash: str) -> list | None:
+        try:
+            with open(self._entry_path(content_hash), encoding="utf-8") as f:
+                return [tuple(element) for element in json.load(f)]
+        except (OSError, ValueError):
+            return None
+
+    def put(self, content_hash: str, elements: list) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        entry_path = self._entry_path(content_hash)
+        tmp_path = f"{entry_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(elements, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, entry_path)
+
+
+def iter_parsed_files(paths: list, loader_cls, loader_kwargs: dict, cache: ParseCache | None,
+                      workers: int, max_pending: int, stats: dict, hashes: dict = None):
+    """
+    Yields (path, elements) for every file, in order. Cached files are read from the
+    cache; the others are parsed in a pool of `workers` processes, with at most
+    `max_pending` files submitted ahead of the consumer. `hashes` are the files' content
+    hashes, if already computed.
+    """
+    pending = deque()  # (path, content hash, future or cached elements), in file order
+    pool = None
+    try:
+        for path in paths:
+            content_hash = hashes[path] if hashes else try_file_hash(path)
+            elements = cache.get(content_hash) if cache and content_hash else None
+            if elements is not None:
+                stats["cached_files"] += 1
+                pending.append((path, content_hash, elements))
+            elif workers > 1:
+                if pool is None:
+                    # "spawn": the app may call this from a thread, and forking a threaded process is unsafe.
+                    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                pending.append((path, content_hash, pool.submit(parse_file, path, loader_cls, loader_kwargs)))
+            else:
+                pending.append((path, content_hash, None))
+            while len(pending) >= max_pending:
+                yield _finish_parse(*pending.popleft(), loader_cls, loader_kwargs, cache, stats)
+        while pending:
+            yield _finish_parse(*pending.popleft(), loader_cls, loader_kwargs, cache, stats)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def _finish_parse(path, content_hash, work, loader_cls, loader_kwargs, cache, stats):
+    if isinstance(work, list):
+        return path, work
+    try:
+        elements = work.result() if work is not None else parse_file(path, loader_cls, loader_kwargs)
+    except Exception as e:
+        # One unreadable file must not stop the ingestion of the others.
+        print(f"Error loading file {path}: {e}")
+        stats["failed_files"] += 1
+        return path, []
+    stats["parsed_files"] += 1
+    if cache and content_hash:
+        cache.put(content_hash, elements)
+    return path, elements
+
+
+# --- Indexing ---
+
+class IndexWriter:
+    """
+    Builds a new Chroma collection in `persist_directory`, in batches, next to the one
+    being served. publish() makes it the served one: the directory's version file is
+    rewritten to name it, and only then are older collections dropped. Until then readers
+    keep the previous index, and a run that fails leaves it untouched.
+    """
+
+    def __init__(self, embeddings, persist_directory: str, batch_size: int = None):
+        import chromadb
+        from langchain_chroma import Chroma
+        self.persist_directory = persist_directory
+        self.collection = f"index-{uuid.uuid4().hex}"
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.store = Chroma(client=self.client, collection_name=self.collection, embedding_function=embeddings)
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self._buffer = []
+
+    def add(self, chunks: list) -> None:
+        self._buffer.extend(chunks)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self.store.add_documents(batch)
+
+    def close(self) -> None:
+        if self._buffer:
+            self.store.add_documents(self._buffer)
+            self._buffer = []
+
+    def publish(self, version: str = None, sources: str = None) -> str:
+        """Writes the last batch and serves the new collection. Returns its version."""
+        self.close()
+        path = index_version_file(self.persist_directory)
+        previous = read_index_state(path)
+        version = bump_index_version(self.collection, version, path, sources)
+        # Other processes switch over up to INDEX_VERSION_CHECK_SECONDS later, so the
+        # collection just replaced stays until the next publish. Older ones, and those
+        # of runs that failed, are dropped.
+        keep = {self.collection, previous["collection"] if previous else None}
+        for collection in self.client.list_collections():
+            if collection.name not in keep:
+                self.client.delete_collection(collection.name)
+        return version
+
+    def discard(self) -> None:
+        """Drops the unpublished collection; the served index is untouched."""
+        self.client.delete_collection(self.collection)
+
+
+def build_index(texts: list, embeddings, persist_directory: str) -> str:
+    """Builds an index of `texts` and serves it from `persist_directory`, replacing the previous one. Returns its version."""
+    writer = IndexWriter(embeddings, persist_directory)
+    writer.add(texts)
+    return writer.publish()
+
+
+def open_index(persist_directory: str, embeddings):
+    """The served index of `persist_directory`."""
+    from langchain_chroma import Chroma
+    state = read_index_state(index_version_file(persist_directory))
+    collection = state["collection"] if state else LEGACY_COLLECTION
+    return Chroma(collection_name=collection, persist_directory=persist_directory, embedding_function=embeddings)
+
+
+def peak_rss_mb() -> tuple:
+    """Peak resident memory of this process and of its largest finished worker (Linux reports KiB)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, workers / 1024
+
+
+def ingest_data(source_path: str = None, persist_directory: str = None, embeddings=None,
+                loader_cls=UnstructuredFileLoader, loader_kwargs: dict = None,
+                chunk_size: int = 1000, chunk_overlap: int = 200,
+                workers: int = None, use_parse_cache: bool = True) -> dict:
     """
     Loads documents from the source directory, splits them into chunks,
     creates embeddings, and stores them in a Chroma vector database.
+
+    The defaults build the app's index from settings, with the embeddings of
+    settings.EMBEDDING_PROVIDER, and the local fallback index for degraded mode (see
+    utils/embeddings.py). If the embeddings API is unavailable, the fallback index is
+    still built and the app starts degraded. The parameters let benchmarks build
+    throwaway indexes with other loaders, chunking, embeddings or parallelism.
+    Returns counts (files, documents, chunks), throughput and peak memory.
     """
+    source_path = source_path or settings.DOCUMENT_SOURCE_PATH
+    persist_directory = persist_directory or settings.VECTOR_STORE_PATH
+    loader_kwargs = loader_kwargs or {}
+    workers = workers or settings.INGEST_WORKERS
+    started = time.monotonic()
     print("Starting data ingestion process...")
 
-    # --- CHANGED: The logic is now much simpler ---
-    # We tell the DirectoryLoader to use the UnstructuredFileLoader for any
-    # file it finds. Unstructured handles MD, TXT, PDF, and more automatically.
-    loader = DirectoryLoader(
-        settings.DOCUMENT_SOURCE_PATH,
-        glob="**/*.*", # Load all files in the directory
-        loader_cls=UnstructuredFileLoader,
-        show_progress=True,
-        use_multithreading=True
-    )
-
-    documents = loader.load()
-    if not documents:
+    # Unstructured handles MD, TXT, PDF, and more automatically.
+    paths = list_source_files(source_path)
+    if not paths:
         print("No documents found in the source directory. Exiting.")
-        return
-
-    print(f"Loaded {len(documents)} documents.")
+        return {"files": 0, "documents": 0, "chunks": 0}
+    hashes = {path: try_file_hash(path) for path in paths}
+    cache = ParseCache(settings.INGEST_PARSE_CACHE_PATH, loader_cls, loader_kwargs) if use_parse_cache else None
+    stats = {"cached_files": 0, "parsed_files": 0, "failed_files": 0}
+    print(f"Found {len(paths)} files; parsing with {workers} worker processes.")
 
     # Split documents into smaller chunks for better retrieval
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000, 
-        chunk_overlap=200
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
     )
-    texts = text_splitter.split_documents(documents)
-    print(f"Split documents into {len(texts)} chunks.")
 
-    # Initialize the OpenAI embedding model
-    embeddings = OpenAIEmbeddings(
-        model=settings.OPENAI_EMBEDDING_MODEL,
-        openai_api_key=settings.OPENAI_API_KEY
-    )
+    def version_for(embedding_model: str | None) -> str:
+        return content_version(source_path, hashes, embedding_model, loader=loader_id(loader_cls, loader_kwargs),
+                               chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    # The versions of indexes built with embeddings passed in (benchmarks) are random.
+    primary_version = version_for(embedding_providers.embedding_model_name()) if embeddings is None else None
+    # The same for both indexes of a run: see utils/warmup.py::index_needs_ingestion.
+    sources = version_for(None)
+
+    # The app's index also gets the local fallback index: it needs no network.
+    app_index = embeddings is None and persist_directory == settings.VECTOR_STORE_PATH
+    fallback = None
+    if app_index and embedding_providers.fallback_enabled():
+        print(f"Building local fallback index at {settings.FALLBACK_VECTOR_STORE_PATH}...")
+        local_embeddings = embedding_providers.get_embeddings(embedding_providers.PROVIDER_LOCAL)
+        fallback = IndexWriter(local_embeddings, settings.FALLBACK_VECTOR_STORE_PATH)
+
+    # Remote embedding calls share the app's rate limits at the lowest priority
+    if embeddings is None:
+        embeddings = embedding_providers.get_embeddings()
 
     print("Creating vector store and generating embeddings... (This may take a moment)")
-    # Create and persist the Chroma vector store
-    db = Chroma.from_documents(
-        texts, 
-        embeddings, 
-        persist_directory=settings.VECTOR_STORE_PATH
-    )
-    
+    documents = chunks = 0
+    degraded = False
+    primary = None
+
+    def write_primary(write, *args):
+        """Writes to the main index; with a fallback index, an unavailable API only stops this one."""
+        nonlocal primary, degraded
+        try:
+            write(*args)
+        except Exception as e:
+            if not (fallback and embedding_providers.is_unavailable_error(e)):
+                raise
+            print(f"Embeddings API unavailable ({e}); continuing with the local fallback index only.")
+            primary.discard()
+            primary, degraded = None, True
+
+    try:
+        with llm_priority(PRIORITY_INGESTION):
+            primary = IndexWriter(embeddings, persist_directory)
+            for path, elements in iter_parsed_files(paths, loader_cls, loader_kwargs, cache, workers,
+                                                    settings.INGEST_MAX_PENDING_FILES, stats, hashes):
+                # Store text in the same normalized form that queries are converted to at retrieval time
+                file_documents = [
+                    Document(page_content=normalize_text(text), metadata={**metadata, "source": path})
+                    for text, metadata in elements
+                ]
+                texts = text_splitter.split_documents(file_documents)
+                documents += len(file_documents)
+                chunks += len(texts)
+                if fallback:
+                    fallback.add(texts)
+                if primary:
+                    write_primary(primary.add, texts)
+            if fallback:
+                fallback.close()
+            if primary:
+                write_primary(primary.close)
+    except BaseException:
+        # Nothing was published: the served indexes are untouched. Drop what this run built.
+        for writer in (primary, fallback):
+            if writer:
+                writer.discard()
+        raise
+
+    elapsed = time.monotonic() - started
+    own_rss, worker_rss = peak_rss_mb()
+    result = {
+        "files": len(paths),
+        "documents": documents,
+        "chunks": chunks,
+        **stats,
+        "seconds": elapsed,
+        "files_per_second": len(paths) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": own_rss,
+        "peak_worker_rss_mb": worker_rss,
+    }
+    print(f"Indexed {documents} documents from {len(paths)} files ({stats['cached_files']} from the parse cache, "
+          f"{stats['failed_files']} failed) into {chunks} chunks.")
+    print(f"{result['files_per_second']:.1f} files/s; peak RSS {own_rss:.0f} MB, workers {worker_rss:.0f} MB.")
+
+    # Each new index replaces the served one only now that it is complete.
+    if fallback:
+        fallback.publish(version_for(embedding_providers.embedding_model_name(embedding_providers.PROVIDER_LOCAL)),
+                         sources)
+    if degraded:
+        # Retrieval uses the fallback index while the API is down, and while the main index
+        # has never been built; the next start retries the ingestion.
+        print("Only the local fallback index was built; the main index was left as it was.")
+        return {**result, "degraded": True}
+    version = primary.publish(primary_version, sources)
+
     print("-----------------------------------------")
     print("Data ingestion complete!")
-    print(f"Vector store created at: {settings.VECTOR_STORE_PATH}")
+    print(f"Vector store created at: {persist_directory} (version {version})")
     print("-----------------------------------------")
+    return result
 
 
 if __name__ == "__main__":
-    ingest_data()
\ No newline at end of file
+    settings.validate()
+    ingest_data()
@@ -0,0 +1,76 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from config import settings
+from utils.answer_cache import SemanticAnswerCache, depends_on_history, is_cacheable_turn
+from utils.index_version import bump_index_version
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / ".index_version"))
+    return SemanticAnswerCache(embeddings=DeterministicFakeEmbedding(size=64), threshold=0.95, max_entries=2)
+
+
+@pytest.mark.asyncio
+async def test_equivalent_question_hits(cache):
+    question = "شرایط عمومی استخدام چیست؟"
+    cache.add(question, "حداقل سن ۱۸ سال ...", await cache.aembed(question))
+
+    assert cache.lookup(await cache.aembed("  شرایط عمومی استخدام  چیست ")) == "حداقل سن ۱۸ سال ..."
+    assert cache.lookup(await cache.aembed("دوره آزمایشی چقدر است؟")) is None
+
+
+@pytest.mark.asyncio
+async def test_reingestion_clears_cache(cache):
+    question = "ساعت کاری چیست؟"
+    cache.add(question, "۸ تا ۱۶", await cache.aembed(question))
+
+    bump_index_version()
+
+    assert cache.lookup(await cache.aembed(question)) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_oldest_entries_are_evicted(cache):
+    for i in range(3):
+        question = f"سوال شماره {i}"
+        cache.add(question, f"پاسخ {i}", await cache.aembed(question))
+
+    assert len(cache) == 2
+    assert cache.lookup(await cache.aembed("سوال شماره 0")) is None
+    assert cache.lookup(await cache.aembed("سوال شماره 2")) == "پاسخ 2"
+
+
+def test_only_knowledge_base_turns_are_cacheable():
+    assert is_cacheable_turn({"query_knowledge_base"})
+    assert not is_cacheable_turn(set())
+    assert not is_cacheable_turn({"get_open_job_positions"})
+    assert not is_cacheable_turn({"query_knowledge_base", "get_application_status"})
+
+
+def test_follow_ups_are_not_cached_mid_conversation():
+    assert depends_on_history("و برای کارآموزها چطور؟", has_history=True)
+    assert depends_on_history("What about the second one?", has_history=True)
+    assert depends_on_history("شرایطش چیه؟", has_history=True)
+    assert not depends_on_history("شرایط عمومی استخدام در شرکت چیست؟", has_history=True)
+    # Without a conversation there is nothing to refer to.
+    assert not depends_on_history("و برای کارآموزها چطور؟", has_history=False)
+
+
+def test_index_version_is_reread_on_a_timer(tmp_path, monkeypatch):
+    from utils import index_version
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / ".index_version"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_CHECK_SECONDS", 3600)
+    assert index_version.current_index_version() is None
+
+    # Another process re-ingests: not seen until the next check...
+    (tmp_path / ".index_version").write_text("v2", encoding="utf-8")
+    assert index_version.current_index_version() is None
+    monkeypatch.setattr(settings, "INDEX_VERSION_CHECK_SECONDS", 0)
+    assert index_version.current_index_version() == "v2"
+    # ...while a re-ingestion in this process is seen at once.
+    monkeypatch.setattr(settings, "INDEX_VERSION_CHECK_SECONDS", 3600)
+    version = index_version.bump_index_version()
+    assert index_version.current_index_version() == version
@@ -0,0 +1,52 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from config import settings
+from ingest import build_index, open_index
+from tools import rag_tool
+from utils import embeddings
+
+
+class CountingEmbeddings(embeddings.HashedNgramEmbeddings):
+    calls = 0
+
+    def embed_documents(self, texts):
+        CountingEmbeddings.calls += 1
+        return super().embed_documents(texts)
+
+
+def test_mmr_skips_near_duplicates_and_chunks_already_selected():
+    matrix = np.array([[1.0, 0.0], [0.995, 0.0998], [0.6, 0.8], [0.0, 1.0]], dtype=np.float32)
+    scores = np.array([1.0, 0.99, 0.6, 0.0], dtype=np.float32)
+    candidates = np.arange(4)
+
+    assert rag_tool.mmr_select(scores, matrix, candidates, 2, [], diversity=0.0) == [0, 1]
+    assert rag_tool.mmr_select(scores, matrix, candidates, 2, [], diversity=0.5) == [0, 2]
+    assert rag_tool.mmr_select(scores, matrix, candidates, 2, [0, 2], diversity=0.0) == [1, 3]
+
+
+def test_batch_search_embeds_once_and_returns_each_chunk_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / ".index_version"))
+    texts = [
+        "ساعت کاری شرکت از ۸ صبح تا ۴ بعدازظهر است.",
+        "بیمه تکمیلی برای همه کارکنان و خانواده آنها فراهم است.",
+        "دوره آزمایشی قرارداد سه ماه است.",
+        "امکان دورکاری دو روز در هفته وجود دارد.",
+    ]
+    local = CountingEmbeddings()
+    build_index([Document(page_content=text) for text in texts], local, str(tmp_path / "index"))
+    store = open_index(str(tmp_path / "index"), local)
+    monkeypatch.setattr(rag_tool, "get_vector_store", lambda: store)
+    monkeypatch.setattr(embeddings, "fallback_enabled", lambda: False)
+
+    CountingEmbeddings.calls = 0
+    results = rag_tool.search_documents_batch(["ساعت کاری", "بیمه تکمیلی", "ساعت کاری شرکت"], k=1)
+
+    assert CountingEmbeddings.calls == 1
+    assert results[0][0].page_content == texts[0]
+    assert results[1][0].page_content == texts[1]
+    # The best match for the third query was already returned for the first.
+    assert results[2][0].page_content != texts[0]
+
+    context = rag_tool.query_knowledge_base_batch.invoke({"queries": ["ساعت کاری", "بیمه تکمیلی"]})
+    assert 'Retrieved context for "ساعت کاری"' in context and texts[1] in context
@@ -0,0 +1,88 @@
+import httpx
+import numpy as np
+import openai
+import pytest
+from langchain_core.documents import Document
+
+from config import settings
+from ingest import build_index
+from tools import rag_tool
+from utils import embeddings
+from utils.index_version import bump_index_version
+
+
+def cosine(a, b):
+    return float(np.dot(a, b))
+
+
+def test_local_embeddings_are_deterministic_and_normalized():
+    local = embeddings.HashedNgramEmbeddings(dimensions=512)
+    first = local.embed_query("مزایای شغلی شرکت چیست؟")
+
+    assert first == embeddings.HashedNgramEmbeddings(dimensions=512).embed_query("مزایای شغلی شرکت چیست؟")
+    assert first == local.embed_query("مزاياي شغلي شركت چيست")  # Arabic letter forms, no punctuation
+    assert np.linalg.norm(first) == pytest.approx(1.0)
+
+    related = local.embed_query("مزایای شغلی کارکنان")
+    unrelated = local.embed_query("ساعت کاری دفتر تهران")
+    assert cosine(first, related) > cosine(first, unrelated)
+
+
+class UnavailableStore:
+    calls = 0
+
+    def similarity_search(self, query, k):
+        UnavailableStore.calls += 1
+        raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+def test_retrieval_falls_back_to_local_index_while_api_is_down(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", embeddings.PROVIDER_OPENAI)
+    monkeypatch.setattr(settings, "FALLBACK_VECTOR_STORE_PATH", str(tmp_path / "local"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / ".index_version"))
+    monkeypatch.setattr(rag_tool, "get_vector_store", UnavailableStore)
+    bump_index_version()  # the main index is complete
+    build_index(
+        [Document(page_content="ساعت کاری شرکت از ۸ تا ۱۶ است."), Document(page_content="بیمه تکمیلی برای همه")],
+        embeddings.get_embeddings(embeddings.PROVIDER_LOCAL),
+        settings.FALLBACK_VECTOR_STORE_PATH,
+    )
+    embeddings.reset_degraded()
+    try:
+        docs = rag_tool.search_documents("ساعت کاری", k=1)
+        assert docs[0].page_content.startswith("ساعت کاری")
+        assert embeddings.is_degraded()
+
+        # During the cooldown the API is not tried again.
+        rag_tool.search_documents("بیمه", k=1)
+        assert UnavailableStore.calls == 1
+    finally:
+        embeddings.reset_degraded()
+
+
+def test_incomplete_main_index_is_served_from_the_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", embeddings.PROVIDER_OPENAI)
+    monkeypatch.setattr(settings, "FALLBACK_VECTOR_STORE_PATH", str(tmp_path / "local"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / ".index_version"))
+    monkeypatch.setattr(rag_tool, "get_vector_store", UnavailableStore)
+    build_index([Document(page_content="ساعت کاری شرکت از ۸ تا ۱۶ است.")],
+                embeddings.get_embeddings(embeddings.PROVIDER_LOCAL), settings.FALLBACK_VECTOR_STORE_PATH)
+    embeddings.reset_degraded()
+    UnavailableStore.calls = 0
+
+    # No ingestion of the main index has completed (e.g. the first one ran degraded).
+    assert rag_tool.search_documents("ساعت کاری", k=1)[0].page_content.startswith("ساعت کاری")
+    assert UnavailableStore.calls == 0
+
+
+def test_fallback_index_is_unavailable_until_its_build_completes(tmp_path, monkeypatch):
+    from ingest import IndexWriter
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", embeddings.PROVIDER_OPENAI)
+    monkeypatch.setattr(settings, "FALLBACK_VECTOR_STORE_PATH", str(tmp_path / "local"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_CHECK_SECONDS", 0)
+    writer = IndexWriter(embeddings.get_embeddings(embeddings.PROVIDER_LOCAL), settings.FALLBACK_VECTOR_STORE_PATH)
+    writer.add([Document(page_content="ساعت کاری شرکت از ۸ تا ۱۶ است.")])
+    writer.close()
+    assert not rag_tool.fallback_index_available()  # written, not published
+    writer.publish()
+    assert rag_tool.fallback_index_available()
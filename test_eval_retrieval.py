@@ -0,0 +1,21 @@
+from benchmarks.eval_retrieval import load_faq_pairs, paraphrases, plain
+from utils.embeddings import HashedNgramEmbeddings
+
+
+def test_faq_pairs_cover_every_question():
+    pairs = load_faq_pairs()
+    assert len(pairs) >= 60
+    assert all(question.endswith("؟") and len(key) > 10 for question, key in pairs)
+    # The key is matched against chunk text, so it must carry no markdown.
+    assert all("*" not in key for _, key in pairs)
+
+
+def test_paraphrases_keep_the_question_retrievable():
+    variants = paraphrases("آیا شرکت بیمه تکمیلی دارد؟")
+    assert variants["keywords"] == "شرکت بیمه تکمیلی دارد"
+    assert "ي" in variants["arabic_letters"]
+
+    embeddings = HashedNgramEmbeddings()
+    original, arabic = embeddings.embed_documents([variants["original"], variants["arabic_letters"]])
+    assert original == arabic
+    assert plain("**پاسخ:** بله") == "پاسخ: بله"
@@ -0,0 +1,166 @@
+import pytest
+from langchain_community.document_loaders import TextLoader
+
+from ingest import ParseCache, iter_parsed_files
+
+
+class CountingLoader(TextLoader):
+    loads = 0
+
+    def load(self):
+        CountingLoader.loads += 1
+        return super().load()
+
+
+def parse_all(paths, cache, stats):
+    return list(iter_parsed_files(paths, CountingLoader, {"encoding": "utf-8"}, cache, workers=1,
+                                  max_pending=2, stats=stats))
+
+
+def test_parsing_keeps_file_order_skips_failures_and_reuses_the_cache(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / "docs" / f"{i}.md"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f"سند شماره {i}", encoding="utf-8")
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "docs" / "missing.md"))
+    cache = ParseCache(str(tmp_path / "cache"), CountingLoader, {"encoding": "utf-8"})
+
+    stats = {"cached_files": 0, "parsed_files": 0, "failed_files": 0}
+    parsed = parse_all([p for p in paths if "missing" not in p], cache, stats)
+    assert [path for path, _ in parsed] == [p for p in paths if "missing" not in p]
+    assert [elements[0][0] for _, elements in parsed] == [f"سند شماره {i}" for i in range(5)]
+    assert stats == {"cached_files": 0, "parsed_files": 5, "failed_files": 0}
+
+    # Second run: everything comes from the cache; a changed file is parsed again.
+    (tmp_path / "docs" / "4.md").write_text("سند تغییر کرده", encoding="utf-8")
+    CountingLoader.loads = 0
+    stats = {"cached_files": 0, "parsed_files": 0, "failed_files": 0}
+    parsed = parse_all(paths, cache, stats)
+    assert [path for path, _ in parsed] == paths
+    assert dict(parsed)[paths[2]] == []
+    assert dict(parsed)[paths[-1]][0][0] == "سند تغییر کرده"
+    assert stats == {"cached_files": 4, "parsed_files": 1, "failed_files": 1}
+    assert CountingLoader.loads == 2  # the changed file, and the attempt at the missing one
+
+
+def test_reingestion_swaps_in_the_new_index_only_once_it_is_complete(tmp_path, monkeypatch):
+    import chromadb
+
+    from config import settings
+    from ingest import ingest_data, open_index
+    from utils import warmup
+    from utils.embeddings import HashedNgramEmbeddings
+    from utils.index_version import read_index_version
+
+    class CrashingEmbeddings(HashedNgramEmbeddings):
+        def embed_documents(self, texts):
+            raise RuntimeError("killed halfway")
+
+    source = tmp_path / "docs"
+    source.mkdir()
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۸ تا ۱۶ است.", encoding="utf-8")
+    index = str(tmp_path / "index")
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", index)
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / "index" / ".index_version"))
+    embeddings = HashedNgramEmbeddings(dimensions=64)
+
+    def ingest(embeddings):
+        return ingest_data(source_path=str(source), embeddings=embeddings, loader_cls=TextLoader,
+                           loader_kwargs={"encoding": "utf-8"}, workers=1, use_parse_cache=False)
+
+    assert warmup.index_needs_ingestion()
+    ingest(embeddings)
+    version = read_index_version()
+    assert version is not None and not warmup.index_needs_ingestion()
+
+    # A failed re-ingestion leaves the served index as it was.
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۹ تا ۱۷ است.", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        ingest(CrashingEmbeddings(dimensions=64))
+    assert read_index_version() == version
+    assert "8 تا 16" in open_index(index, embeddings).similarity_search("ساعت کاری", k=1)[0].page_content
+
+    # A complete one replaces it; only the collection it replaced is kept.
+    ingest(embeddings)
+    assert read_index_version() != version
+    assert "9 تا 17" in open_index(index, embeddings).similarity_search("ساعت کاری", k=1)[0].page_content
+    ingest(embeddings)
+    assert len(chromadb.PersistentClient(path=index).list_collections()) == 2
+
+
+def test_identical_rebuilds_of_the_app_index_keep_their_version(tmp_path, monkeypatch):
+    from config import settings
+    from ingest import ingest_data
+    from utils import embeddings
+    from utils.index_version import read_index_version
+
+    source = tmp_path / "docs"
+    source.mkdir()
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۸ تا ۱۶ است.", encoding="utf-8")
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / "index" / ".index_version"))
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", embeddings.PROVIDER_LOCAL)
+
+    def ingest(**params):
+        ingest_data(source_path=str(source), loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"},
+                    workers=1, use_parse_cache=False, **params)
+        return read_index_version()
+
+    # E.g. a container without a persistent vector store, ingesting at every start.
+    version = ingest()
+    assert ingest() == version
+    assert ingest(chunk_size=500) != version
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۹ تا ۱۷ است.", encoding="utf-8")
+    assert ingest() != version
+
+
+def test_degraded_ingestion_serves_the_fallback_and_is_retried_at_the_next_start(tmp_path, monkeypatch):
+    import httpx
+    import openai
+
+    from config import settings
+    from ingest import ingest_data
+    from tools import rag_tool
+    from utils import embeddings, warmup
+    from utils.index_version import read_index_version
+
+    class UnavailableEmbeddings(embeddings.HashedNgramEmbeddings):
+        def embed_documents(self, texts):
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+    api = {"embeddings": UnavailableEmbeddings()}
+    local = embeddings.get_embeddings(embeddings.PROVIDER_LOCAL)
+    monkeypatch.setattr(embeddings, "get_embeddings",
+                        lambda provider=None: local if provider == embeddings.PROVIDER_LOCAL else api["embeddings"])
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", embeddings.PROVIDER_OPENAI)
+    monkeypatch.setattr(settings, "EMBEDDING_FALLBACK_ENABLED", True)
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_FILE", str(tmp_path / "index" / ".index_version"))
+    monkeypatch.setattr(settings, "FALLBACK_VECTOR_STORE_PATH", str(tmp_path / "local"))
+    monkeypatch.setattr(settings, "INDEX_VERSION_CHECK_SECONDS", 0)
+    source = tmp_path / "docs"
+    source.mkdir()
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۸ تا ۱۶ است.", encoding="utf-8")
+
+    def ingest():
+        return ingest_data(source_path=str(source), loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"},
+                           workers=1, use_parse_cache=False)
+
+    assert not rag_tool.fallback_index_available()
+    assert ingest()["degraded"]
+    assert read_index_version() is None and rag_tool.fallback_index_available()
+    assert warmup.index_needs_ingestion()
+
+    api["embeddings"] = embeddings.HashedNgramEmbeddings(dimensions=64)
+    ingest()
+    version = read_index_version()
+    assert version is not None and not warmup.index_needs_ingestion()
+
+    # The main index keeps serving the last complete build, and the next start retries.
+    (source / "faq.md").write_text("ساعت کاری شرکت از ۹ تا ۱۷ است.", encoding="utf-8")
+    api["embeddings"] = UnavailableEmbeddings()
+    assert ingest()["degraded"]
+    assert read_index_version() == version
+    assert warmup.index_needs_ingestion()
@@ -0,0 +1,101 @@
+import threading
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from utils.job_index import JobIndex
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def make_index(tmp_path, jobs, embeddings=None):
+    return JobIndex(
+        embeddings=embeddings or CountingEmbeddings(size=32, embedded=[]),
+        path=str(tmp_path / "jobs.npz"),
+        load_jobs=lambda: list(jobs),
+    )
+
+
+JOBS = [
+    {"Id": 1, "Title": "برنامه‌نویس پایتون", "FullDescription": "توسعه سرویس‌های بک‌اند با پایتون"},
+    {"Id": 2, "Title": "کارشناس حسابداری", "FullDescription": "تهیه صورت‌های مالی"},
+    {"Id": 3, "Title": "طراح رابط کاربری", "FullDescription": "طراحی محصول"},
+]
+
+
+def test_sync_embeds_only_changed_jobs_and_drops_closed_ones(tmp_path):
+    jobs = list(JOBS)
+    index = make_index(tmp_path, jobs)
+    index.sync()
+    assert len(index._embeddings.embedded) == 3
+
+    jobs[1] = {**jobs[1], "FullDescription": "تهیه صورت‌های مالی و گزارش مالیاتی"}
+    del jobs[2]
+    index._load_jobs = lambda: list(jobs)
+    index.sync()
+
+    assert len(index._embeddings.embedded) == 4
+    assert len(index) == 2
+    assert {job_id for job_id, _, _ in index.recommend("حسابداری", top_k=5)} == {"1", "2"}
+
+
+def test_exact_profile_ranks_its_job_first(tmp_path):
+    index = make_index(tmp_path, JOBS)
+    index.sync()
+
+    # The fake embedding is deterministic per text, so a profile identical to a job's text matches it exactly.
+    matches = index.recommend("کارشناس حسابداری\nتهیه صورت‌های مالی", top_k=2)
+    assert matches[0][:2] == ("2", "کارشناس حسابداری")
+    assert abs(matches[0][2] - 1.0) < 1e-5
+    assert len(matches) == 2
+
+
+def test_index_is_restored_from_disk_without_reembedding(tmp_path):
+    make_index(tmp_path, JOBS).sync()
+
+    restored = make_index(tmp_path, JOBS)
+    assert len(restored) == 3
+    restored.sync()
+    assert restored._embeddings.embedded == []
+
+
+def test_failed_sync_keeps_the_index_and_backs_off(tmp_path, monkeypatch):
+    index = make_index(tmp_path, JOBS)
+    index.sync()
+
+    class EmbeddingsDown(CountingEmbeddings):
+        def embed_documents(self, texts):
+            raise ConnectionError("embeddings API unavailable")
+
+    loads = []
+    index._embeddings = EmbeddingsDown(size=32, embedded=[])
+    index._load_jobs = lambda: loads.append(1) or [{**JOBS[0], "FullDescription": "شرح تازه"}] + JOBS[1:]
+    index._next_sync_at = 0.0
+
+    index.ensure_fresh()
+    index.ensure_fresh()  # within JOB_INDEX_RETRY_SECONDS: not attempted again
+    assert len(loads) == 1
+    assert len(index) == 3
+    # The old vector of job 1 is still served.
+    assert index.recommend("برنامه‌نویس پایتون\nتوسعه سرویس‌های بک‌اند با پایتون", top_k=1)[0][0] == "1"
+
+
+def test_background_refresh_does_not_wait_for_the_sync(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return list(JOBS)
+
+    index = make_index(tmp_path, JOBS)
+    index._load_jobs = slow_load
+    index.refresh_in_background()
+    assert started.wait(5)
+    index.refresh_in_background()  # already running: no second sync
+    release.set()
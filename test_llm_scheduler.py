@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from utils.llm_scheduler import (
+    PRIORITY_ACTION,
+    PRIORITY_INGESTION,
+    LLMQueueFullError,
+    LLMScheduler,
+    SchedulerRateLimiter,
+    llm_priority,
+)
+
+
+def drained(**kwargs) -> LLMScheduler:
+    scheduler = LLMScheduler(**kwargs)
+    while scheduler.acquire(blocking=False):
+        pass
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_is_admitted_first():
+    scheduler = drained(requests_per_minute=600, tokens_per_minute=100000, max_queue=10, max_wait=5)
+    order = []
+
+    async def call(name, priority):
+        await scheduler.aacquire(priority=priority)
+        order.append(name)
+
+    ingestion = asyncio.create_task(call("ingestion", PRIORITY_INGESTION))
+    await asyncio.sleep(0)
+    with llm_priority(PRIORITY_ACTION):
+        action = asyncio.create_task(call("action", None))
+    await asyncio.gather(ingestion, action)
+
+    assert order == ["action", "ingestion"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_fast():
+    scheduler = drained(requests_per_minute=60, tokens_per_minute=100000, max_queue=1, max_wait=5)
+    waiting = asyncio.create_task(scheduler.aacquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(LLMQueueFullError) as excinfo:
+        await scheduler.aacquire()
+    assert excinfo.value.reason == "queue_full"
+    assert scheduler.queue_depth() == 1
+    waiting.cancel()
+
+
+def test_wait_is_bounded():
+    scheduler = drained(requests_per_minute=60, tokens_per_minute=100000, max_queue=10, max_wait=0.05)
+
+    with pytest.raises(LLMQueueFullError) as excinfo:
+        scheduler.acquire()
+    assert excinfo.value.reason == "timeout"
+    assert scheduler.queue_depth() == 0
+
+
+def test_token_debt_blocks_until_refilled():
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=600, max_queue=10, max_wait=1)
+    assert scheduler.acquire(tokens=100, blocking=False)
+
+    scheduler.charge(1200)
+    assert not scheduler.acquire(tokens=1, blocking=False)
+
+
+@pytest.mark.asyncio
+async def test_chat_model_goes_through_scheduler():
+    scheduler = LLMScheduler(requests_per_minute=2, tokens_per_minute=100000, max_queue=0, max_wait=1)
+    llm = FakeListChatModel(responses=["سلام"], rate_limiter=SchedulerRateLimiter(scheduler))
+
+    assert (await llm.ainvoke("hi")).content == "سلام"
+    assert (await llm.ainvoke("hi")).content == "سلام"
+    with pytest.raises(LLMQueueFullError):
+        await llm.ainvoke("hi")
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+
+from config import settings
+from config.logging_config import JsonFormatter, _ContextQueueHandler, log_context, update_log_context
+
+
+def _emit(handler, message, *args, **kwargs):
+    record = logging.getLogger("test").makeRecord("test", logging.INFO, __file__, 1, message, args, None, **kwargs)
+    handler.handle(record)
+
+
+def test_records_are_valid_json_with_turn_context():
+    log_queue = queue.Queue()
+    handler = _ContextQueueHandler(log_queue)
+
+    with log_context(session_id="s-1", turn_id="t-1"):
+        update_log_context(candidate_id=7)
+        _emit(handler, 'Answer was "%s"', 'ساعت کاری\n۸ تا "۱۷"')
+    _emit(handler, "outside")
+
+    formatter = JsonFormatter()
+    inside = json.loads(formatter.format(log_queue.get_nowait()))
+    outside = json.loads(formatter.format(log_queue.get_nowait()))
+    assert inside["message"] == 'Answer was "ساعت کاری\n۸ تا "۱۷""'
+    assert (inside["session_id"], inside["turn_id"], inside["candidate_id"]) == ("s-1", "t-1", 7)
+    assert "session_id" not in outside
+
+
+def test_long_fields_are_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_MAX_FIELD_CHARS", 50)
+    log_queue = queue.Queue()
+    _emit(_ContextQueueHandler(log_queue), "x" * 500, extra={"payload": {"text": "y" * 500}})
+
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert entry["message"].startswith("x" * 50) and entry["message"].endswith("[450 chars truncated]")
+    assert len(entry["payload"]) < 100
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = _ContextQueueHandler(queue.Queue(maxsize=1))
+    _emit(handler, "first")
+    _emit(handler, "second")
+    assert handler.queue.qsize() == 1
@@ -0,0 +1,73 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from utils.memory import TokenBudgetMemory
+from utils.token_counter import TRUNCATION_MARKER, count_message_tokens
+
+
+def make_memory(budget=200, responses=None):
+    llm = FakeListChatModel(responses=responses or ["کاربر درباره شغل برنامه‌نویس پایتون سوال کرد."])
+    return TokenBudgetMemory(token_budget=budget, summary_token_budget=50, summary_llm=llm)
+
+
+def test_recent_turns_are_kept_verbatim():
+    memory = make_memory()
+    memory.save_context({"input": "سلام"}, {"output": "سلام! چطور می‌توانم کمک کنم؟"})
+
+    history = memory.load_memory_variables({})["chat_history"]
+    assert [type(m) for m in history] == [HumanMessage, AIMessage]
+    assert history[0].content == "سلام"
+    assert memory.pending == []
+
+
+def test_history_stays_within_budget():
+    memory = make_memory(budget=200)
+    for i in range(10):
+        memory.save_context({"input": f"سوال شماره {i}"}, {"output": "پاسخ طولانی " * 40})
+
+    history = memory.load_memory_variables({})["chat_history"]
+    assert count_message_tokens(history) <= 200 + 4 * len(history)
+    assert memory.pending, "older turns should be queued for summarization"
+
+
+def test_oversized_single_turn_is_truncated():
+    memory = make_memory(budget=50)
+    memory.save_context({"input": "جزئیات شغل"}, {"output": "شرح وظایف " * 500})
+
+    user_text, ai_text = memory.turns[-1]
+    assert user_text == "جزئیات شغل"
+    assert ai_text.endswith(TRUNCATION_MARKER)
+    assert len(ai_text) < len("شرح وظایف " * 500)
+
+
+@pytest.mark.asyncio
+async def test_asummarize_folds_pending_turns_into_summary():
+    memory = make_memory(budget=100)
+    for i in range(5):
+        memory.save_context({"input": f"سوال {i}"}, {"output": "پاسخ " * 30})
+    assert memory.pending
+
+    await memory.asummarize()
+
+    assert memory.pending == []
+    history = memory.load_memory_variables({})["chat_history"]
+    assert isinstance(history[0], SystemMessage)
+    assert "برنامه‌نویس پایتون" in history[0].content
+
+
+@pytest.mark.asyncio
+async def test_asummarize_keeps_pending_turns_when_llm_fails():
+    class FailingLLM:
+        async def ainvoke(self, prompt):
+            raise RuntimeError("provider unavailable")
+
+    memory = TokenBudgetMemory(token_budget=60, summary_token_budget=20, summary_llm=FailingLLM())
+    for i in range(4):
+        memory.save_context({"input": f"سوال {i}"}, {"output": "پاسخ " * 30})
+    pending_before = list(memory.pending)
+
+    await memory.asummarize()
+
+    assert memory.pending == pending_before
+    assert memory.summary == ""
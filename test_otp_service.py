@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from config import settings
+from utils.otp_service import OTPService, OTPError, OTP_VALID, OTP_INVALID, OTP_EXPIRED, OTP_LOCKED
+from utils.session_store import InMemorySessionStore
+
+
+class FakeSMS:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, phone_number, message):
+        self.sent.append((phone_number, re.search(r"\d{6}", message).group()))
+
+
+@pytest.fixture
+def sms():
+    return FakeSMS()
+
+
+@pytest.fixture
+def service(sms):
+    return OTPService(store=InMemorySessionStore(), send_sms=sms)
+
+
+@pytest.mark.asyncio
+async def test_code_is_accepted_once(service, sms):
+    await service.send_code("09120000001")
+    code = sms.sent[-1][1]
+
+    assert service.verify("09120000001", code) == OTP_VALID
+    assert service.verify("09120000001", code) == OTP_EXPIRED
+
+
+@pytest.mark.asyncio
+async def test_wrong_attempts_lock_the_code(service, sms, monkeypatch):
+    monkeypatch.setattr(settings, "OTP_MAX_ATTEMPTS", 2)
+    await service.send_code("09120000002")
+    code = sms.sent[-1][1]
+
+    assert service.verify("09120000002", "000000") == OTP_INVALID
+    assert service.verify("09120000002", "000000") == OTP_LOCKED
+    assert service.verify("09120000002", code) == OTP_LOCKED
+
+
+@pytest.mark.asyncio
+async def test_resend_interval_and_global_limit(service, monkeypatch):
+    monkeypatch.setattr(settings, "OTP_GLOBAL_MAX_SENDS_PER_MINUTE", 2)
+    await service.send_code("09120000003")
+
+    with pytest.raises(OTPError) as exc:
+        await service.send_code("09120000003")
+    assert exc.value.reason == "resend_interval"
+
+    await service.send_code("09120000004")
+    with pytest.raises(OTPError) as exc:
+        await service.send_code("09120000005")
+    assert exc.value.reason == "global_limit"
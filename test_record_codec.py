@@ -0,0 +1,51 @@
+from config import settings
+from utils.api_translator import from_api_format, to_api_format
+from utils.record_codec import MISSING, get_codec
+
+
+def api_job(**extra):
+    fm = settings.JOB_OPPORTUNITY_FIELD_MAP
+    return {fm["Id"]: 3, fm["Title"]: "برنامه‌نویس پایتون", fm["Status"]: "باز", "CreatedAt": "2025-01-01", **extra}
+
+
+def test_decode_dict_matches_translator():
+    codec = get_codec("JobOpportunities")
+    rows = [api_job(), api_job(**{settings.JOB_OPPORTUNITY_FIELD_MAP["FullDescription"]: None})]
+
+    assert codec.decode_many_dicts(rows) == [from_api_format(row, settings.JOB_OPPORTUNITY_FIELD_MAP) for row in rows]
+
+
+def test_records_distinguish_missing_from_null():
+    record = get_codec("JobOpportunities").decode(api_job(**{settings.JOB_OPPORTUNITY_FIELD_MAP["Description"]: None}))
+
+    assert record.Title == "برنامه‌نویس پایتون"
+    assert record.Description is None
+    assert record.FullDescription is MISSING
+    assert record.get("FullDescription", "") == ""
+    assert "FullDescription" not in record.to_dict()
+
+
+def test_encode_matches_translator_and_writes_link_fields():
+    codec = get_codec("HiringRecords")
+    payload = codec.encode({"Title": "سارا - برنامه‌نویس", "Status": "اقدام شده", "CandidateId": 7, "JobOpportunityId": 3})
+
+    assert payload == {
+        **to_api_format({"Title": "سارا - برنامه‌نویس", "Status": "اقدام شده"}, settings.HIRING_RECORD_FIELD_MAP),
+        settings.HIRING_RECORD_LINK_FIELDS["CandidateId"]: 7,
+        settings.HIRING_RECORD_LINK_FIELDS["JobOpportunityId"]: 3,
+    }
+
+
+def test_nested_relations_are_decoded_with_their_table_codec():
+    codec = get_codec("HiringRecords")
+    api_record = {
+        settings.HIRING_RECORD_FIELD_MAP["Status"]: "اقدام شده",
+        settings.HIRING_RECORD_FIELD_MAP["JobOpportunity"]: api_job(),
+        settings.HIRING_RECORD_LINK_FIELDS["CandidateId"]: 7,
+    }
+
+    record = codec.decode(api_record)
+    assert record.JobOpportunity.Title == "برنامه‌نویس پایتون"
+    assert record.CandidateId == 7
+    assert codec.decode_dict(api_record)["JobOpportunity"] == record.JobOpportunity.to_dict()
+    assert codec.encode(record)[settings.HIRING_RECORD_LINK_FIELDS["CandidateId"]] == 7
@@ -0,0 +1,25 @@
+from utils.router import TIER_FOCUSED, TIER_FULL, TIER_SMALLTALK, route_message
+
+
+def test_small_talk_is_routed_without_tools():
+    route = route_message("سلام، وقت بخیر!")
+    assert route.tier == TIER_SMALLTALK
+    assert route.tools == ()
+
+
+def test_confirmation_needs_the_conversation():
+    assert route_message("بله").tier == TIER_SMALLTALK
+    assert route_message("بله", has_history=True).tier == TIER_FULL
+
+
+def test_single_intent_gets_its_tools_only():
+    route = route_message("وضعیت درخواست من چیه؟", has_history=True)
+    assert (route.tier, route.intent, route.tools) == (TIER_FOCUSED, "status", ("get_application_status",))
+
+    route = route_message("مزايای کارکنان چیست؟")  # Arabic yeh
+    assert route.intent == "knowledge"
+
+
+def test_several_intents_use_the_full_agent():
+    assert route_message("شغل‌های باز رو بگو و وضعیت درخواستم رو هم چک کن").tier == TIER_FULL
+    assert route_message("من پنج سال سابقه کار در پایتون دارم").tier == TIER_FULL
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from utils.memory import TokenBudgetMemory
+from utils.session_registry import SessionConflictError, SessionRegistry
+from utils.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a = SQLiteSessionStore(path)
+    worker_b = SQLiteSessionStore(path)
+
+    worker_a.set("sessions", "abc", {"user_profile": {"Id": 7, "FirstName": "سارا"}, "version": 1})
+
+    assert worker_b.get("sessions", "abc") == {"user_profile": {"Id": 7, "FirstName": "سارا"}, "version": 1}
+    worker_b.delete("sessions", "abc")
+    assert worker_a.get("sessions", "abc") is None
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    for store in (InMemorySessionStore(), SQLiteSessionStore(str(tmp_path / "ttl.db"))):
+        store.set("otp", "09120000000", "123456", ttl=0.05)
+        assert store.get("otp", "09120000000") == "123456"
+        time.sleep(0.1)
+        assert store.get("otp", "09120000000", default="expired") == "expired"
+
+
+def test_memory_round_trips_through_sqlite(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "memory.db"))
+    memory = TokenBudgetMemory(token_budget=500, summary_token_budget=100)
+    memory.summary = "کاربر به موقعیت برنامه‌نویس علاقه دارد."
+    memory.save_context({"input": "سلام"}, {"output": "سلام، خوش آمدید!"})
+
+    store.set("sessions", "abc", {"memory": memory.to_dict()})
+    restored = TokenBudgetMemory.from_dict(store.get("sessions", "abc")["memory"], token_budget=500)
+
+    assert restored.summary == memory.summary
+    assert restored.turns == memory.turns
+    assert restored.load_memory_variables({}) == memory.load_memory_variables({})
+
+
+def make_registry(store, **kwargs):
+    defaults = {"idle_ttl": 3600, "max_sessions": 100, "max_bytes": 10**9, "state_ttl": 3600,
+                "summary_llm": FakeListChatModel(responses=["خلاصه گفتگو"])}
+    defaults.update(kwargs)
+    return SessionRegistry(store=store, **defaults)
+
+
+def make_state(turns=3):
+    memory = TokenBudgetMemory(token_budget=5000)
+    for i in range(turns):
+        memory.save_context({"input": f"سوال {i}"}, {"output": "پاسخ " * 50})
+    return {"user_profile": {"Id": 7}, "memory": memory.to_dict(), "last_query": "سوال", "last_response": "پاسخ " * 50}
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_compacted_and_resumable():
+    store = InMemorySessionStore()
+    registry = make_registry(store, idle_ttl=0)
+    registry.put("abc", make_state())
+    full_size = registry.stats()["memory_bytes"]
+
+    await registry.sweep()
+
+    assert registry.stats() == {"active_sessions": 0, "memory_bytes": 0}
+    resumed = registry.get("abc")
+    assert resumed["compacted"] is True
+    assert resumed["user_profile"] == {"Id": 7}
+    assert resumed["last_response"] is None
+    assert len(resumed["memory"]["t"]) == 1
+    assert resumed["memory"]["s"] == "خلاصه گفتگو"
+    assert registry.stats()["memory_bytes"] < full_size
+
+
+@pytest.mark.asyncio
+async def test_global_cap_evicts_least_recently_used():
+    registry = make_registry(InMemorySessionStore(), max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        registry.put(session_id, make_state(turns=1))
+    registry.get("a")  # "b" is now the least recently used
+
+    await registry.sweep()
+
+    assert registry.peek("b") is None
+    assert registry.peek("a") is not None and registry.peek("c") is not None
+
+
+def test_workers_sharing_a_store_never_serve_or_overwrite_stale_state(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = make_registry(SQLiteSessionStore(path)), make_registry(SQLiteSessionStore(path))
+    worker_a.put("abc", {"last_query": "سوال اول"})
+    state_a = worker_a.get("abc")
+
+    # The session moves to worker B for a turn.
+    state_b = worker_b.get("abc")
+    state_b["last_query"] = "سوال دوم"
+    worker_b.put("abc", state_b)
+
+    # Worker A sees B's turn instead of its cached copy...
+    assert worker_a.get("abc")["last_query"] == "سوال دوم"
+    # ...and a write from its stale copy is rejected rather than overwriting it.
+    state_a["last_query"] = "سوال قدیمی"
+    with pytest.raises(SessionConflictError):
+        worker_a.put("abc", state_a)
+    assert worker_b.get("abc")["last_query"] == "سوال دوم"
+
+
+@pytest.mark.asyncio
+async def test_eviction_never_overwrites_a_turn_saved_by_another_worker(tmp_path, monkeypatch):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = make_registry(SQLiteSessionStore(path), idle_ttl=0), make_registry(SQLiteSessionStore(path))
+    worker_a.put("abc", make_state())
+
+    # Worker B saves a turn while worker A is compacting the session.
+    compact = TokenBudgetMemory.acompact
+
+    async def compact_during_a_turn(memory):
+        state_b = worker_b.get("abc")
+        state_b["last_query"] = "سوال جدید"
+        worker_b.put("abc", state_b)
+        await compact(memory)
+
+    monkeypatch.setattr(TokenBudgetMemory, "acompact", compact_during_a_turn)
+    await worker_a.sweep()
+
+    assert worker_a.peek("abc") is None
+    assert worker_b.get("abc")["last_query"] == "سوال جدید"
+
+
+@pytest.mark.asyncio
+async def test_compacted_sessions_expire_sooner_in_worker_memory(tmp_path):
+    store = InMemorySessionStore()
+    registry = make_registry(store, idle_ttl=0, state_ttl=3600, compacted_ttl=0.01)
+    registry.put("abc", make_state())
+    await registry.sweep()
+    time.sleep(0.02)
+    assert store.purge_expired() == 1
+
+    shared = make_registry(SQLiteSessionStore(str(tmp_path / "sessions.db")), idle_ttl=0, compacted_ttl=0.01)
+    shared.put("abc", make_state())
+    await shared.sweep()
+    time.sleep(0.02)
+    assert shared.get("abc")["compacted"] is True
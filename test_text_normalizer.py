@@ -0,0 +1,44 @@
+import pytest
+
+from utils.text_normalizer import ZWNJ, normalize_key, normalize_phone, normalize_text
+
+
+def test_arabic_letters_and_digits_become_persian_and_ascii():
+    assert normalize_text("كيف ٣ تا ۵ سال") == "کیف 3 تا 5 سال"
+    assert normalize_text("مؤسسه إیران") == "موسسه ایران"
+
+
+def test_diacritics_tatweel_and_invisible_marks_are_removed():
+    assert normalize_text("مُحَمَّد") == "محمد"
+    assert normalize_text("شـــرکت") == "شرکت"
+    assert normalize_text("\ufeff\u200fسلام\u200d") == "سلام"
+
+
+def test_zwnj_variants_are_unified():
+    assert normalize_text("می \u200c خواهم") == f"می{ZWNJ}خواهم"
+    assert normalize_text("می\u200bخواهم") == f"می{ZWNJ}خواهم"
+    assert normalize_text(f"کتاب{ZWNJ}{ZWNJ}ها") == f"کتاب{ZWNJ}ها"
+
+
+def test_whitespace_is_collapsed_but_lines_are_kept():
+    assert normalize_text("  الف  ب\nج  ") == "الف ب\nج"
+
+
+def test_keys_ignore_spelling_variants():
+    variants = ["مزایای کارکنان چیست؟", "مزايای  کارکنان چيست", "مزایای کارکنان چیست ؟ ", "مزایایِ کارکنان چیست!"]
+    assert len({normalize_key(v) for v in variants}) == 1
+    assert normalize_key(f"می{ZWNJ}خواهم") == normalize_key("می خواهم")
+    assert normalize_key("Hello World?") == "hello world"
+
+
+@pytest.mark.parametrize("raw", [
+    "09123456789", "۰۹۱۲۳۴۵۶۷۸۹", "٠٩١٢٣٤٥٦٧٨٩", "0912 345 6789", "0912-345-6789", "+989123456789", "00989123456789",
+    "9123456789", " ۰۹۱۲ ۳۴۵ ۶۷۸۹ ",
+])
+def test_phone_numbers_in_any_script_are_parsed(raw):
+    assert normalize_phone(raw) == "09123456789"
+
+
+@pytest.mark.parametrize("raw", ["", "0912345678", "091234567890", "02112345678", "۰۹۱۲abc۴۵۶۷", "+1 912 345 6789"])
+def test_invalid_phone_numbers_are_rejected(raw):
+    assert normalize_phone(raw) is None
@@ -0,0 +1,49 @@
+import json
+
+from utils.token_counter import TRUNCATION_MARKER, count_tokens, truncate_to_tokens
+from utils.tool_budget import dedupe_chunks, fit_chunks, fit_record, project_fields
+
+SENTENCES = [f"جمله شماره {i} درباره مزایای کارکنان و ساعت کاری شرکت است." for i in range(30)]
+DOCUMENT = " ".join(SENTENCES)
+
+
+def test_overlapping_chunks_are_merged_once():
+    # Two splitter chunks that share 200 characters, plus an exact duplicate of the first.
+    first, second = DOCUMENT[:600], DOCUMENT[400:1000]
+    chunks = dedupe_chunks([first, second, first])
+
+    assert len(chunks) == 2
+    assert chunks[0] == first.strip()
+    assert DOCUMENT[400:600] not in chunks[1]
+    assert (chunks[0] + chunks[1]).replace(" ", "") == DOCUMENT[:1000].replace(" ", "")
+
+
+def test_unrelated_chunks_are_kept():
+    assert dedupe_chunks(["سوال اول", "سوال دوم", ""]) == ["سوال اول", "سوال دوم"]
+
+
+def test_truncate_respects_budget():
+    text = truncate_to_tokens(DOCUMENT, 50)
+
+    assert count_tokens(text) <= 50
+    assert text.endswith(TRUNCATION_MARKER)
+    assert truncate_to_tokens("کوتاه", 50) == "کوتاه"
+
+
+def test_fit_chunks_keeps_ranking_order_within_budget():
+    chunks = [DOCUMENT[:300], DOCUMENT[300:600], DOCUMENT[600:900]]
+    context = fit_chunks(chunks, 120)
+
+    assert count_tokens(context) <= 120
+    assert context.startswith(chunks[0])
+
+
+def test_job_record_is_projected_and_fitted():
+    job = {"Id": 3, "Title": "برنامه‌نویس", "Department": [{"Id": 1}], "Description": "", "FullDescription": DOCUMENT}
+    projected = project_fields(job, ("Id", "Title", "Description", "FullDescription"))
+    assert list(projected) == ["Id", "Title", "FullDescription"]
+
+    fitted = fit_record(projected, 80, "FullDescription")
+    assert fitted["Title"] == "برنامه‌نویس"
+    assert count_tokens(json.dumps(fitted, ensure_ascii=False)) <= 80
+    assert projected["FullDescription"] == DOCUMENT
@@ -0,0 +1,46 @@
+import asyncio
+
+from langchain.tools import tool
+
+from benchmarks.fake_llm import FakeChatModel
+from utils import metrics, tracing
+
+
+@tool
+def slow_lookup(query: str) -> str:
+    """Returns a canned answer."""
+    with tracing.span(tracing.STAGE_HTTP, "test GET"):
+        return "ok"
+
+
+def test_summary_reports_quantiles():
+    for value in range(1, 101):
+        metrics.observe("test_latency_seconds", value / 100, stage="unit")
+
+    assert metrics.get_quantile("test_latency_seconds", 0.5, stage="unit") == 0.5
+    assert metrics.get_quantile("test_latency_seconds", 0.99, stage="unit") == 0.99
+    rendered = metrics.render_prometheus()
+    assert 'test_latency_seconds{stage="unit",quantile="0.95"} 0.95' in rendered
+    assert 'test_latency_seconds_count{stage="unit"} 100' in rendered
+
+
+def test_turn_trace_collects_spans_from_threads_and_callbacks():
+    handler = tracing.TracingCallbackHandler()
+    llm = FakeChatModel(calls=[])
+
+    async def turn():
+        with tracing.turn_trace("test_turn", tier="focused") as trace:
+            await llm.ainvoke("سلام", config={"callbacks": [handler]})
+            await slow_lookup.ainvoke({"query": "x"}, config={"callbacks": [handler]})
+            await asyncio.to_thread(tracing.record_span, tracing.STAGE_RETRIEVAL, "kb", 0.25)
+        return trace
+
+    trace = asyncio.run(turn())
+    breakdown = trace.breakdown()
+    assert breakdown[tracing.STAGE_LLM][0] == 1
+    assert breakdown[tracing.STAGE_TOOL][0] == 1
+    assert breakdown[tracing.STAGE_HTTP][0] == 1
+    assert breakdown[tracing.STAGE_RETRIEVAL] == (1, 0.25)
+    assert trace.llm_tokens > 0
+    assert "retrieval=250ms/1" in trace.summary()
+    assert tracing.current_trace() is None
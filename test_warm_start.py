@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+
+from config import settings
+from tools import rag_tool
+from utils import warm_start
+from utils.answer_cache import SemanticAnswerCache
+from utils.embeddings import HashedNgramEmbeddings
+
+HOURS = "ساعت کاری شرکت چیست؟"
+INSURANCE = "آیا شرکت بیمه تکمیلی دارد؟"
+PROBATION = "دوره آزمایشی چند ماه است؟"
+
+
+def log_line(day, **fields):
+    return json.dumps({"timestamp": f"{day}T10:00:00+0000", "level": "INFO", **fields}, ensure_ascii=False)
+
+
+def test_mines_logs_and_feedback_into_a_snapshot_the_caches_load(tmp_path, monkeypatch):
+    log_file = tmp_path / "app.log"
+    log_file.write_text("\n".join([
+        log_line("2026-10-01", message="Answered from the knowledge base.", kb_question=HOURS),
+        log_line("2026-10-01", message="Answered from the knowledge base.", kb_question="ساعت کاري شرکت چیست"),
+        log_line("2026-10-01", message="Answered from the knowledge base.", kb_question=PROBATION),
+        log_line("2026-10-01", message="Turn latency breakdown (chat_turn ...): ..."),
+        "not json",
+    ]), encoding="utf-8")
+    questions, turns = warm_start.read_log_questions([str(log_file)])
+    assert turns == {"2026-10-01": 1}
+
+    feedback = [
+        {"Query": HOURS, "Response": "از ۸ تا ۱۶.", "Rating": "خوب"},
+        {"Query": INSURANCE, "Response": "بله.", "Rating": "خوب"},
+        {"Query": INSURANCE, "Response": "بله.", "Rating": "خوب"},
+        {"Query": PROBATION, "Response": "نمی‌دانم.", "Rating": "بد"},
+        {"Query": PROBATION, "Response": "نمی‌دانم.", "Rating": "بد"},
+        # Never logged as a knowledge-base question and not routed to it: may be personal.
+        {"Query": "وضعیت درخواست من چیست؟", "Response": "در حال بررسی.", "Rating": "خوب"},
+        {"Query": "وضعیت درخواست من چیست؟", "Response": "در حال بررسی.", "Rating": "خوب"},
+    ]
+    entries = warm_start.select_questions([q for _, q in questions], feedback, min_count=2)
+    assert [(e["question"], e["count"], e["answer"]) for e in entries] == [
+        (HOURS, 3, "از ۸ تا ۱۶."), (INSURANCE, 2, "بله."),
+    ]
+
+    embeddings = HashedNgramEmbeddings(dimensions=512)
+    monkeypatch.setattr(warm_start, "_warm_contexts", [])
+    monkeypatch.setattr(warm_start, "_warm_index_version", None)
+    monkeypatch.setattr(rag_tool, "retrieve_context", lambda query: f"Retrieved context:\n{query}")
+    monkeypatch.setattr(warm_start, "embedding_model_name", lambda: "test-model")
+    monkeypatch.setattr(warm_start, "read_index_version", lambda: "v1")
+    monkeypatch.setattr(warm_start, "current_index_version", lambda: "v1")
+    path = str(tmp_path / "snapshot.npz")
+    assert warm_start.build_snapshot(entries, path, embeddings) == 2
+
+    cache = SemanticAnswerCache(embeddings=embeddings, threshold=0.9)
+    monkeypatch.setattr("utils.answer_cache.get_answer_cache", lambda: cache)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    assert warm_start.load_snapshot(path) == 2
+    vector = np.asarray(embeddings.embed_query(warm_start.question_key(HOURS)), dtype=np.float32)
+    assert cache.lookup(vector) == "از ۸ تا ۱۶."
+    assert warm_start.warm_context("ساعت کاری شرکت") == f"Retrieved context:\n{HOURS}"
+    assert warm_start.warm_context("حقوق و مزایا") is None
+    # ...nor used once the index is re-ingested.
+    monkeypatch.setattr(warm_start, "current_index_version", lambda: "v2")
+    assert warm_start.warm_context("ساعت کاری شرکت") is None
+
+    # A snapshot of another index is not loaded.
+    monkeypatch.setattr(warm_start, "read_index_version", lambda: "v2")
+    assert warm_start.load_snapshot(path) == 0
+    # Nor any while no index is served.
+    monkeypatch.setattr(warm_start, "read_index_version", lambda: None)
+    assert warm_start.load_snapshot(path) == 0
+
+
+def test_projected_hit_rate_counts_questions_close_to_an_approved_answer():
+    entries = [{"answer": "a"}, {"answer": None}]
+    snapshot = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    questions = np.array([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float32)
+    assert warm_start.projected_hit_rate(entries, snapshot, questions, threshold=0.9) == 1 / 3
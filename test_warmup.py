@@ -0,0 +1,47 @@
+import asyncio
+import socket
+
+import requests
+
+from utils import metrics, warmup
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_ready_after_warmup_even_if_an_optional_step_fails(monkeypatch):
+    def unreachable():
+        raise ConnectionError("NocoDB is down")
+
+    async def connect_openai():
+        pass
+
+    monkeypatch.setattr(warmup, "ensure_index", lambda: None)
+    monkeypatch.setattr(warmup, "open_knowledge_base", lambda: None)
+    monkeypatch.setattr(warmup, "load_agents", lambda: None)
+    monkeypatch.setattr(warmup, "connect_nocodb", unreachable)
+    monkeypatch.setattr(warmup, "connect_openai", connect_openai)
+    monkeypatch.setattr(warmup, "load_warm_start", lambda: None)
+    server = metrics.start_metrics_server(free_port())
+    ready_url = f"http://127.0.0.1:{server.server_port}/ready"
+
+    assert requests.get(ready_url, timeout=5).status_code == 503
+    assert asyncio.run(warmup.run_warmup()) is True
+
+    assert warmup.is_ready()
+    assert requests.get(ready_url, timeout=5).status_code == 200
+    assert metrics.get_value("hr_warmup_step_failures_total", step="nocodb") == 1
+
+
+def test_metrics_endpoint_moves_to_the_next_port_when_another_worker_holds_it():
+    port = free_port()
+    first = metrics._bind("127.0.0.1", port, attempts=4)
+    try:
+        second = metrics._bind("127.0.0.1", port, attempts=4)
+        assert second.server_port == port + 1
+        second.server_close()
+    finally:
+        first.server_close()
@@ -4,6 +4,7 @@ import logging
 from langchain.tools import tool
 import asyncio
 from config import settings
+from utils import http_client
 from utils.api_translator import to_api_format
 
 logger = logging.getLogger(__name__)
@@ -34,9 +35,10 @@ async def record_feedback(user_phone: str, query: str, response: str, rating: st
     
     try:
         res = await asyncio.to_thread(
-            requests.post, 
-            url, 
-            headers=get_nocodb_headers(), 
+            http_client.post,
+            url,
+            service="nocodb",
+            headers=get_nocodb_headers(),
             json=api_payload
         )
         res.raise_for_status()
@@ -2,11 +2,15 @@
 import requests
 import json
 import logging
+import threading
+import time
 from langchain.tools import tool
 
 # Import configurations and the translator utility
 from config import settings
-from utils.api_translator import from_api_format
+from utils import http_client, tool_budget
+from utils.record_codec import get_codec
+from utils.token_counter import count_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,30 @@ def get_nocodb_headers():
     """Returns the standard headers for NocoDB API requests."""
     return {"xc-token": settings.NOCODB_API_TOKEN}
 
+def fetch_all_records(table_name: str, where: str | None = None, fields: list | None = None, page_size: int = 100) -> list:
+    """
+    Reads every matching record of a table (API format), following NocoDB's pagination.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    table_id = settings.NOCODB_TABLE_IDS[table_name]
+    url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records"
+    params = {"limit": page_size, "offset": 0}
+    if where:
+        params["where"] = where
+    if fields:
+        params["fields"] = ",".join(fields)
+
+    records = []
+    while True:
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers(), params=params, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        page = body.get("list", [])
+        records.extend(page)
+        if not page or body.get("pageInfo", {}).get("isLastPage", True):
+            return records
+        params["offset"] += len(page)
+
 # --- Tool Definitions ---
 
 def get_candidate_details_by_id(candidate_id: int) -> dict | None:
@@ -26,22 +54,34 @@ def get_candidate_details_by_id(candidate_id: int) -> dict | None:
     url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records/{candidate_id}"
     
     try:
-        response = requests.get(url, headers=get_nocodb_headers())
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers())
         response.raise_for_status()
         api_data = response.json()
         
         # Translate the API response (Persian keys) to our internal format (English keys)
-        return from_api_format(api_data, settings.CANDIDATE_FIELD_MAP)
+        return get_codec("Candidates").decode_dict(api_data)
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to get candidate details for ID {candidate_id}: {e}")
         return None
     
-@tool
-def get_open_job_positions() -> str:
+# --- Open Job Catalog ---
+# The list of open positions changes rarely, but is shown to every user after
+# onboarding and requested often by the agent. It is cached for a short time.
+
+_job_catalog_lock = threading.Lock()
+_job_catalog = {"jobs": None, "fetched_at": 0.0}
+
+def fetch_open_jobs(use_cache: bool = True) -> list | None:
     """
-    Use this tool to find all currently open job positions available for candidates.
-    It returns a list of jobs with their titles and IDs.
+    Returns the open job positions (English keys), served from the catalog cache while it is fresh.
+    Returns None if NocoDB could not be reached.
     """
+    with _job_catalog_lock:
+        cached_jobs = _job_catalog["jobs"]
+        age = time.monotonic() - _job_catalog["fetched_at"]
+    if use_cache and cached_jobs is not None and age < settings.JOB_CATALOG_TTL_SECONDS:
+        return cached_jobs
+
     table_id = settings.NOCODB_TABLE_IDS["JobOpportunities"]
     url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records"
     
@@ -56,46 +96,107 @@ def get_open_job_positions() -> str:
     }
     
     try:
-        response = requests.get(url, headers=get_nocodb_headers(), params=params)
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers(), params=params)
         response.raise_for_status()
         api_data = response.json().get("list", [])
-        
-        if not api_data:
-            return "متاسفانه در حال حاضر هیچ موقعیت شغلی بازی وجود ندارد."
-        
-        translated_jobs = [from_api_format(job, settings.JOB_OPPORTUNITY_FIELD_MAP) for job in api_data]
-        return json.dumps(translated_jobs, ensure_ascii=False)
-
     except requests.exceptions.RequestException as e:
-        logger.error(f"NocoDB API request failed in get_open_job_positions: {e}")
-        return "خطا در برقراری ارتباط با سیستم مشاغل. لطفاً بعداً دوباره امتحان کنید."
+        logger.error(f"NocoDB API request failed while fetching open jobs: {e}")
+        return None
+
+    jobs = get_codec("JobOpportunities").decode_many_dicts(api_data)
+    with _job_catalog_lock:
+        _job_catalog["jobs"] = jobs
+        _job_catalog["fetched_at"] = time.monotonic()
+    return jobs
+
+def fetch_open_job_records() -> list:
+    """
+    Returns every open job with its descriptions (English keys), for the recommendation index.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    field_map = settings.JOB_OPPORTUNITY_FIELD_MAP
+    api_data = fetch_all_records(
+        "JobOpportunities",
+        where=f"({field_map['Status']},eq,باز)",
+        fields=[field_map[key] for key in ("Id", "Title", "Description", "FullDescription")],
+    )
+    return get_codec("JobOpportunities").decode_many_dicts(api_data)
 
 @tool
-def get_job_details(position_id: str) -> str:
+def get_open_job_positions() -> str:
     """
-    Use this tool to get the detailed description and requirements of a specific job
-    when you have its unique ID.
+    Use this tool to find all currently open job positions available for candidates.
+    It returns a list of jobs with their titles and IDs.
     """
-    if not position_id:
-        return "خطا: برای دریافت جزئیات شغل، به شناسه موقعیت (ID) نیاز است."
+    jobs = fetch_open_jobs()
+    if jobs is None:
+        return "خطا در برقراری ارتباط با سیستم مشاغل. لطفاً بعداً دوباره امتحان کنید."
+    if not jobs:
+        return "متاسفانه در حال حاضر هیچ موقعیت شغلی بازی وجود ندارد."
+    return json.dumps(jobs, ensure_ascii=False)
+
+# --- Job Details ---
+# Full job records are cached per ID: the UI renders them in full, while the agent
+# only receives a budgeted projection (see utils/tool_budget.py).
+
+_job_details_lock = threading.Lock()
+_job_details_cache = {}  # position_id -> (record, fetched_at)
+_JOB_DETAILS_CACHE_SIZE = 256
+
+def fetch_job_details(position_id, use_cache: bool = True) -> dict | None:
+    """
+    Returns the full record (English keys) of a job, served from cache while it is fresh.
+    Returns None if the job does not exist or NocoDB could not be reached.
+    """
+    key = str(position_id)
+    with _job_details_lock:
+        cached = _job_details_cache.get(key)
+    if use_cache and cached and time.monotonic() - cached[1] < settings.JOB_CATALOG_TTL_SECONDS:
+        return cached[0]
 
     table_id = settings.NOCODB_TABLE_IDS["JobOpportunities"]
-    url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records/{position_id}"
+    url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records/{key}"
 
     try:
-        response = requests.get(url, headers=get_nocodb_headers())
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers())
         response.raise_for_status()
         api_data = response.json()
-
-        translated_job = from_api_format(api_data, settings.JOB_OPPORTUNITY_FIELD_MAP)
-        translated_job["FullDescription"] = api_data.get(settings.JOB_OPPORTUNITY_FIELD_MAP["FullDescription"], "")
-        
-        return json.dumps(translated_job, ensure_ascii=False)
-
     except requests.exceptions.RequestException as e:
         logger.error(f"NocoDB API request failed for job ID {position_id}: {e}")
+        return None
+
+    job = get_codec("JobOpportunities").decode_dict(api_data)
+    job.setdefault("FullDescription", "")
+    with _job_details_lock:
+        if len(_job_details_cache) >= _JOB_DETAILS_CACHE_SIZE:
+            _job_details_cache.pop(next(iter(_job_details_cache)))
+        _job_details_cache[key] = (job, time.monotonic())
+    return job
+
+@tool
+def get_job_details(position_id: str) -> str:
+    """
+    Use this tool to get the detailed description and requirements of a specific job
+    when you have its unique ID.
+    """
+    if not position_id:
+        return "خطا: برای دریافت جزئیات شغل، به شناسه موقعیت (ID) نیاز است."
+
+    job = fetch_job_details(position_id)
+    if job is None:
         return "موقعیت شغلی با این شناسه یافت نشد یا در ارتباط با سیستم خطایی رخ داده است."
 
+    # Only the fields the agent needs, with the long description trimmed to the tool's budget.
+    budget = tool_budget.get_budget("get_job_details")
+    projected = tool_budget.project_fields(job, settings.JOB_DETAILS_AGENT_FIELDS)
+    budgeted = tool_budget.fit_record(projected, budget, "FullDescription")
+    output = json.dumps(budgeted, ensure_ascii=False)
+    if budgeted is not projected:
+        tool_budget.record_truncation(
+            "get_job_details", count_tokens(json.dumps(projected, ensure_ascii=False)), count_tokens(output)
+        )
+    return output
+
 def get_candidate_id_by_phone(phone_number: str) -> str | None:
     """Queries the Candidates table to find the ID for a given phone number."""
     table_id = settings.NOCODB_TABLE_IDS["Candidates"]
@@ -106,7 +207,7 @@ def get_candidate_id_by_phone(phone_number: str) -> str | None:
     params = {"where": f"({phone_field},eq,{phone_number})", "fields": f"{id_field}", "limit": 1}
 
     try:
-        response = requests.get(url, headers=get_nocodb_headers(), params=params)
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers(), params=params)
         response.raise_for_status()
         data = response.json().get("list", [])
         if data:
@@ -132,10 +233,7 @@ def get_application_status(phone_number: str) -> str:
     table_id = settings.NOCODB_TABLE_IDS["HiringRecords"]
     url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records"
 
-    candidate_link_field = "nc__0jr___کاندیدها_id"
-    job_relation_field = settings.HIRING_RECORD_FIELD_MAP["JobOpportunity"]
-    job_title_field = settings.JOB_OPPORTUNITY_FIELD_MAP["Title"]
-    status_field = settings.HIRING_RECORD_FIELD_MAP["Status"]
+    candidate_link_field = settings.HIRING_RECORD_LINK_FIELDS["CandidateId"]
 
     # --- THE FIX: Fetch all records, not just one ---
     params = {
@@ -144,7 +242,7 @@ def get_application_status(phone_number: str) -> str:
     }
 
     try:
-        response = requests.get(url, headers=get_nocodb_headers(), params=params)
+        response = http_client.get(url, service="nocodb", headers=get_nocodb_headers(), params=params)
         response.raise_for_status()
         api_data = response.json().get("list", [])
         
@@ -153,10 +251,11 @@ def get_application_status(phone_number: str) -> str:
 
         # --- THE FIX: Process the entire list of records ---
         all_statuses = []
-        for hiring_record in api_data:
+        for hiring_record in get_codec("HiringRecords").decode_many(api_data):
+            job = hiring_record.get("JobOpportunity")
             status_info = {
-                "Status": hiring_record.get(status_field, "نامشخص"),
-                "JobTitle": hiring_record.get(job_relation_field, {}).get(job_title_field, "نامشخص")
+                "Status": hiring_record.get("Status", "نامشخص"),
+                "JobTitle": job.get("Title", "نامشخص") if job else "نامشخص"
             }
             all_statuses.append(status_info)
         
@@ -175,8 +274,8 @@ def apply_for_job_position(position_id: int, candidate_id: int) -> str:
     """
     try:
         # Step 1: Get Job Title
-        job_details_json = get_job_details.invoke({"position_id": str(position_id)})
-        job_title = json.loads(job_details_json).get("Title", "N/A")
+        job = fetch_job_details(position_id)
+        job_title = job.get("Title", "N/A") if job else "N/A"
         if job_title == "N/A":
              return "خطا: موقعیت شغلی مورد نظر برای ثبت درخواست یافت نشد."
 
@@ -195,15 +294,15 @@ def apply_for_job_position(position_id: int, candidate_id: int) -> str:
         # Step 4: Construct the payload
         table_id = settings.NOCODB_TABLE_IDS["HiringRecords"]
         url = f"{settings.NOCODB_BASE_URL}/api/v2/tables/{table_id}/records"
-        payload = {
-            settings.HIRING_RECORD_FIELD_MAP["Title"]: hiring_record_title,
-            settings.HIRING_RECORD_FIELD_MAP["Status"]: "اقدام شده",
-            "nc__0jr___کاندیدها_id": candidate_id,
-            "nc__0jr___فرصت های شغلی_id": position_id
-        }
+        payload = get_codec("HiringRecords").encode({
+            "Title": hiring_record_title,
+            "Status": "اقدام شده",
+            "CandidateId": candidate_id,
+            "JobOpportunityId": position_id
+        })
 
         # Step 5: Create the Hiring Record
-        response = requests.post(url, headers=get_nocodb_headers(), json=payload)
+        response = http_client.post(url, service="nocodb", headers=get_nocodb_headers(), json=payload)
         response.raise_for_status()
         
         logger.info(f"Successfully created hiring record for candidate {candidate_id} ({candidate_full_name}) and job {position_id}")
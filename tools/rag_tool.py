@@ -1,9 +1,179 @@
+from functools import lru_cache
+
+import numpy as np
 from langchain.tools import tool
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
 
 # Import settings from our centralized config file
 from config import settings
+from utils import embeddings, metrics, tool_budget, tracing, warm_start
+from utils.index_version import LEGACY_COLLECTION, current_index_state, current_index_version, index_version_file
+from utils.speculative_retrieval import take_prefetched
+from utils.text_normalizer import normalize_text
+from utils.token_counter import count_tokens
+
+# --- Shared Clients ---
+
+def get_embedding_function():
+    """Returns the process-wide embedding client of the configured provider (see utils/embeddings.py)."""
+    return embeddings.get_embeddings()
+
+@lru_cache(maxsize=4)
+def _open_vector_store(persist_directory: str, provider: str, collection: str):
+    # Imported here: chromadb takes about half a second to import and is first needed during warmup.
+    from langchain_chroma import Chroma
+    return Chroma(
+        collection_name=collection,
+        persist_directory=persist_directory,
+        embedding_function=embeddings.get_embeddings(provider)
+    )
+
+def _served_collection(persist_directory: str) -> str:
+    # Every ingestion builds a new collection (see ingest.py::IndexWriter).
+    state = current_index_state(index_version_file(persist_directory))
+    return state["collection"] if state else LEGACY_COLLECTION
+
+def get_vector_store():
+    """Returns the persisted vector store, reopened whenever the index is re-ingested."""
+    path = settings.VECTOR_STORE_PATH
+    return _open_vector_store(path, settings.EMBEDDING_PROVIDER, _served_collection(path))
+
+def get_fallback_vector_store():
+    """Returns the index built with the local embeddings, used while the embeddings API is down."""
+    path = settings.FALLBACK_VECTOR_STORE_PATH
+    return _open_vector_store(path, embeddings.PROVIDER_LOCAL, _served_collection(path))
+
+def fallback_index_available() -> bool:
+    """True once an ingestion has completed the fallback index (not while it is being built)."""
+    path = index_version_file(settings.FALLBACK_VECTOR_STORE_PATH)
+    return embeddings.fallback_enabled() and current_index_state(path) is not None
+
+def _search_with_fallback(search):
+    """
+    Runs `search(store)` on the knowledge base. While the embeddings API is unavailable,
+    or no main index was ever completed (its first ingestion ran degraded), it is served
+    from the local fallback index instead.
+    """
+    if fallback_index_available() and (embeddings.is_degraded() or current_index_version() is None):
+        metrics.inc("hr_embedding_fallbacks_total", reason="cooldown" if embeddings.is_degraded() else "no_main_index")
+        return search(get_fallback_vector_store())
+    try:
+        return search(get_vector_store())
+    except Exception as e:
+        if not (embeddings.is_unavailable_error(e) and fallback_index_available()):
+            raise
+        embeddings.mark_degraded(e)
+        return search(get_fallback_vector_store())
+
+def search_documents(query: str, k: int = 3) -> list:
+    """Similarity search over the knowledge base (see _search_with_fallback)."""
+    return _search_with_fallback(lambda store: store.similarity_search(query, k=k))
+
+# --- Batch Search ---
+# The knowledge base is at most a few thousand chunks, so the batch path holds the whole
+# index as one matrix of unit vectors (reloaded with the store after a re-ingestion) and
+# scores every query of a call against it with a single matrix product.
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+@lru_cache(maxsize=4)
+def _index_matrix(store) -> tuple:
+    """Every chunk of `store`: (unit embedding matrix, documents aligned with its rows)."""
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    documents = [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(data["documents"], data["metadatas"])
+    ]
+    if not documents:
+        return np.zeros((0, 0), dtype=np.float32), []
+    return _unit_rows(data["embeddings"]), documents
+
+def mmr_select(query_scores: np.ndarray, matrix: np.ndarray, candidates: np.ndarray, k: int,
+               selected: list, diversity: float) -> list:
+    """
+    Maximal marginal relevance: picks up to k of `candidates` (row indexes of `matrix`),
+    each time the one with the best trade-off between its score for the query and its
+    similarity to the rows already in `selected`, which it extends. Returns the picks.
+    """
+    picked = []
+    candidates = candidates[~np.isin(candidates, selected)]
+    while len(picked) < k and len(candidates):
+        redundancy = (matrix[candidates] @ matrix[selected].T).max(axis=1) if selected else 0.0
+        best = int(np.argmax((1 - diversity) * query_scores[candidates] - diversity * redundancy))
+        picked.append(int(candidates[best]))
+        selected.append(picked[-1])
+        candidates = np.delete(candidates, best)
+    return picked
+
+def _search_batch(store, queries: list, k: int) -> list:
+    matrix, documents = _index_matrix(store)
+    if not documents:
+        return [[] for _ in queries]
+    # One embedding request for every query of the call.
+    scores = _unit_rows(store.embeddings.embed_documents(queries)) @ matrix.T
+    fetch = min(max(settings.KB_BATCH_CANDIDATES, k), len(documents))
+    top = np.argpartition(-scores, fetch - 1, axis=1)[:, :fetch]
+    # Shared by all queries: a chunk is returned once, for the first query that picks it.
+    selected = []
+    return [
+        [documents[i] for i in mmr_select(row, matrix, candidates, k, selected, settings.KB_MMR_DIVERSITY)]
+        for row, candidates in zip(scores, top)
+    ]
+
+def search_documents_batch(queries: list, k: int = None) -> list:
+    """
+    Searches the knowledge base for several queries at once. Returns, per query, up to k
+    chunks chosen by MMR; no chunk is returned for more than one query.
+    """
+    k = k or settings.KB_BATCH_CHUNKS_PER_QUERY
+    return _search_with_fallback(lambda store: _search_batch(store, queries, k))
+
+# --- Retrieval ---
+
+@tracing.traced(tracing.STAGE_RETRIEVAL, "knowledge_base")
+def retrieve_context(query: str) -> str:
+    """Retrieves the most relevant document chunks for a query, formatted for the agent."""
+    # Retrieve the top 3 most relevant document chunks (the index is built from normalized text, see ingest.py)
+    docs = search_documents(normalize_text(query), k=3)
+
+    # Adjacent chunks repeat the splitter's overlap; keep that text once and stay within the budget.
+    chunks = tool_budget.dedupe_chunks([doc.page_content for doc in docs])
+    context = tool_budget.fit_chunks(chunks, tool_budget.get_budget("query_knowledge_base"))
+
+    full_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+    context_tokens = count_tokens(context)
+    if context_tokens < full_tokens:
+        tool_budget.record_truncation("query_knowledge_base", full_tokens, context_tokens)
+
+    return f"Retrieved context:\n{context}"
+
+@tracing.traced(tracing.STAGE_RETRIEVAL, "knowledge_base_batch")
+def retrieve_context_batch(queries: list) -> str:
+    """Retrieves context for several queries in one search, formatted per query for the agent."""
+    queries = [q.strip() for q in queries if q and q.strip()][:settings.KB_BATCH_MAX_QUERIES]
+    if not queries:
+        return "Retrieved context:\n"
+    results = search_documents_batch([normalize_text(q) for q in queries])
+
+    # The budget is shared evenly, so one broad query cannot crowd out the others.
+    budget = tool_budget.get_budget("query_knowledge_base_batch") // len(queries)
+    sections, full_tokens, context_tokens = [], 0, 0
+    for query, docs in zip(queries, results):
+        chunks = tool_budget.dedupe_chunks([doc.page_content for doc in docs])
+        context = tool_budget.fit_chunks(chunks, budget) if chunks else "(nothing beyond the context above)"
+        full_tokens += sum(count_tokens(doc.page_content) for doc in docs)
+        context_tokens += count_tokens(context)
+        sections.append(f"Retrieved context for \"{query}\":\n{context}")
+    if context_tokens < full_tokens:
+        tool_budget.record_truncation("query_knowledge_base_batch", full_tokens, context_tokens)
+
+    return "\n\n".join(sections)
 
 # --- Tool Definition ---
 
@@ -14,25 +184,21 @@ def query_knowledge_base(query: str) -> str:
     benefits, and the hiring process. This tool queries a knowledge base
     of internal company documents.
     """
-    # Initialize the embedding function
-    embedding_function = OpenAIEmbeddings(
-        model=settings.OPENAI_EMBEDDING_MODEL,
-        openai_api_key=settings.OPENAI_API_KEY
-    )
+    # The app may already have started this retrieval speculatively (see app.py::main).
+    prefetched = take_prefetched(query)
+    if prefetched is not None:
+        return prefetched
+    # Popular questions were retrieved ahead of time (see utils/warm_start.py).
+    warm = warm_start.warm_context(query)
+    if warm is not None:
+        return warm
+    return retrieve_context(query)
 
-    # Load the persisted vector store
-    vector_store = Chroma(
-        persist_directory=settings.VECTOR_STORE_PATH, 
-        embedding_function=embedding_function
-    )
-
-    # Perform a similarity search and retrieve the top 3 most relevant document chunks
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
-    
-    # Retrieve relevant documents
-    docs = retriever.invoke(query)
-    
-    # Format the retrieved documents into a single string
-    context = "\n\n---\n\n".join([doc.page_content for doc in docs])
-    
-    return f"Retrieved context:\n{context}"
\ No newline at end of file
+@tool
+def query_knowledge_base_batch(queries: list[str]) -> str:
+    """
+    Use this tool instead of query_knowledge_base when a question about the company,
+    its culture, benefits or the hiring process has several distinct parts. Pass one
+    short search query per part (at most 5); they are looked up together.
+    """
+    return retrieve_context_batch(queries)
@@ -0,0 +1,101 @@
+# start of tools/recommendation_tool.py
+import argparse
+import csv
+import json
+import logging
+import sys
+
+from langchain.tools import tool
+
+from config import settings
+from tools.nocodb_tools import fetch_all_records, get_candidate_details_by_id
+from utils.job_index import candidate_profile_text, get_job_index
+from utils.record_codec import get_codec
+
+logger = logging.getLogger(__name__)
+
+# Profiles are embedded in batches of this size when scoring all candidates.
+_BATCH_SIZE = 256
+
+# --- Tool Definition ---
+
+@tool
+def recommend_jobs(candidate_id: int) -> str:
+    """
+    Use this tool to suggest the open job positions that best match the candidate's
+    expertise and work experience. It returns the best matching jobs with their IDs
+    and a match score between 0 and 1.
+    """
+    candidate = get_candidate_details_by_id(candidate_id)
+    if not candidate:
+        return f"خطا: اطلاعات کارجو با شناسه {candidate_id} یافت نشد."
+
+    profile = candidate_profile_text(candidate)
+    if not profile:
+        return "تخصص و سابقه کاری کارجو در پرونده ثبت نشده است؛ پیشنهاد شغلی ممکن نیست."
+
+    index = get_job_index()
+    if len(index):
+        # A turn never waits for NocoDB and the embeddings; this one uses the current index.
+        index.refresh_in_background()
+    else:
+        # Nothing to recommend from yet (normally built at startup, see app.py::warm_up).
+        index.ensure_fresh()
+    matches = index.recommend(profile)
+    if not matches:
+        return "متاسفانه در حال حاضر هیچ موقعیت شغلی بازی وجود ندارد."
+
+    return json.dumps(
+        [{"Id": job_id, "Title": title, "MatchScore": round(score, 2)} for job_id, title, score in matches],
+        ensure_ascii=False
+    )
+
+# --- Batch Scoring (offline, for the HR team) ---
+
+def score_all_candidates(top_k: int = None) -> list:
+    """
+    Ranks the open jobs for every candidate with a profile. Profiles are embedded in
+    batches and scored against all jobs with one matrix product per batch.
+    Returns rows of (candidate_id, candidate_name, rank, job_id, job_title, score).
+    """
+    top_k = top_k or settings.JOB_RECOMMENDATION_TOP_K
+    index = get_job_index()
+    index.sync()
+
+    field_map = settings.CANDIDATE_FIELD_MAP
+    candidates = get_codec("Candidates").decode_many_dicts(fetch_all_records(
+        "Candidates",
+        fields=[field_map[key] for key in ("Id", "FirstName", "LastName", "WorkExperience", "Expertise")],
+    ))
+    profiles = [(candidate, candidate_profile_text(candidate)) for candidate in candidates]
+    profiles = [(candidate, text) for candidate, text in profiles if text]
+    logger.info(f"Scoring {len(profiles)} of {len(candidates)} candidates against {len(index)} open jobs.")
+
+    rows = []
+    for start in range(0, len(profiles), _BATCH_SIZE):
+        batch = profiles[start:start + _BATCH_SIZE]
+        vectors = index.embed_profiles([text for _, text in batch])
+        for (candidate, _), matches in zip(batch, index.rank_many(vectors, top_k)):
+            name = f"{candidate.get('FirstName', '')} {candidate.get('LastName', '')}".strip()
+            for rank, (job_id, title, score) in enumerate(matches, start=1):
+                rows.append((candidate.get("Id"), name, rank, job_id, title, round(score, 4)))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank open jobs for every candidate and write them as CSV.")
+    parser.add_argument("--top-k", type=int, default=settings.JOB_RECOMMENDATION_TOP_K)
+    parser.add_argument("--output", help="CSV file to write (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rows = score_all_candidates(args.top_k)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["candidate_id", "candidate_name", "rank", "job_id", "job_title", "score"])
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Wrote {len(rows)} recommendations.", file=sys.stderr)
@@ -3,40 +3,60 @@ import chainlit as cl
 import json
 import logging
 
+from config import settings
+
 logger = logging.getLogger(__name__)
 
-async def display_job_listings(jobs_json: str):
-    """Parses and displays job listings with 'View Details' buttons."""
+async def display_job_listings(jobs: list | None, page: int = 0):
+    """
+    Displays one page of open jobs as a single message with a 'View Details' action per job,
+    instead of one message per job. A 'More' action loads the next page.
+    """
     try:
-        jobs = json.loads(jobs_json)
-        if not isinstance(jobs, list) or not jobs:
+        if jobs is None:
+            await cl.Message(content="خطا در برقراری ارتباط با سیستم مشاغل. لطفاً بعداً دوباره امتحان کنید.").send()
+            return
+        if not jobs:
             await cl.Message(content="در حال حاضر هیچ موقعیت شغلی بازی یافت نشد.").send()
             return
-        
-        for job in jobs:
-            job_text = f"**عنوان شغلی:** {job.get('Title', 'N/A')}\n"
-            actions = [
-                cl.Action(
-                    name="view_job_details",
-                    label="مشاهده جزئیات",
-                    # FIX: The agent instruction is now inside the payload. The 'value' parameter is removed.
-                    payload={"agent_instruction": f"show details for job with ID {job.get('Id', '')}"}
-                )
-            ]
-            await cl.Message(content=job_text, author="هوشمند", actions=actions).send()
+
+        page_size = settings.JOB_LIST_PAGE_SIZE
+        page_count = (len(jobs) + page_size - 1) // page_size
+        page = max(0, min(page, page_count - 1))
+        start = page * page_size
+        page_jobs = jobs[start:start + page_size]
+
+        lines = [f"{start + i + 1}. **{job.get('Title', 'N/A')}**" for i, job in enumerate(page_jobs)]
+        content = "\n".join(lines)
+        if page_count > 1:
+            content += f"\n\n_صفحه {page + 1} از {page_count}_"
+
+        actions = [
+            cl.Action(
+                name="view_job_details",
+                label=f"جزئیات: {job.get('Title', 'N/A')}",
+                payload={
+                    "job_id": job.get("Id"),
+                    "agent_instruction": f"show details for job with ID {job.get('Id', '')}"
+                }
+            )
+            for job in page_jobs
+        ]
+        if page + 1 < page_count:
+            actions.append(cl.Action(name="show_more_jobs", label="موقعیت‌های بیشتر", payload={"page": page + 1}))
+
+        await cl.Message(content=content, author="هوشمند", actions=actions).send()
     except Exception as e:
         logger.error(f"Error in display_job_listings: {e}")
         await cl.Message(content="یک خطای پیش‌بینی نشده در نمایش مشاغل رخ داد.").send()
 
 
-async def display_job_details(details_json: str):
-    """Parses and displays a single job's details."""
+async def display_job_details(details: dict):
+    """Displays a single job's full record (as returned by fetch_job_details)."""
     try:
-        details = json.loads(details_json)
-        
         content = f"### جزئیات شغل: {details.get('Title', 'N/A')}\n\n"
         content += f"**شناسه شغل:** `{details.get('Id', 'N/A')}`\n\n---\n\n"
-        content += f"**شرح وظایف:**\n{details.get('FullDescription', 'شرحی ارائه نشده است.')}\n\n"
+        content += f"**شرح وظایف:**\n{details.get('FullDescription') or 'شرحی ارائه نشده است.'}\n\n"
         
         actions = [
             cl.Action(
@@ -0,0 +1,133 @@
+# utils/answer_cache.py
+import logging
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from config import settings
+from utils import embeddings as embedding_providers, metrics
+from utils.index_version import current_index_version
+from utils.text_normalizer import normalize_key
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_answer_cache_requests_total", "Semantic answer cache lookups by result.")
+
+# Tools whose output depends on who is asking. A turn that used any of them is never cached.
+PERSONAL_TOOLS = {"get_application_status", "apply_for_job_position", "record_feedback", "recommend_jobs"}
+KNOWLEDGE_BASE_TOOLS = {"query_knowledge_base", "query_knowledge_base_batch"}
+
+# Mid-conversation, questions this short or with these follow-up markers ("and for
+# interns?", "what about the second one?") mean something only with the history the agent
+# saw; cached under their bare text they would be replayed to other candidates.
+_MIN_STANDALONE_WORDS = 4
+_FOLLOW_UP_RE = re.compile(
+    r"^(?:و|ولی|اما|پس|and|but|so|what about|how about)\s"
+    r"|(?:چطور|چی|چه طور)$"
+    r"|(?:^|\s)(?:اون|اونها|همون|همین|همان|آنها|اولی|دومی|سومی|آخری|قبلی|بعدی|it|its|that|those|them|one)(?:\s|$)"
+)
+
+
+def normalize_question(text: str) -> str:
+    """Normalizes a question before it is embedded, so trivial variations share a key."""
+    return normalize_key(text)
+
+
+def depends_on_history(question: str, has_history: bool) -> bool:
+    """True for a follow-up whose meaning depends on the conversation; the cache is skipped for it."""
+    if not has_history:
+        return False
+    normalized = normalize_question(question)
+    return len(normalized.split()) < _MIN_STANDALONE_WORDS or bool(_FOLLOW_UP_RE.search(normalized))
+
+
+def is_cacheable_turn(tools_used: set) -> bool:
+    """A turn is cacheable if it was answered from the knowledge base alone."""
+    return bool(tools_used & KNOWLEDGE_BASE_TOOLS) and not (tools_used & PERSONAL_TOOLS)
+
+
+class SemanticAnswerCache:
+    """
+    Reuses answers to generic knowledge-base questions.
+
+    Entries are keyed by the embedding of the normalized question; a lookup hits when the
+    cosine similarity with a stored question is at least `threshold`. The cache is cleared
+    automatically whenever the vector store is re-ingested (see utils/index_version.py).
+    """
+
+    def __init__(self, embeddings=None, threshold: float = None, max_entries: int = None):
+        self._embeddings = embeddings
+        self.threshold = threshold if threshold is not None else settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._matrix = None  # (n, dim) unit vectors, one row per entry
+        self._entries = []   # list of (normalized_question, answer), aligned with _matrix rows
+        self._index_version = current_index_version()
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            from tools.rag_tool import get_embedding_function
+            self._embeddings = get_embedding_function()
+        return self._embeddings
+
+    def _check_index_version(self) -> None:
+        version = current_index_version()
+        if version != self._index_version:
+            logger.info("Knowledge base was re-ingested; clearing the semantic answer cache.")
+            self.clear()
+            self._index_version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._entries = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def aembed(self, question: str) -> np.ndarray | None:
+        """Embeds the normalized question. Returns a unit vector, or None for empty input or in degraded mode."""
+        normalized = normalize_question(question)
+        # In degraded mode the embeddings API just failed; do not wait on it again for every turn.
+        if not normalized or embedding_providers.is_degraded():
+            return None
+        vector = np.asarray(await self._get_embeddings().aembed_query(normalized), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, vector: np.ndarray | None) -> str | None:
+        """Returns the cached answer for the most similar question, if it is similar enough."""
+        self._check_index_version()
+        answer = None
+        with self._lock:
+            if vector is not None and self._matrix is not None:
+                similarities = self._matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    answer = self._entries[best][1]
+                    logger.info(
+                        f"Answer cache hit (similarity {similarities[best]:.3f}) for '{self._entries[best][0]}'"
+                    )
+        metrics.inc("hr_answer_cache_requests_total", result="hit" if answer is not None else "miss")
+        return answer
+
+    def add(self, question: str, answer: str, vector: np.ndarray | None) -> None:
+        if vector is None or not answer:
+            return
+        self._check_index_version()
+        with self._lock:
+            row = vector.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            self._entries.append((normalize_question(question), answer))
+            if len(self._entries) > self.max_entries:
+                # Oldest entries go first.
+                overflow = len(self._entries) - self.max_entries
+                self._matrix = self._matrix[overflow:]
+                self._entries = self._entries[overflow:]
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> SemanticAnswerCache:
+    return SemanticAnswerCache()
@@ -1,5 +1,16 @@
 # utils/api_translator.py
 
+# Inverted maps (Persian -> English) are built once per field map. The field maps are
+# module-level constants in config/settings.py, so their identity is stable.
+_inverted_maps = {}
+
+def _get_inverted_map(field_map: dict) -> dict:
+    cached = _inverted_maps.get(id(field_map))
+    if cached is None or cached[0] is not field_map:
+        cached = (field_map, {v: k for k, v in field_map.items()})
+        _inverted_maps[id(field_map)] = cached
+    return cached[1]
+
 def to_api_format(data_dict: dict, field_map: dict) -> dict:
     """
     Translates a Python dictionary with English keys to a dictionary
@@ -32,8 +43,9 @@ def from_api_format(api_object: dict, field_map: dict) -> dict:
     Returns:
         A new dictionary with internal English keys.
     """
-    # Create an inverted map for efficient lookup (Persian -> English)
-    inverted_map = {v: k for k, v in field_map.items()}
+    # Use the cached inverted map for efficient lookup (Persian -> English).
+    # For whole list responses prefer utils.record_codec, which is compiled per table.
+    inverted_map = _get_inverted_map(field_map)
     
     internal_data = {}
     for api_key, value in api_object.items():
@@ -0,0 +1,151 @@
+# utils/embeddings.py
+import logging
+import math
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from utils import metrics
+from utils.text_normalizer import normalize_key
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_embedding_fallbacks_total", "Retrievals served from the local fallback index, by reason.")
+
+# --- Providers ---
+# "openai": the configured OpenAI embedding model, admitted through the LLM scheduler.
+# "local":  HashedNgramEmbeddings below; no network, no API key, deterministic.
+PROVIDER_OPENAI = "openai"
+PROVIDER_LOCAL = "local"
+PROVIDERS = (PROVIDER_OPENAI, PROVIDER_LOCAL)
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Local embeddings for Persian text: character n-grams of every word (with word
+    boundaries marked) plus the whole words, hashed into a fixed number of signed
+    buckets, with sublinear term frequency and unit length.
+
+    Text is normalized with normalize_key first, so Arabic letter forms, ZWNJ vs space
+    and digits do not matter, and character n-grams match inflected forms
+    ("درخواست‌ها" / "درخواست"). The vectors need no fitting, so documents and queries
+    embedded in different processes always agree. Quality is well below a trained
+    model; it is meant for tests, benchmarks and as a fallback.
+    """
+
+    def __init__(self, dimensions: int = None, ngram_range: tuple = (3, 5)):
+        self.dimensions = dimensions or settings.LOCAL_EMBEDDING_DIMENSIONS
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> dict:
+        counts = {}
+        low, high = self.ngram_range
+        for word in normalize_key(text).split():
+            counts[f"w:{word}"] = counts.get(f"w:{word}", 0) + 1
+            padded = f" {word} "
+            for n in range(low, min(high, len(padded)) + 1):
+                for i in range(len(padded) - n + 1):
+                    gram = padded[i:i + n]
+                    counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            # The sign bit halves the damage of two features sharing a bucket.
+            weight = 1.0 + math.log(count)
+            vector[h % self.dimensions] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def embedding_model_name(provider: str = None) -> str:
+    """Identifies the vector space of a provider; vectors from different names are not comparable."""
+    provider = provider or settings.EMBEDDING_PROVIDER
+    if provider == PROVIDER_LOCAL:
+        return f"local-hashed-ngrams-{settings.LOCAL_EMBEDDING_DIMENSIONS}"
+    return settings.OPENAI_EMBEDDING_MODEL
+
+
+def create_embeddings(provider: str = None) -> Embeddings:
+    """Creates a new embedding client for `provider` (default: settings.EMBEDDING_PROVIDER)."""
+    provider = provider or settings.EMBEDDING_PROVIDER
+    if provider == PROVIDER_LOCAL:
+        return HashedNgramEmbeddings()
+    if provider == PROVIDER_OPENAI:
+        from langchain_openai import OpenAIEmbeddings
+
+        from utils.llm_scheduler import scheduled_embeddings
+        return scheduled_embeddings(OpenAIEmbeddings(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            openai_api_key=settings.OPENAI_API_KEY
+        ))
+    raise ValueError(f"Unknown embedding provider '{provider}'; expected one of {', '.join(PROVIDERS)}.")
+
+
+@lru_cache(maxsize=len(PROVIDERS))
+def _shared_embeddings(provider: str) -> Embeddings:
+    return create_embeddings(provider)
+
+
+def get_embeddings(provider: str = None) -> Embeddings:
+    """Returns the process-wide embedding client (reuses its HTTP connection pool and the LLM scheduler)."""
+    return _shared_embeddings(provider or settings.EMBEDDING_PROVIDER)
+
+
+# --- Degraded Mode ---
+# With a remote provider, ingestion also builds a small index with the local embeddings
+# (FALLBACK_VECTOR_STORE_PATH). When the embeddings API fails, retrieval switches to it
+# for EMBEDDING_FALLBACK_COOLDOWN_SECONDS instead of failing every turn, then tries again.
+
+_degraded_until = 0.0
+
+
+def fallback_enabled() -> bool:
+    return settings.EMBEDDING_FALLBACK_ENABLED and settings.EMBEDDING_PROVIDER != PROVIDER_LOCAL
+
+
+def is_unavailable_error(error: Exception) -> bool:
+    """True for errors that mean the embeddings API cannot be used right now (not bad input)."""
+    import openai
+    import requests
+    return isinstance(error, (
+        openai.APIConnectionError,
+        openai.AuthenticationError,
+        openai.InternalServerError,
+        openai.RateLimitError,
+        # The OpenAI client downloads its tokenizer on first use; offline, that fails first.
+        requests.exceptions.ConnectionError,
+    ))
+
+
+def is_degraded() -> bool:
+    return time.monotonic() < _degraded_until
+
+
+def mark_degraded(error: Exception) -> None:
+    """Serves retrieval from the fallback index for the cooldown period."""
+    global _degraded_until
+    if not is_degraded():
+        logger.warning(
+            f"Embeddings API unavailable ({type(error).__name__}: {error}); using the local fallback "
+            f"index for {settings.EMBEDDING_FALLBACK_COOLDOWN_SECONDS}s."
+        )
+    _degraded_until = time.monotonic() + settings.EMBEDDING_FALLBACK_COOLDOWN_SECONDS
+    metrics.inc("hr_embedding_fallbacks_total", reason=type(error).__name__)
+
+
+def reset_degraded() -> None:
+    global _degraded_until
+    _degraded_until = 0.0
@@ -0,0 +1,53 @@
+# utils/http_client.py
+import logging
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_http_requests_total", "Outbound HTTP requests, by service and status code.")
+
+# Every outbound HTTP call (NocoDB, the SMS webhook) goes through one pooled session,
+# so connections are reused across calls and each call is timed as an "http" span.
+
+DEFAULT_TIMEOUT_SECONDS = 15
+_POOL_SIZE = 20
+
+
+@lru_cache(maxsize=1)
+def get_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request(method: str, url: str, service: str | None = None, **kwargs) -> requests.Response:
+    """
+    Sends a request with the shared session. `service` labels the span and metrics
+    (defaults to the host name). Raises requests.exceptions.RequestException like requests does.
+    """
+    service = service or urlsplit(url).hostname or "unknown"
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT_SECONDS)
+    status = "error"
+    try:
+        with tracing.span(tracing.STAGE_HTTP, f"{service} {method}"):
+            response = get_http_session().request(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.inc("hr_http_requests_total", service=service, status=status)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
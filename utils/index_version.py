@@ -0,0 +1,92 @@
+# utils/index_version.py
+import json
+import os
+import time
+import uuid
+
+from config import settings
+
+# Every vector store directory has a version file naming the Chroma collection that is
+# served and its version. Ingestion builds a new collection next to the served one and
+# rewrites the file only once that collection is complete (see ingest.py::IndexWriter),
+# so readers go from one complete index to the next. The version follows what was
+# indexed (see ingest.py::content_version); anything derived from the index (answer
+# cache, warm-start snapshot, prefetched results, ...) compares against it to know when
+# it has become stale.
+
+VERSION_FILE_NAME = ".index_version"
+# The collection of indexes built before the version file named one (langchain_chroma's default).
+LEGACY_COLLECTION = "langchain"
+
+# version file -> (state, when it was read), for current_index_state.
+_last_read = {}
+
+
+def index_version_file(persist_directory: str) -> str:
+    """The version file of a vector store directory."""
+    if persist_directory == settings.VECTOR_STORE_PATH:
+        return settings.INDEX_VERSION_FILE
+    return os.path.join(persist_directory, VERSION_FILE_NAME)
+
+
+def read_index_state(path: str = None) -> dict | None:
+    """The served index ({"version", "collection"}) of a version file, or None if none was published."""
+    path = path or settings.INDEX_VERSION_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            content = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not content:
+        return None
+    try:
+        state = json.loads(content)
+    except ValueError:
+        state = None
+    if not isinstance(state, dict):
+        # Written before the file named the collection: just the version.
+        return {"version": content, "collection": LEGACY_COLLECTION}
+    return state
+
+
+def read_index_version(path: str = None) -> str | None:
+    """Returns the version of the current vector store, or None if it was never written."""
+    state = read_index_state(path)
+    return state["version"] if state else None
+
+
+def current_index_state(path: str = None) -> dict | None:
+    """
+    The served index as of at most INDEX_VERSION_CHECK_SECONDS ago, for checks on every
+    request. A re-ingestion in this process is seen at once (bump_index_version).
+    """
+    path = path or settings.INDEX_VERSION_FILE
+    state, read_at = _last_read.get(path, (None, float("-inf")))
+    now = time.monotonic()
+    if now - read_at >= settings.INDEX_VERSION_CHECK_SECONDS:
+        state = read_index_state(path)
+        _last_read[path] = (state, now)
+    return state
+
+
+def current_index_version(path: str = None) -> str | None:
+    state = current_index_state(path)
+    return state["version"] if state else None
+
+
+def bump_index_version(collection: str = LEGACY_COLLECTION, version: str = None, path: str = None,
+                       sources: str = None) -> str:
+    """
+    Makes `collection` the served index of a version file. Returns its version (default:
+    a new random one). `sources` identifies what was indexed, whatever the embeddings.
+    """
+    path = path or settings.INDEX_VERSION_FILE
+    state = {"version": version or uuid.uuid4().hex, "collection": collection, "sources": sources}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readers in other processes must never see a half-written file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    _last_read[path] = (state, time.monotonic())
+    return state["version"]
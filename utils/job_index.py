@@ -0,0 +1,244 @@
+# utils/job_index.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from config import settings
+from utils import metrics
+from utils.embeddings import embedding_model_name
+from utils.llm_scheduler import PRIORITY_BACKGROUND, llm_priority
+from utils.text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_job_index_jobs", "Open jobs in the recommendation index.")
+metrics.describe("hr_job_index_embedded_total", "Job descriptions embedded while syncing the recommendation index.")
+
+# Profile embeddings are cached by text, so repeated recommendations for a candidate cost no API call.
+_PROFILE_CACHE_SIZE = 1024
+
+
+def job_text(job: dict) -> str:
+    """The text a job is matched on: its title and descriptions."""
+    return normalize_text("\n".join(str(job[key]) for key in ("Title", "Description", "FullDescription") if job.get(key)))
+
+
+def candidate_profile_text(candidate: dict) -> str:
+    """The text a candidate is matched on: the expertise and work experience given at onboarding."""
+    return normalize_text("\n".join(str(candidate[key]) for key in ("Expertise", "WorkExperience") if candidate.get(key)))
+
+
+def _content_hash(text: str) -> str:
+    # The model is part of the hash, so switching providers re-embeds every job.
+    return hashlib.sha256(f"{embedding_model_name()}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _load_open_jobs() -> list | None:
+    # Imported here so the index can be used without the tools package (e.g. in tests).
+    import requests
+    from tools.nocodb_tools import fetch_open_job_records
+    try:
+        return fetch_open_job_records()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Could not load open jobs for the recommendation index: {e}")
+        return None
+
+
+class JobIndex:
+    """
+    Embedding index of the open job positions, used to rank jobs for a candidate profile.
+
+    Each job is embedded from its title and descriptions. `sync()` reloads the open jobs
+    and only re-embeds those whose text changed (by content hash); jobs that were closed
+    are dropped. The index is saved to `path`, so a restart only embeds what changed.
+    """
+
+    def __init__(self, embeddings=None, path: str = None, load_jobs=None):
+        self._embeddings = embeddings
+        self.path = path if path is not None else settings.JOB_INDEX_PATH
+        self._load_jobs = load_jobs or _load_open_jobs
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._ids = []        # job ids, aligned with _matrix rows
+        self._titles = {}     # job id -> title
+        self._hashes = {}     # job id -> content hash of the embedded text
+        self._matrix = None   # (n, dim) unit vectors
+        self._next_sync_at = 0.0  # monotonic time at which the next sync is due
+        self._refreshing = False
+        self._profile_vectors = OrderedDict()
+        self._load()
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            from tools.rag_tool import get_embedding_function
+            self._embeddings = get_embedding_function()
+        return self._embeddings
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # --- Persistence ---
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                matrix = data["matrix"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable job index at {self.path}: {e}")
+            return
+        self._ids = meta["ids"]
+        self._titles = meta["titles"]
+        self._hashes = meta["hashes"]
+        self._matrix = matrix if self._ids else None
+        logger.info(f"Loaded job index with {len(self._ids)} jobs from {self.path}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        meta = json.dumps({"ids": self._ids, "titles": self._titles, "hashes": self._hashes}, ensure_ascii=False)
+        matrix = self._matrix if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, matrix=matrix, meta=np.array(meta))
+        os.replace(tmp_path, self.path)
+
+    # --- Sync ---
+
+    def sync(self) -> bool:
+        """Brings the index in line with the open jobs. Returns False if the jobs could not be loaded."""
+        with self._sync_lock:
+            # Until this attempt succeeds, the next one waits JOB_INDEX_RETRY_SECONDS.
+            self._next_sync_at = time.monotonic() + settings.JOB_INDEX_RETRY_SECONDS
+            jobs = self._load_jobs()
+            if jobs is None:
+                return False
+
+            texts, titles = {}, {}
+            for job in jobs:
+                if job.get("Id") is None:
+                    continue
+                job_id = str(job["Id"])
+                texts[job_id] = job_text(job)
+                titles[job_id] = job.get("Title", "")
+            hashes = {job_id: _content_hash(text) for job_id, text in texts.items()}
+
+            with self._lock:
+                old_rows = {job_id: row for row, job_id in enumerate(self._ids)}
+                old_matrix, old_hashes = self._matrix, self._hashes
+            changed = [job_id for job_id, h in hashes.items() if old_hashes.get(job_id) != h]
+            new_vectors = {}
+            if changed:
+                try:
+                    vectors = _unit_rows(self._get_embeddings().embed_documents([texts[job_id] for job_id in changed]))
+                except Exception as e:
+                    # The current (possibly stale) index keeps serving recommendations.
+                    logger.warning(f"Job index sync failed embedding {len(changed)} jobs; keeping the current index: {e}")
+                    return False
+                new_vectors = dict(zip(changed, vectors))
+
+            ids = list(texts)
+            rows = [new_vectors[job_id] if job_id in new_vectors else old_matrix[old_rows[job_id]] for job_id in ids]
+            with self._lock:
+                self._ids = ids
+                self._titles = titles
+                self._hashes = hashes
+                self._matrix = np.vstack(rows) if rows else None
+                self._next_sync_at = time.monotonic() + settings.JOB_INDEX_SYNC_SECONDS
+            self._save()
+
+        removed = len(set(old_rows) - set(ids))
+        metrics.inc("hr_job_index_embedded_total", len(changed))
+        metrics.set_gauge("hr_job_index_jobs", len(ids))
+        logger.info(f"Job index synced: {len(ids)} open jobs, {len(changed)} embedded, {removed} removed.")
+        return True
+
+    def ensure_fresh(self) -> None:
+        """Syncs the index if a sync is due (JOB_INDEX_SYNC_SECONDS after a success, JOB_INDEX_RETRY_SECONDS after a failure)."""
+        if time.monotonic() >= self._next_sync_at:
+            self.sync()
+
+    def refresh_in_background(self) -> None:
+        """Like ensure_fresh, but the sync runs in a background thread; never waits for it."""
+        if time.monotonic() < self._next_sync_at:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_sync, name="job-index-sync", daemon=True).start()
+
+    def _background_sync(self) -> None:
+        try:
+            with llm_priority(PRIORITY_BACKGROUND):
+                self.sync()
+        except Exception as e:
+            logger.error(f"Background job index sync failed: {e}")
+        finally:
+            self._refreshing = False
+
+    # --- Ranking ---
+
+    def rank_many(self, profile_vectors, top_k: int) -> list:
+        """
+        Scores every profile against every job in one matrix product. Returns, per profile,
+        the top_k (job_id, title, cosine similarity) tuples, best first.
+        """
+        with self._lock:
+            ids, titles, matrix = self._ids, self._titles, self._matrix
+        if matrix is None or not len(profile_vectors):
+            return [[] for _ in range(len(profile_vectors))]
+        scores = _unit_rows(profile_vectors) @ matrix.T
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            best = candidates[np.argsort(-row[candidates])]
+            results.append([(ids[i], titles.get(ids[i], ""), float(row[i])) for i in best])
+        return results
+
+    def embed_profiles(self, profile_texts: list) -> np.ndarray:
+        """Embeds many profiles in one call (used for batch scoring)."""
+        return _unit_rows(self._get_embeddings().embed_documents(profile_texts))
+
+    def embed_profile(self, profile_text: str) -> np.ndarray:
+        with self._lock:
+            vector = self._profile_vectors.get(profile_text)
+            if vector is not None:
+                self._profile_vectors.move_to_end(profile_text)
+                return vector
+        vector = _unit_rows(self._get_embeddings().embed_query(profile_text))[0]
+        with self._lock:
+            self._profile_vectors[profile_text] = vector
+            if len(self._profile_vectors) > _PROFILE_CACHE_SIZE:
+                self._profile_vectors.popitem(last=False)
+        return vector
+
+    def recommend(self, profile_text: str, top_k: int = None) -> list:
+        """Returns the best matching open jobs for a profile as (job_id, title, score) tuples."""
+        if not profile_text:
+            return []
+        return self.rank_many(self.embed_profile(profile_text).reshape(1, -1), top_k or settings.JOB_RECOMMENDATION_TOP_K)[0]
+
+
+@lru_cache(maxsize=1)
+def get_job_index() -> JobIndex:
+    return JobIndex()
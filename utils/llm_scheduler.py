@@ -0,0 +1,319 @@
+# utils/llm_scheduler.py
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from config import settings
+from utils import metrics, tracing
+from utils.token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_llm_queue_depth", "Model calls waiting for admission.")
+metrics.describe("hr_llm_queue_wait_seconds", "Time model calls waited for admission, by priority.")
+metrics.describe("hr_llm_admissions_total", "Model call admission decisions, by result.")
+metrics.describe("hr_llm_tokens_total", "Tokens charged against the tokens-per-minute budget.")
+
+# --- Priorities (lower is served first) ---
+PRIORITY_ACTION = 0       # button clicks: the user is waiting on a single, explicit request
+PRIORITY_INTERACTIVE = 1  # free-text chat turns
+PRIORITY_BACKGROUND = 2   # memory summarization, job index sync
+PRIORITY_INGESTION = 3    # bulk embedding of documents
+
+PRIORITY_NAMES = {
+    PRIORITY_ACTION: "action",
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+    PRIORITY_INGESTION: "ingestion",
+}
+
+# The priority of model calls made from the current task or thread. Tool threads and
+# background tasks inherit it from the handler that started them.
+_current_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Runs the enclosed model calls with the given priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class LLMQueueFullError(Exception):
+    """Raised when a model call is not admitted. `user_message` is safe to show to the user."""
+
+    user_message = "در حال حاضر حجم درخواست‌ها زیاد است. لطفاً چند لحظه دیگر دوباره تلاش کنید."
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM call rejected: {reason}")
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "enqueued_at", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, priority: int, tokens: int, loop: asyncio.AbstractEventLoop = None):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def notify(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for model calls (chat and embeddings alike).
+
+    Two token buckets hold the requests-per-minute and tokens-per-minute budgets. A call
+    is admitted when a request is available and the token bucket is not in debt; the
+    call's token cost is charged up front when it is known (embeddings) or after the
+    response when it is not (chat, see TokenUsageHandler), so the bucket may go negative
+    and later calls wait until it has refilled. Calls that cannot be admitted wait in a
+    bounded queue ordered by priority, then arrival. A call is rejected with
+    LLMQueueFullError when the queue is full or it has waited longer than `max_wait`.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None,
+                 max_queue: int = None, max_wait: float = None):
+        self.requests_per_minute = requests_per_minute or settings.LLM_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or settings.LLM_TOKENS_PER_MINUTE
+        self.max_queue = max_queue if max_queue is not None else settings.LLM_QUEUE_MAX_SIZE
+        self.max_wait = max_wait if max_wait is not None else settings.LLM_QUEUE_MAX_WAIT_SECONDS
+        self._lock = threading.Lock()
+        self._requests = float(self.requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._queue = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+
+    # --- Buckets (call with the lock held) ---
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _needed_tokens(self, tokens: int) -> float:
+        # A call larger than the whole bucket only needs a full bucket; the rest becomes debt.
+        return min(max(tokens, 1), self.tokens_per_minute)
+
+    def _can_admit(self, tokens: int) -> bool:
+        return self._requests >= 1 and self._tokens >= self._needed_tokens(tokens)
+
+    def _take(self, tokens: int) -> None:
+        self._requests -= 1
+        self._tokens -= tokens
+        if tokens:
+            metrics.inc("hr_llm_tokens_total", tokens)
+
+    def _seconds_until_admissible(self, tokens: int) -> float:
+        request_wait = (1 - self._requests) * 60 / self.requests_per_minute
+        token_wait = (self._needed_tokens(tokens) - self._tokens) * 60 / self.tokens_per_minute
+        return max(request_wait, token_wait, 0.0)
+
+    def _dispatch(self) -> float:
+        """Admits queued calls in priority order. Returns how long until the head can be admitted."""
+        self._refill(time.monotonic())
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if not self._can_admit(waiter.tokens):
+                metrics.set_gauge("hr_llm_queue_depth", len(self._queue))
+                return self._seconds_until_admissible(waiter.tokens)
+            heapq.heappop(self._queue)
+            self._take(waiter.tokens)
+            waiter.granted = True
+            waiter.notify()
+        metrics.set_gauge("hr_llm_queue_depth", 0)
+        return 0.0
+
+    # --- Admission ---
+
+    def _try_enter(self, priority: int, tokens: int, blocking: bool, loop=None) -> _Waiter | bool:
+        """Admits immediately when nobody is waiting, otherwise enqueues. Returns True, False or a waiter."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self._queue and self._can_admit(tokens):
+                self._take(tokens)
+                self._record(priority, 0.0, "admitted")
+                return True
+            if not blocking:
+                return False
+            if len(self._queue) >= self.max_queue:
+                self._record(priority, 0.0, "rejected")
+                raise LLMQueueFullError("queue_full")
+            waiter = _Waiter(priority, tokens, loop)
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            metrics.set_gauge("hr_llm_queue_depth", len(self._queue))
+            return waiter
+
+    def _wait_step(self, waiter: _Waiter) -> float | None:
+        """Dispatches and returns how long the waiter should sleep, or None once it is admitted."""
+        with self._lock:
+            delay = self._dispatch()
+            if waiter.granted:
+                self._record(waiter.priority, time.monotonic() - waiter.enqueued_at, "admitted")
+                return None
+            remaining = waiter.enqueued_at + self.max_wait - time.monotonic()
+            if remaining <= 0:
+                waiter.cancelled = True
+                self._record(waiter.priority, self.max_wait, "timeout")
+                raise LLMQueueFullError("timeout")
+            return min(max(delay, 0.005), remaining)
+
+    @staticmethod
+    def _record(priority: int, waited: float, result: str) -> None:
+        metrics.inc("hr_llm_admissions_total", result=result)
+        metrics.observe("hr_llm_queue_wait_seconds", waited, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        if waited:
+            tracing.record_span(tracing.STAGE_LLM_QUEUE, PRIORITY_NAMES.get(priority, str(priority)), waited, result=result)
+        if result != "admitted":
+            logger.warning(f"Model call ({PRIORITY_NAMES.get(priority, priority)}) {result} after {waited:.1f}s in queue.")
+
+    def acquire(self, tokens: int = 0, priority: int = None, blocking: bool = True) -> bool:
+        """Waits (in the calling thread) until a model call may be made. Raises LLMQueueFullError."""
+        priority = current_priority() if priority is None else priority
+        waiter = self._try_enter(priority, tokens, blocking)
+        if not isinstance(waiter, _Waiter):
+            return waiter
+        while (delay := self._wait_step(waiter)) is not None:
+            waiter.event.wait(delay)
+        return True
+
+    async def aacquire(self, tokens: int = 0, priority: int = None, blocking: bool = True) -> bool:
+        """Like acquire(), but waits without blocking the event loop."""
+        priority = current_priority() if priority is None else priority
+        waiter = self._try_enter(priority, tokens, blocking, loop=asyncio.get_running_loop())
+        if not isinstance(waiter, _Waiter):
+            return waiter
+        try:
+            while (delay := self._wait_step(waiter)) is not None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            waiter.cancelled = True
+            raise
+        return True
+
+    def charge(self, tokens: int) -> None:
+        """Charges tokens used by a call that was admitted without knowing its cost."""
+        if tokens > 0:
+            with self._lock:
+                self._refill(time.monotonic())
+                self._tokens -= tokens
+            metrics.inc("hr_llm_tokens_total", tokens)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(1 for _, _, waiter in self._queue if not waiter.cancelled)
+
+
+# --- LangChain Integration ---
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """Rate limiter for chat models that admits each call through the scheduler."""
+
+    def __init__(self, scheduler: LLMScheduler):
+        self.scheduler = scheduler
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return self.scheduler.acquire(blocking=blocking)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await self.scheduler.aacquire(blocking=blocking)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Charges the tokens a chat model reports after each call."""
+
+    def __init__(self, scheduler: LLMScheduler):
+        self.scheduler = scheduler
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.scheduler.charge(tracing.llm_response_tokens(response))
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings wrapper that admits every call through the scheduler, charged by input tokens."""
+
+    def __init__(self, embeddings: Embeddings, scheduler: LLMScheduler):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.scheduler.acquire(tokens=sum(count_tokens(text) for text in texts))
+        with tracing.span(tracing.STAGE_EMBEDDING, "documents", texts=len(texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self.scheduler.acquire(tokens=count_tokens(text))
+        with tracing.span(tracing.STAGE_EMBEDDING, "query"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await self.scheduler.aacquire(tokens=sum(count_tokens(text) for text in texts))
+        with tracing.span(tracing.STAGE_EMBEDDING, "documents", texts=len(texts)):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await self.scheduler.aacquire(tokens=count_tokens(text))
+        with tracing.span(tracing.STAGE_EMBEDDING, "query"):
+            return await self.embeddings.aembed_query(text)
+
+
+@lru_cache(maxsize=1)
+def get_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler()
+
+
+def scheduled_chat_model(model: str, **kwargs):
+    """Creates a ChatOpenAI client whose calls go through the process-wide scheduler."""
+    from langchain_openai import ChatOpenAI
+    scheduler = get_llm_scheduler()
+    return ChatOpenAI(
+        model=model,
+        api_key=settings.OPENAI_API_KEY,
+        rate_limiter=SchedulerRateLimiter(scheduler),
+        callbacks=[TokenUsageHandler(scheduler)],
+        stream_usage=True,
+        **kwargs
+    )
+
+
+def scheduled_embeddings(embeddings: Embeddings) -> ScheduledEmbeddings:
+    return ScheduledEmbeddings(embeddings, get_llm_scheduler())
@@ -0,0 +1,161 @@
+# utils/memory.py
+import asyncio
+import logging
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from config import settings
+from utils.llm_scheduler import scheduled_chat_model
+from utils.token_counter import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a job candidate and an HR assistant.
+Fold the new lines of conversation into the existing summary. Keep facts that matter for later turns
+(jobs discussed and their IDs, applications made, open questions, stated preferences) and drop greetings,
+raw tool output and long job descriptions. Write the summary in the language of the conversation and keep it
+under {max_tokens} tokens.
+
+Existing summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+Updated summary:"""
+
+# Turns that could not be summarized (e.g. the model was unavailable) are kept
+# for the next attempt, but never more than this many.
+MAX_PENDING_TURNS = 20
+
+
+class TokenBudgetMemory:
+    """
+    Conversation memory that keeps `chat_history` under a fixed token budget.
+
+    The most recent turns are kept verbatim. Turns that no longer fit are moved to a
+    pending queue and folded into a running summary by `asummarize()`, which is meant
+    to run after the response has been sent so it never delays a reply.
+    Exposes the same `load_memory_variables`/`save_context` interface as LangChain memories.
+    """
+
+    def __init__(self, token_budget: int = None, summary_token_budget: int = None,
+                 summary_llm=None, memory_key: str = "chat_history"):
+        self.token_budget = token_budget or settings.MEMORY_TOKEN_BUDGET
+        self.summary_token_budget = summary_token_budget or settings.MEMORY_SUMMARY_TOKEN_BUDGET
+        self.memory_key = memory_key
+        self.summary = ""
+        self.turns = []  # list of (user_text, ai_text), oldest first
+        self.pending = []  # turns evicted from the window, waiting to be summarized
+        self._summary_llm = summary_llm
+        self._summarize_lock = asyncio.Lock()
+
+    # --- LangChain memory interface ---
+
+    def load_memory_variables(self, inputs: dict) -> dict:
+        messages = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for user_text, ai_text in self.turns:
+            messages.append(HumanMessage(content=user_text))
+            messages.append(AIMessage(content=ai_text))
+        return {self.memory_key: messages}
+
+    def save_context(self, inputs: dict, outputs: dict) -> None:
+        user_text = str(inputs.get("input", ""))
+        ai_text = str(outputs.get("output", ""))
+        self.turns.append((user_text, ai_text))
+        self._enforce_budget()
+
+    def clear(self) -> None:
+        self.summary = ""
+        self.turns = []
+        self.pending = []
+
+    # --- Serialization ---
+
+    def to_dict(self) -> dict:
+        """Compact, JSON-friendly form: turns are stored as [user, assistant] pairs, not message objects."""
+        return {
+            "s": self.summary,
+            "t": [list(turn) for turn in self.turns],
+            "p": [list(turn) for turn in self.pending],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "TokenBudgetMemory":
+        memory = cls(**kwargs)
+        if data:
+            memory.summary = data.get("s", "")
+            memory.turns = [tuple(turn) for turn in data.get("t", [])]
+            memory.pending = [tuple(turn) for turn in data.get("p", [])]
+        return memory
+
+    # --- Budgeting ---
+
+    def _turn_tokens(self, turn: tuple) -> int:
+        return count_tokens(turn[0]) + count_tokens(turn[1])
+
+    def _enforce_budget(self) -> None:
+        available = self.token_budget - count_tokens(self.summary)
+        total = sum(self._turn_tokens(turn) for turn in self.turns)
+
+        # Move the oldest turns out of the verbatim window until we fit.
+        while total > available and len(self.turns) > 1:
+            oldest = self.turns.pop(0)
+            total -= self._turn_tokens(oldest)
+            self.pending.append(oldest)
+
+        # A single turn can still be larger than the whole budget (e.g. a full job description).
+        if self.turns and total > available:
+            user_text, ai_text = self.turns[-1]
+            ai_budget = max(available - count_tokens(user_text), available // 2, 1)
+            self.turns[-1] = (user_text, truncate_to_tokens(ai_text, ai_budget))
+
+        if len(self.pending) > MAX_PENDING_TURNS:
+            dropped = len(self.pending) - MAX_PENDING_TURNS
+            logger.warning(f"Dropping {dropped} unsummarized turns from memory.")
+            self.pending = self.pending[dropped:]
+
+    # --- Summarization (off the critical path) ---
+
+    def _get_summary_llm(self):
+        if self._summary_llm is None:
+            self._summary_llm = scheduled_chat_model(settings.MEMORY_SUMMARY_MODEL, temperature=0)
+        return self._summary_llm
+
+    async def asummarize(self) -> None:
+        """Folds pending turns into the running summary. Safe to call when there is nothing to do."""
+        async with self._summarize_lock:
+            if not self.pending:
+                return
+            batch = list(self.pending)
+            new_lines = "\n".join(f"Candidate: {user_text}\nAssistant: {ai_text}" for user_text, ai_text in batch)
+            prompt = SUMMARY_PROMPT.format(
+                max_tokens=self.summary_token_budget,
+                summary=self.summary or "(empty)",
+                new_lines=new_lines,
+            )
+            try:
+                result = await self._get_summary_llm().ainvoke(prompt)
+            except Exception as e:
+                logger.error(f"Failed to summarize conversation memory, will retry on the next turn: {e}")
+                return
+
+            self.summary = truncate_to_tokens(str(result.content).strip(), self.summary_token_budget)
+            self.pending = self.pending[len(batch):]
+            logger.info(
+                f"Summarized {len(batch)} turns into memory summary ({count_tokens(self.summary)} tokens)."
+            )
+            self._enforce_budget()
+
+    async def acompact(self) -> None:
+        """
+        Shrinks an idle conversation to its summary plus the latest turn.
+        If the summary cannot be produced, the unsummarized turns are dropped.
+        """
+        if len(self.turns) > 1:
+            self.pending.extend(self.turns[:-1])
+            self.turns = self.turns[-1:]
+        await self.asummarize()
+        self.pending = []
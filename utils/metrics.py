@@ -0,0 +1,180 @@
+# utils/metrics.py
+import errno
+import logging
+import math
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# A deliberately small, dependency-free metrics registry. Values are kept in
+# process memory and rendered in the Prometheus text exposition format.
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> float
+_gauges = {}    # (name, labels) -> float
+_summaries = {} # (name, labels) -> [count, sum, recent observations]
+_help = {}      # name -> help text
+
+# Summaries also report quantiles over their most recent observations. A bounded
+# window keeps memory constant and lets the percentiles follow the current load.
+QUANTILES = (0.5, 0.95, 0.99)
+_QUANTILE_WINDOW = 1024
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name: str, help_text: str) -> None:
+    """Registers the HELP line shown for a metric."""
+    _help[name] = help_text
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Increments a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Sets a gauge to an absolute value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Records one observation (e.g. a duration in seconds) for a summary metric."""
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.setdefault(key, [0, 0.0, deque(maxlen=_QUANTILE_WINDOW)])
+        summary[0] += 1
+        summary[1] += value
+        summary[2].append(value)
+
+
+def get_value(name: str, **labels) -> float:
+    """Returns the current value of a counter or gauge (0 if it was never recorded)."""
+    key = _key(name, labels)
+    with _lock:
+        return _counters.get(key, _gauges.get(key, 0))
+
+
+def _quantile(values: list, q: float) -> float:
+    """Nearest-rank quantile of sorted values."""
+    index = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+    return values[index]
+
+
+def get_quantile(name: str, q: float, **labels) -> float | None:
+    """Returns a quantile of a summary's recent observations (None if it has none)."""
+    with _lock:
+        summary = _summaries.get(_key(name, labels))
+        values = sorted(summary[2]) if summary else []
+    return _quantile(values, q) if values else None
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def render_prometheus() -> str:
+    """Renders every metric in the Prometheus text format."""
+    lines = []
+    with _lock:
+        for kind, values in (("counter", _counters), ("gauge", _gauges)):
+            seen = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in seen:
+                    seen.add(name)
+                    if name in _help:
+                        lines.append(f"# HELP {name} {_help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        seen = set()
+        for (name, labels), (count, total, recent) in sorted(_summaries.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name]}")
+                lines.append(f"# TYPE {name} summary")
+            values = sorted(recent)
+            for q in QUANTILES:
+                lines.append(f"{name}{_format_labels(labels + (('quantile', q),))} {_quantile(values, q)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Exposition Endpoint ---
+
+# Set to 1 by the process once it can take traffic (see utils/warmup.py); /ready reports it.
+READY_GAUGE = "hr_ready"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def _reply(self, status: int, body: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._reply(200, render_prometheus())
+        elif path == "/ready":
+            # For readiness probes: 503 until startup warmup has finished.
+            ready = get_value(READY_GAUGE) >= 1
+            self._reply(200 if ready else 503, "ready\n" if ready else "starting\n")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the application log.
+        pass
+
+
+_server = None
+
+
+def _bind(host: str, port: int, attempts: int) -> ThreadingHTTPServer:
+    """Binds the first free port of port .. port + attempts - 1."""
+    for offset in range(attempts):
+        try:
+            return ThreadingHTTPServer((host, port + offset), _MetricsHandler)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE or offset == attempts - 1:
+                raise
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", attempts: int = 1) -> ThreadingHTTPServer | None:
+    """
+    Serves /metrics in the Prometheus text format, and /ready, from a daemon thread. With
+    several workers on one host, each takes the next free one of `attempts` ports. Idempotent;
+    returns the server, or None if the port is 0 (disabled) or could not be bound.
+    """
+    global _server
+    if _server is not None or not port:
+        return _server
+    try:
+        server = _bind(host, port, max(attempts, 1))
+    except OSError as e:
+        logger.error(f"Could not start the metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    _server = server
+    logger.info(f"Serving Prometheus metrics on http://{host}:{server.server_port}/metrics (readiness: /ready)")
+    return server
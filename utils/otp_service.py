@@ -0,0 +1,142 @@
+# utils/otp_service.py
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from functools import lru_cache
+
+import requests
+
+from config import settings
+from utils import http_client, metrics
+from utils.session_store import get_session_store
+from utils.text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_otp_sent_total", "OTP codes sent, by outcome.")
+metrics.describe("hr_otp_verifications_total", "OTP verification attempts, by result.")
+
+# Verification results
+OTP_VALID = "valid"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+OTP_LOCKED = "locked"
+
+_GLOBAL_KEY = "__global__"
+
+
+class OTPError(Exception):
+    """Raised when a code cannot be sent. `user_message` is safe to show to the user."""
+
+    def __init__(self, user_message: str, reason: str):
+        super().__init__(reason)
+        self.user_message = user_message
+        self.reason = reason
+
+
+def _hash_code(phone_number: str, code: str) -> str:
+    return hashlib.sha256(f"{phone_number}:{code}".encode("utf-8")).hexdigest()
+
+
+class OTPService:
+    """
+    Sends and verifies one-time login codes.
+
+    Codes, attempt counters and send history live in the session store, so every worker
+    enforces the same limits: a minimum interval and an hourly cap per phone number, a
+    global per-minute cap on SMS sends, an expiry per code and a maximum number of wrong
+    attempts. Only a hash of the code is stored.
+    """
+
+    def __init__(self, store=None, send_sms=None):
+        self._store = store or get_session_store()
+        self._send_sms = send_sms or self._post_to_webhook
+
+    # --- Sending ---
+
+    @staticmethod
+    def _post_to_webhook(phone_number: str, message: str) -> None:
+        response = http_client.post(
+            settings.N8N_SMS_WEBHOOK_URL,
+            service="sms_webhook",
+            json={"sms": message, "who": phone_number},
+            timeout=settings.OTP_SMS_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+
+    def _recent_sends(self, key: str, window: float, now: float) -> list:
+        return [t for t in self._store.get("otp_sends", key, []) if now - t < window]
+
+    def _check_rate_limits(self, phone_number: str, now: float) -> None:
+        phone_sends = self._recent_sends(phone_number, 3600, now)
+        if phone_sends and now - phone_sends[-1] < settings.OTP_MIN_RESEND_INTERVAL_SECONDS:
+            wait = int(settings.OTP_MIN_RESEND_INTERVAL_SECONDS - (now - phone_sends[-1])) + 1
+            raise OTPError(f"کد تایید به تازگی ارسال شده است. لطفاً {wait} ثانیه دیگر دوباره تلاش کنید.", "resend_interval")
+        if len(phone_sends) >= settings.OTP_MAX_SENDS_PER_HOUR:
+            raise OTPError("تعداد درخواست‌های کد برای این شماره بیش از حد مجاز است. لطفاً یک ساعت دیگر تلاش کنید.", "phone_hourly_limit")
+        if len(self._recent_sends(_GLOBAL_KEY, 60, now)) >= settings.OTP_GLOBAL_MAX_SENDS_PER_MINUTE:
+            raise OTPError("سامانه ارسال پیامک در حال حاضر شلوغ است. لطفاً دقایقی دیگر تلاش کنید.", "global_limit")
+
+    def _record_send(self, phone_number: str, now: float) -> None:
+        self._store.set("otp_sends", phone_number, self._recent_sends(phone_number, 3600, now) + [now], ttl=3600)
+        self._store.set("otp_sends", _GLOBAL_KEY, self._recent_sends(_GLOBAL_KEY, 60, now) + [now], ttl=60)
+
+    async def send_code(self, phone_number: str) -> None:
+        """Generates a new code and sends it by SMS without blocking the event loop. Raises OTPError."""
+        now = time.time()
+        try:
+            self._check_rate_limits(phone_number, now)
+        except OTPError as e:
+            metrics.inc("hr_otp_sent_total", result=e.reason)
+            logger.warning(f"OTP send for {phone_number} rejected: {e.reason}")
+            raise
+
+        code = f"{secrets.randbelow(900000) + 100000}"
+        self._record_send(phone_number, now)
+        try:
+            await asyncio.to_thread(self._send_sms, phone_number, f"کد ورود شما به سیستم استخدام: {code}")
+        except requests.exceptions.RequestException as e:
+            metrics.inc("hr_otp_sent_total", result="error")
+            logger.error(f"Failed to send OTP SMS to {phone_number}: {e}")
+            raise OTPError("مشکلی در فرآیند ارسال کد پیش آمد. لطفاً دقایقی دیگر مجددا تلاش کنید.", "sms_error") from e
+
+        self._store.set(
+            "otp", phone_number,
+            {"hash": _hash_code(phone_number, code), "attempts": 0, "expires_at": now + settings.OTP_TTL_SECONDS},
+            ttl=settings.OTP_TTL_SECONDS,
+        )
+        metrics.inc("hr_otp_sent_total", result="sent")
+        logger.info(f"OTP sent to {phone_number}")
+
+    # --- Verification ---
+
+    def verify(self, phone_number: str, code: str) -> str:
+        """Checks a code. Returns OTP_VALID, OTP_INVALID, OTP_EXPIRED or OTP_LOCKED."""
+        record = self._store.get("otp", phone_number)
+        if record is None:
+            result = OTP_EXPIRED
+        elif record["attempts"] >= settings.OTP_MAX_ATTEMPTS:
+            result = OTP_LOCKED
+        elif hmac.compare_digest(record["hash"], _hash_code(phone_number, normalize_text(code))):
+            self._store.delete("otp", phone_number)
+            result = OTP_VALID
+        else:
+            record["attempts"] += 1
+            # A wrong attempt must not extend the code's lifetime.
+            self._store.set("otp", phone_number, record, ttl=max(1, record["expires_at"] - time.time()))
+            result = OTP_LOCKED if record["attempts"] >= settings.OTP_MAX_ATTEMPTS else OTP_INVALID
+
+        metrics.inc("hr_otp_verifications_total", result=result)
+        return result
+
+    def remaining_attempts(self, phone_number: str) -> int:
+        record = self._store.get("otp", phone_number)
+        return 0 if record is None else max(0, settings.OTP_MAX_ATTEMPTS - record["attempts"])
+
+
+@lru_cache(maxsize=1)
+def get_otp_service() -> OTPService:
+    return OTPService()
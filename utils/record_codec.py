@@ -0,0 +1,170 @@
+# utils/record_codec.py
+from functools import lru_cache
+
+from config import settings
+
+# A codec is compiled once per NocoDB table from the field maps in config/settings.py.
+# Decoding and encoding are generated as straight-line functions (one statement per
+# field), so a list response is translated without building lookup tables per row.
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+
+# Marks a field that was absent from the API object (as opposed to present with a null value).
+MISSING = _Missing()
+
+# Table name -> (field map, link fields, relations)
+#   link fields: internal key -> NocoDB foreign-key column (written when creating links)
+#   relations:   internal key of a nested linked record -> table name of that record
+TABLE_SCHEMAS = {
+    "Candidates": (settings.CANDIDATE_FIELD_MAP, {}, {}),
+    "JobOpportunities": (settings.JOB_OPPORTUNITY_FIELD_MAP, {}, {}),
+    "HiringRecords": (
+        settings.HIRING_RECORD_FIELD_MAP,
+        settings.HIRING_RECORD_LINK_FIELDS,
+        settings.HIRING_RECORD_RELATIONS,
+    ),
+    "Feedbacks": (settings.FEEDBACK_FIELD_MAP, {}, {}),
+}
+
+
+class _RecordBase:
+    __slots__ = ()
+    _fields = ()
+
+    def get(self, name: str, default=None):
+        value = getattr(self, name, MISSING)
+        return default if value is MISSING else value
+
+    def to_dict(self) -> dict:
+        """Returns the fields present in the API object, with internal keys (nested records included)."""
+        data = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            if value is MISSING:
+                continue
+            if isinstance(value, _RecordBase):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, _RecordBase) else item for item in value]
+            data[name] = value
+        return data
+
+    def __repr__(self):
+        inner = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({inner})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self._fields)
+
+
+def _make_record_type(table_name: str, fields: tuple) -> type:
+    namespace = {"__slots__": fields, "_fields": fields}
+    init_args = ", ".join(f"{name}=MISSING" for name in fields)
+    init_body = "\n".join(f"    self.{name} = {name}" for name in fields) or "    pass"
+    exec(f"def __init__(self, {init_args}):\n{init_body}", {"MISSING": MISSING}, namespace)
+    return type(f"{table_name}Record", (_RecordBase,), namespace)
+
+
+def _compile(source: str, name: str, namespace: dict):
+    exec(source, namespace)
+    return namespace[name]
+
+
+class RecordCodec:
+    """Translates between NocoDB API objects (Persian keys) and internal records (English keys)."""
+
+    def __init__(self, table_name: str, field_map: dict, link_fields: dict = None, relations: dict = None):
+        self.table_name = table_name
+        self.field_map = dict(field_map)
+        self.link_fields = dict(link_fields or {})
+        self.relations = dict(relations or {})
+        # Link columns are part of the wire format too, so they get their own slots.
+        self.wire_map = {**self.field_map, **self.link_fields}
+        self.fields = tuple(self.wire_map)
+        self.record_type = _make_record_type(table_name, self.fields)
+
+        namespace = {"Record": self.record_type, "MISSING": MISSING}
+        pairs = list(self.wire_map.items())
+
+        # decode(): API object -> slotted record
+        args = []
+        for internal_key, api_key in pairs:
+            value = f"get({api_key!r}, MISSING)"
+            if internal_key in self.relations:
+                value = f"_decode_relation_{internal_key}({value})"
+            args.append(f"{internal_key}={value}")
+        self.decode = _compile(
+            "def decode(api_object):\n"
+            "    get = api_object.get\n"
+            f"    return Record({', '.join(args)})\n",
+            "decode", namespace,
+        )
+
+        # decode_dict(): API object -> plain dict with only the keys that were present
+        lines = ["def decode_dict(api_object):", "    data = {}"]
+        for internal_key, api_key in pairs:
+            lines.append(f"    if {api_key!r} in api_object:")
+            value = f"api_object[{api_key!r}]"
+            if internal_key in self.relations:
+                value = f"_decode_relation_{internal_key}({value}, as_dict=True)"
+            lines.append(f"        data[{internal_key!r}] = {value}")
+        lines.append("    return data")
+        self.decode_dict = _compile("\n".join(lines) + "\n", "decode_dict", namespace)
+
+        # encode(): internal dict -> API payload with only the keys that were present
+        lines = ["def encode(data):", "    payload = {}"]
+        for internal_key, api_key in pairs:
+            lines.append(f"    if {internal_key!r} in data:")
+            lines.append(f"        payload[{api_key!r}] = data[{internal_key!r}]")
+        lines.append("    return payload")
+        self._encode_dict = _compile("\n".join(lines) + "\n", "encode", namespace)
+
+        for internal_key, related_table in self.relations.items():
+            namespace[f"_decode_relation_{internal_key}"] = self._relation_decoder(related_table)
+
+    @staticmethod
+    def _relation_decoder(related_table: str):
+        def decode_relation(value, as_dict: bool = False):
+            # NocoDB returns a nested object for single links and a list for many-to-many links.
+            codec = get_codec(related_table)
+            decode_one = codec.decode_dict if as_dict else codec.decode
+            if isinstance(value, dict):
+                return decode_one(value)
+            if isinstance(value, list):
+                return [decode_one(item) if isinstance(item, dict) else item for item in value]
+            return value
+        return decode_relation
+
+    def encode(self, data) -> dict:
+        """Translates an internal dict or record into an API payload."""
+        if isinstance(data, _RecordBase):
+            data = data.to_dict()
+        return self._encode_dict(data)
+
+    def decode_many(self, api_objects: list) -> list:
+        decode = self.decode
+        return [decode(obj) for obj in api_objects]
+
+    def decode_many_dicts(self, api_objects: list) -> list:
+        decode_dict = self.decode_dict
+        return [decode_dict(obj) for obj in api_objects]
+
+    def encode_many(self, records: list) -> list:
+        encode = self.encode
+        return [encode(record) for record in records]
+
+
+@lru_cache(maxsize=None)
+def get_codec(table_name: str) -> RecordCodec:
+    """Returns the codec for a table in TABLE_SCHEMAS, compiled on first use."""
+    field_map, link_fields, relations = TABLE_SCHEMAS[table_name]
+    return RecordCodec(table_name, field_map, link_fields, relations)
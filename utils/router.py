@@ -0,0 +1,106 @@
+# utils/router.py
+import logging
+import re
+from typing import NamedTuple
+
+from utils import metrics
+from utils.text_normalizer import normalize_key
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_router_turns_total", "Chat turns by routing tier.")
+
+# Tiers, cheapest first:
+#   smalltalk: greetings, thanks, goodbyes. Minimal prompt, no tools, no history.
+#   focused:   one recognizable intent. Full persona, only the tools for that intent.
+#   full:      anything else (several intents, follow-ups, unknown). The complete agent.
+TIER_SMALLTALK = "smalltalk"
+TIER_FOCUSED = "focused"
+TIER_FULL = "full"
+
+
+class Route(NamedTuple):
+    tier: str
+    intent: str | None = None
+    tools: tuple = ()
+
+
+FULL_ROUTE = Route(TIER_FULL)
+SMALLTALK_ROUTE = Route(TIER_SMALLTALK, "smalltalk")
+
+# Intent -> (tools it needs, keyword patterns). Patterns are matched against the
+# normalized message; keep them specific enough that one message rarely hits two intents.
+INTENTS = {
+    "job_list": (
+        ("get_open_job_positions", "get_job_details"),
+        [r"موقعیت(?:\s?های)? شغلی", r"فرصت(?:\s?های)? شغلی", r"شغل(?:\s?های)? (?:باز|خالی|موجود)",
+         r"(?:چه|کدام|چند) (?:شغل|موقعیت) ?ها", r"استخدام دارید", r"آگهی", r"open (?:jobs|positions)"],
+    ),
+    "job_details": (
+        ("get_job_details", "get_open_job_positions", "apply_for_job_position"),
+        [r"جزئیات", r"شرح وظایف", r"شرایط احراز", r"details for job", r"job with id"],
+    ),
+    "apply": (
+        ("apply_for_job_position", "get_open_job_positions", "get_job_details"),
+        [r"درخواست (?:بدم|بدهم|دهم|بده|ثبت)", r"ثبت درخواست", r"(?:می ?خواهم|می ?خوام) (?:برای|در) .*(?:اقدام|درخواست)",
+         r"رزومه (?:بفرستم|ارسال)", r"\bapply\b"],
+    ),
+    "status": (
+        ("get_application_status",),
+        [r"وضعیت (?:درخواست|رزومه|استخدام)", r"نتیجه (?:درخواست|مصاحبه)", r"پیگیری", r"درخواست(?:\s?های)? من",
+         r"application status"],
+    ),
+    "recommend": (
+        ("recommend_jobs", "get_job_details"),
+        [r"پیشنهاد", r"(?:مناسب|متناسب|به درد) (?:من|با)", r"برای من (?:مناسب|خوب)", r"recommend"],
+    ),
+    "knowledge": (
+        ("query_knowledge_base", "query_knowledge_base_batch"),
+        [r"مزایا", r"بیمه", r"حقوق", r"ساعت(?:\s?های)? کاری", r"مرخصی", r"فرهنگ", r"مصاحبه", r"فرآیند",
+         r"دوره آزمایشی", r"قرارداد", r"دورکاری", r"پاداش", r"شرکت میهن", r"درباره شرکت", r"\bbenefits?\b"],
+    ),
+}
+
+_SMALLTALK_WORDS = {
+    "سلام", "درود", "صبح", "عصر", "شب", "بخیر", "به", "خیر", "وقت", "روز", "خسته", "نباشید", "نباشی",
+    "ممنون", "ممنونم", "مرسی", "متشکرم", "متشکر", "سپاس", "سپاسگزارم", "تشکر", "خیلی", "لطف", "دارید", "داری",
+    "کردید", "خداحافظ", "خدانگهدار", "فعلا", "عالی", "خوبه", "خوب", "چطوری", "خوبی", "خوبید", "حالت", "حالتون",
+    "چطوره", "هست", "هستید", "است", "و", "hi", "hello", "hey", "thanks", "thank", "you", "bye", "good", "morning",
+}
+# Short confirmations answer the assistant's last question, so they need the full agent
+# once there is a conversation; on their own they are small talk.
+_CONFIRMATION_WORDS = {"بله", "آره", "اره", "باشه", "حتما", "حتماً", "اوکی", "نه", "خیر", "ok", "okay", "yes", "no"}
+
+_SMALLTALK_MAX_WORDS = 8
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+_COMPILED_INTENTS = {
+    intent: (tools, [re.compile(pattern) for pattern in patterns])
+    for intent, (tools, patterns) in INTENTS.items()
+}
+
+
+def match_intents(text: str) -> list:
+    """Returns the intents whose keywords occur in the message, in INTENTS order."""
+    normalized = normalize_key(text)
+    return [intent for intent, (_, patterns) in _COMPILED_INTENTS.items() if any(p.search(normalized) for p in patterns)]
+
+
+def route_message(text: str, has_history: bool = False) -> Route:
+    """Chooses the cheapest tier that can answer the message."""
+    normalized = normalize_key(text)
+    words = _WORD_RE.findall(normalized)
+
+    if words and len(words) <= _SMALLTALK_MAX_WORDS and not re.search(r"\d", normalized):
+        vocabulary = _SMALLTALK_WORDS if has_history else _SMALLTALK_WORDS | _CONFIRMATION_WORDS
+        if all(word in vocabulary for word in words):
+            route = SMALLTALK_ROUTE
+            metrics.inc("hr_router_turns_total", tier=route.tier)
+            return route
+
+    intents = match_intents(normalized)
+    if len(intents) == 1:
+        route = Route(TIER_FOCUSED, intents[0], INTENTS[intents[0]][0])
+    else:
+        route = FULL_ROUTE
+    metrics.inc("hr_router_turns_total", tier=route.tier)
+    return route
@@ -0,0 +1,222 @@
+# utils/session_registry.py
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from config import settings
+from utils import metrics
+from utils.memory import TokenBudgetMemory
+from utils.session_store import get_session_store
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_sessions_active", "Sessions currently held in worker memory.")
+metrics.describe("hr_sessions_memory_bytes", "Approximate bytes held by active sessions.")
+metrics.describe("hr_sessions_evicted_total", "Sessions compacted and evicted from worker memory.")
+metrics.describe("hr_sessions_resumed_total", "Sessions loaded back from the session store.")
+metrics.describe("hr_session_conflicts_total", "Session writes rejected because another worker saved a newer version.")
+
+
+class SessionConflictError(Exception):
+    """The session was saved by someone else (another worker) since this state was read."""
+
+
+def estimate_size(obj, _seen=None) -> int:
+    """Approximate deep size in bytes of plain Python containers (dict/list/tuple/str/numbers)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class _Entry:
+    __slots__ = ("state", "last_seen", "size_bytes")
+
+    def __init__(self, state: dict):
+        self.state = state
+        self.last_seen = time.monotonic()
+        self.size_bytes = estimate_size(state)
+
+
+class SessionRegistry:
+    """
+    Process-local registry of active sessions, in front of the session store.
+
+    Every state change is written through to the store, so evicting a session from
+    the registry never loses what is needed to resume it. Sessions idle for longer than
+    `idle_ttl` (or the least recently used ones when the global caps are exceeded) are
+    compacted: the memory is folded into its summary, the last response is dropped,
+    and the compacted state replaces the full one in the store.
+
+    With a store shared between workers, a session may have moved on in another worker
+    since it was cached here: `get` re-reads the store's copy when its version differs,
+    and `put` refuses to overwrite a version it did not start from.
+    """
+
+    def __init__(self, store=None, idle_ttl: float = None, max_sessions: int = None,
+                 max_bytes: int = None, state_ttl: float = None, compacted_ttl: float = None, summary_llm=None):
+        self._store = store or get_session_store()
+        self._summary_llm = summary_llm
+        self.idle_ttl = idle_ttl if idle_ttl is not None else settings.SESSION_IDLE_TTL_SECONDS
+        self.max_sessions = max_sessions if max_sessions is not None else settings.SESSION_MAX_ACTIVE
+        self.max_bytes = max_bytes if max_bytes is not None else settings.SESSION_MAX_TOTAL_BYTES
+        self.state_ttl = state_ttl if state_ttl is not None else settings.SESSION_STATE_TTL_SECONDS
+        self.compacted_ttl = compacted_ttl if compacted_ttl is not None else settings.SESSION_COMPACTED_TTL_SECONDS
+        self._entries = OrderedDict()  # session_id -> _Entry, least recently used first
+        self._total_bytes = 0
+        self._wake = None
+        self._sweeper = None
+
+    # --- Access ---
+
+    def get(self, session_id: str) -> dict | None:
+        entry = self._entries.get(session_id)
+        if entry is not None and not getattr(self._store, "shared", False):
+            entry.last_seen = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry.state
+
+        state = self._store.get("sessions", session_id)
+        if state is None:
+            self._forget(session_id)
+            return None
+        if entry is not None and entry.state.get("version") == state.get("version"):
+            entry.last_seen = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry.state
+        metrics.inc("hr_sessions_resumed_total")
+        self._track(session_id, state)
+        return state
+
+    def peek(self, session_id: str) -> dict | None:
+        """Returns the in-memory state of an active session without loading it or marking it as used."""
+        entry = self._entries.get(session_id)
+        return entry.state if entry is not None else None
+
+    def put(self, session_id: str, state: dict) -> None:
+        """Saves the state. Raises SessionConflictError if the stored version is not the one it was read at."""
+        expected_version = state.get("version", 0)
+        stored = {**state, "version": expected_version + 1}
+        stored.pop("compacted", None)
+        if not self._store.set_if_version("sessions", session_id, stored, expected_version, ttl=self.state_ttl):
+            metrics.inc("hr_session_conflicts_total")
+            # Drop the stale copy; the next get loads the newer state from the store.
+            self._forget(session_id)
+            raise SessionConflictError(f"session {session_id} was saved elsewhere since version {expected_version}")
+        state["version"] = stored["version"]
+        state.pop("compacted", None)
+        self._track(session_id, state)
+        if self._over_cap() and self._wake is not None:
+            self._wake.set()
+
+    def _track(self, session_id: str, state: dict) -> None:
+        old = self._entries.pop(session_id, None)
+        if old is not None:
+            self._total_bytes -= old.size_bytes
+        entry = _Entry(state)
+        self._entries[session_id] = entry
+        self._total_bytes += entry.size_bytes
+        self._publish_metrics()
+
+    def _forget(self, session_id: str) -> None:
+        old = self._entries.pop(session_id, None)
+        if old is not None:
+            self._total_bytes -= old.size_bytes
+            self._publish_metrics()
+
+    def _over_cap(self) -> bool:
+        return len(self._entries) > self.max_sessions or self._total_bytes > self.max_bytes
+
+    # --- Eviction ---
+
+    async def _evict(self, session_id: str, reason: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size_bytes
+        state = entry.state
+        version = state.get("version", 0)
+
+        memory = TokenBudgetMemory.from_dict(state.get("memory"), summary_llm=self._summary_llm)
+        await memory.acompact()
+        compacted = {
+            "user_profile": state.get("user_profile"),
+            "memory": memory.to_dict(),
+            "last_query": None,
+            "last_response": None,
+            "version": version,
+            "compacted": True,
+        }
+
+        # The session may have become active again while we were summarizing, here or (with
+        # a shared store) in another worker; then its newer state is kept.
+        if session_id in self._entries:
+            return
+        # A store in this process's memory is not bounded by the caps, so there compacted
+        # states are only kept for a while.
+        ttl = self.state_ttl if getattr(self._store, "shared", False) else min(self.state_ttl, self.compacted_ttl)
+        if not self._store.set_if_version("sessions", session_id, compacted, version, ttl=ttl):
+            return
+        metrics.inc("hr_sessions_evicted_total", reason=reason)
+        logger.info(
+            f"Evicted session {session_id} ({reason}); {entry.size_bytes} bytes -> {estimate_size(compacted)} bytes."
+        )
+
+    async def sweep(self) -> None:
+        """Evicts idle sessions, then least recently used ones until the global caps are respected."""
+        now = time.monotonic()
+        idle = [sid for sid, entry in self._entries.items() if now - entry.last_seen > self.idle_ttl]
+        for session_id in idle:
+            await self._evict(session_id, "idle")
+
+        while self._over_cap() and self._entries:
+            oldest = next(iter(self._entries))
+            await self._evict(oldest, "cap")
+
+        purged = self._store.purge_expired()
+        if purged:
+            logger.info(f"Purged {purged} expired entries from the session store.")
+        self._publish_metrics()
+
+    def start_sweeper(self, interval: float = None) -> None:
+        """Starts the periodic sweep on the running event loop (idempotent)."""
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        self._wake = asyncio.Event()
+        self._sweeper = asyncio.create_task(self._run_sweeper(interval or settings.SESSION_SWEEP_INTERVAL_SECONDS))
+
+    async def _run_sweeper(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    # --- Accounting ---
+
+    def _publish_metrics(self) -> None:
+        metrics.set_gauge("hr_sessions_active", len(self._entries))
+        metrics.set_gauge("hr_sessions_memory_bytes", self._total_bytes)
+
+    def stats(self) -> dict:
+        return {"active_sessions": len(self._entries), "memory_bytes": self._total_bytes}
+
+
+@lru_cache(maxsize=1)
+def get_session_registry() -> SessionRegistry:
+    return SessionRegistry()
@@ -0,0 +1,175 @@
+# utils/session_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(value) -> str:
+    """Compact JSON encoding used for every stored value."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class InMemorySessionStore:
+    """
+    Default store: keeps session state in this process only.
+    Suitable for a single worker; state is lost on restart.
+    """
+
+    # Only this process writes to it, so a process-local copy of a value is never stale.
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str, default=None):
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[(namespace, key)]
+                return default
+            return value
+
+    def set(self, namespace: str, key: str, value, ttl: float = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[(namespace, key)] = (value, expires_at)
+
+    def set_if_version(self, namespace: str, key: str, value, expected_version: int, ttl: float = None) -> bool:
+        """
+        Writes `value` only if the stored value is missing or still has `expected_version`
+        as its "version". Returns False (and writes nothing) if another write came first.
+        """
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            live = entry is not None and (entry[1] is None or entry[1] >= time.time())
+            if live and entry[0].get("version", 0) != expected_version:
+                return False
+            self._data[(namespace, key)] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def purge_expired(self) -> int:
+        """Removes expired entries. Returns the number of deleted entries."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at < now]
+            for k in expired:
+                del self._data[k]
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """
+    File-backed store shared by every worker process on the same host.
+    Uses SQLite in WAL mode so readers never block the writer.
+    """
+
+    # Other workers write to the same file, so a process-local copy may be stale.
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, default=None):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM session_state WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(namespace, key)
+            return default
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value, ttl: float = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        self._connection().execute(
+            "INSERT INTO session_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (namespace, key, _dumps(value), expires_at),
+        )
+
+    def set_if_version(self, namespace: str, key: str, value, expected_version: int, ttl: float = None) -> bool:
+        """
+        Writes `value` only if the stored value is missing or still has `expected_version`
+        as its "version". Returns False (and writes nothing) if another write came first.
+        """
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so no other worker writes between the check and the update.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM session_state WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            live = row is not None and (row[1] is None or row[1] >= time.time())
+            if live and json.loads(row[0]).get("version", 0) != expected_version:
+                conn.execute("ROLLBACK")
+                return False
+            self.set(namespace, key, value, ttl=ttl)
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connection().execute(
+            "DELETE FROM session_state WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def purge_expired(self) -> int:
+        """Removes expired entries. Returns the number of deleted rows."""
+        cursor = self._connection().execute(
+            "DELETE FROM session_state WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+@lru_cache(maxsize=1)
+def get_session_store():
+    """Returns the process-wide session store selected by `settings.SESSION_STORE_BACKEND`."""
+    backend = settings.SESSION_STORE_BACKEND
+    if backend == "sqlite":
+        logger.info(f"Using SQLite session store at '{settings.SESSION_STORE_PATH}'")
+        return SQLiteSessionStore(settings.SESSION_STORE_PATH)
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_STORE_BACKEND '{backend}', falling back to in-memory store.")
+    return InMemorySessionStore()
@@ -0,0 +1,103 @@
+# utils/speculative_retrieval.py
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+
+from config import settings
+from utils import metrics
+from utils.text_normalizer import normalize_key
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_speculative_retrieval_total", "Speculative knowledge-base retrievals by outcome.")
+metrics.describe("hr_speculative_retrieval_saved_seconds_total", "Retrieval time hidden behind the first LLM call.")
+
+# Retrieval runs in its own small pool so it never competes with LangChain's tool threads.
+_executor = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_RETRIEVAL_WORKERS, thread_name_prefix="kb-prefetch")
+
+# The prefetch started for the current turn. Tools run in threads that inherit the
+# handler's context, so the knowledge-base tool can find it.
+_current_prefetch: ContextVar["Prefetch | None"] = ContextVar("current_prefetch", default=None)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> set:
+    return set(_TOKEN_RE.findall(normalize_key(text)))
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the word sets of two queries."""
+    tokens_a, tokens_b = _tokens(a), _tokens(b)
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+class Prefetch:
+    """A knowledge-base retrieval started before the agent asked for it."""
+
+    def __init__(self, query: str, retrieve_fn):
+        self.query = query
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.consumed = False
+        # Run in a copy of the turn's context so the retrieval shows up in its trace.
+        self.future = _executor.submit(copy_context().run, self._run, retrieve_fn)
+
+    def _run(self, retrieve_fn):
+        try:
+            return retrieve_fn(self.query)
+        finally:
+            self.finished_at = time.monotonic()
+
+
+def start_prefetch(query: str, retrieve_fn) -> Prefetch:
+    """Starts retrieving `query` in the background and attaches it to the current turn."""
+    prefetch = Prefetch(query, retrieve_fn)
+    _current_prefetch.set(prefetch)
+    return prefetch
+
+
+def take_prefetched(query: str) -> str | None:
+    """
+    Called by the knowledge-base tool. Returns the prefetched result if the agent's
+    query is similar enough to the speculated one, otherwise None.
+    """
+    prefetch = _current_prefetch.get()
+    if prefetch is None or prefetch.consumed:
+        return None
+    similarity = query_similarity(prefetch.query, query)
+    if similarity < settings.SPECULATIVE_MATCH_THRESHOLD:
+        logger.info(f"Speculative retrieval not used (similarity {similarity:.2f}) for query '{query}'")
+        return None
+
+    requested_at = time.monotonic()
+    try:
+        result = prefetch.future.result()
+    except Exception as e:
+        logger.error(f"Speculative retrieval failed, retrieving again: {e}")
+        return None
+    prefetch.consumed = True
+
+    saved = max(0.0, min(prefetch.finished_at, requested_at) - prefetch.started_at)
+    metrics.inc("hr_speculative_retrieval_total", result="hit")
+    metrics.inc("hr_speculative_retrieval_saved_seconds_total", saved)
+    logger.info(f"Speculative retrieval hit (similarity {similarity:.2f}), saved {saved * 1000:.0f} ms.")
+    return result
+
+
+def finish_prefetch(prefetch: Prefetch) -> None:
+    """Ends the turn's speculation; an unused result is discarded."""
+    _current_prefetch.set(None)
+    if not prefetch.consumed:
+        prefetch.future.cancel()
+        metrics.inc("hr_speculative_retrieval_total", result="discarded")
+    hits = metrics.get_value("hr_speculative_retrieval_total", result="hit")
+    total = hits + metrics.get_value("hr_speculative_retrieval_total", result="discarded")
+    logger.info(
+        f"Speculative retrieval hit rate: {hits / total:.0%} over {int(total)} turns, "
+        f"{metrics.get_value('hr_speculative_retrieval_saved_seconds_total'):.2f} s saved in total."
+    )
@@ -0,0 +1,95 @@
+# utils/text_normalizer.py
+import re
+import unicodedata
+
+# One normalization for every place that compares or stores user text: ingestion,
+# retrieval queries, cache keys and phone parsing. Most text contains only a few of the
+# mapped characters, so instead of str.translate (a dict lookup per character) each
+# mapped character is looked for and replaced with the C-level str methods, and the
+# one regex only runs when its input has something to fix.
+
+ZWNJ = "\u200c"
+
+_CHAR_MAP = {
+    # Arabic letter forms -> Persian
+    "ي": "ی",
+    "ى": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    # No-break, thin and narrow spaces -> space
+    "\u00a0": " ",
+    "\u2009": " ",
+    "\u202f": " ",
+    # Zero-width space (often typed instead of ZWNJ) -> ZWNJ
+    "\u200b": ZWNJ,
+}
+# Persian (۰-۹) and Arabic-Indic (٠-٩) digits -> ASCII
+_CHAR_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_CHAR_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+# Removed: Arabic diacritics (harakat, tanwin, shadda, sukun, superscript alef),
+# tatweel, and invisible formatting marks (ZWJ, LRM/RLM, BOM, bidi embeddings).
+_DELETED = [chr(c) for c in range(0x064B, 0x0653)] + [
+    "\u0670", "\u0640", "\u200d", "\u200e", "\u200f", "\ufeff", "\u202a", "\u202b", "\u202c", "\u202d", "\u202e",
+]
+_CHAR_MAP.update({ch: None for ch in _DELETED})
+
+# (character, replacement) pairs; each is applied with str.replace only if the character occurs.
+_REPLACEMENTS = tuple((ch, target or "") for ch, target in _CHAR_MAP.items())
+# Keys treat ZWNJ as a space, so "می‌خواهم" and "می خواهم" share a key.
+_KEY_REPLACEMENTS = _REPLACEMENTS + ((ZWNJ, " "),)
+
+# A ZWNJ with spaces or more ZWNJs around it.
+_ZWNJ_RUN_RE = re.compile(r" +\u200c[\u200c ]*|\u200c[\u200c ]+")
+_TRAILING_PUNCTUATION = " ?؟!.,،;؛:"
+_PHONE_SEPARATORS_RE = re.compile(r"[\s\-().]")
+_IRAN_MOBILE_RE = re.compile(r"(?:\+98|0098|98|0)?(9\d{9})")
+
+
+def _replace_chars(text: str, replacements: tuple) -> str:
+    for ch, target in replacements:
+        if ch in text:
+            text = text.replace(ch, target)
+    return text
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form for stored and embedded text: Persian letters and ASCII digits,
+    no diacritics or invisible marks, single spaces, one ZWNJ between word parts.
+    Line breaks are kept; spaces at the start and end of lines are not.
+    """
+    if not text:
+        return ""
+    text = _replace_chars(unicodedata.normalize("NFC", text), _REPLACEMENTS)
+    # str.split() collapses every kind of blank at C speed; it is applied per line to keep the breaks.
+    text = "\n".join(" ".join(line.split()) for line in text.split("\n"))
+    if " " + ZWNJ in text or ZWNJ + " " in text or ZWNJ + ZWNJ in text:
+        text = _ZWNJ_RUN_RE.sub(ZWNJ, text)
+    return text.strip()
+
+
+def normalize_key(text: str) -> str:
+    """
+    Form used for comparing and caching user questions: normalize_text, plus case-folded,
+    ZWNJ as space, all whitespace collapsed to single spaces and no trailing punctuation.
+    """
+    if not text:
+        return ""
+    text = _replace_chars(unicodedata.normalize("NFC", text), _KEY_REPLACEMENTS).casefold()
+    return " ".join(text.split()).rstrip(_TRAILING_PUNCTUATION)
+
+
+def normalize_phone(text: str) -> str | None:
+    """
+    Parses an Iranian mobile number written with Persian, Arabic or ASCII digits and
+    common separators or country prefixes. Returns it as 09XXXXXXXXX, or None if invalid.
+    """
+    if not text:
+        return None
+    digits = _PHONE_SEPARATORS_RE.sub("", normalize_text(text))
+    match = _IRAN_MOBILE_RE.fullmatch(digits)
+    return f"0{match.group(1)}" if match else None
@@ -0,0 +1,55 @@
+# utils/token_counter.py
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer is available.
+# Persian text tokenizes denser than English, so we stay on the safe side.
+_FALLBACK_CHARS_PER_TOKEN = 3
+
+# Appended to text that was shortened to fit a token budget.
+TRUNCATION_MARKER = " [...]"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Loads the tiktoken encoding once. Returns None if it is unavailable (e.g. offline)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, falling back to a character estimate: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Returns the (approximate) number of model tokens in a piece of text."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // _FALLBACK_CHARS_PER_TOKEN + 1
+
+
+def count_message_tokens(messages: list) -> int:
+    """Counts tokens across a list of LangChain messages, including a small per-message overhead."""
+    return sum(count_tokens(str(message.content)) + 4 for message in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Shortens text to at most `max_tokens` tokens, cutting at a word boundary where possible."""
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    encoding = _get_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:keep])
+    else:
+        cut = text[:max(0, keep - 1) * _FALLBACK_CHARS_PER_TOKEN]
+    # Don't end in the middle of a word unless that would drop most of the text.
+    boundary = cut.rfind(" ")
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + TRUNCATION_MARKER
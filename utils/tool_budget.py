@@ -0,0 +1,104 @@
+# utils/tool_budget.py
+import json
+import logging
+
+from config import settings
+from utils import metrics
+from utils.token_counter import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_tool_output_tokens", "Tokens returned to the agent by each tool call.")
+metrics.describe("hr_tool_output_truncated_total", "Tool outputs shortened to fit their token budget.")
+
+# Tool outputs are re-sent to the model on every later step of the agent loop, so each
+# tool gets a token budget (see TOOL_OUTPUT_TOKEN_BUDGETS in config/settings.py). The
+# full payloads stay available to the UI through the non-tool fetch helpers.
+
+# Overlaps shorter than this are treated as coincidence, not as a splitter overlap.
+_MIN_CHUNK_OVERLAP = 40
+
+
+def get_budget(tool_name: str) -> int:
+    return settings.TOOL_OUTPUT_TOKEN_BUDGETS.get(tool_name, settings.TOOL_OUTPUT_DEFAULT_TOKEN_BUDGET)
+
+
+def project_fields(record: dict, fields) -> dict:
+    """Keeps only `fields` of a record (in that order), skipping empty values."""
+    return {name: record[name] for name in fields if record.get(name) not in (None, "", [])}
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    probe = right[:_MIN_CHUNK_OVERLAP]
+    if len(probe) < _MIN_CHUNK_OVERLAP:
+        return 0
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def dedupe_chunks(chunks: list) -> list:
+    """
+    Removes repeated text from retrieved chunks: chunks contained in an earlier one are
+    dropped, and the text a chunk shares with a neighbouring chunk (the splitter's
+    overlap) is kept only once. Order is preserved.
+    """
+    kept = []
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk or any(chunk in previous for previous in kept):
+            continue
+        for previous in kept:
+            head = _overlap(previous, chunk)
+            if head:
+                chunk = chunk[head:]
+            tail = _overlap(chunk, previous)
+            if tail:
+                chunk = chunk[:-tail]
+        chunk = chunk.strip()
+        if chunk:
+            kept.append(chunk)
+    return kept
+
+
+def fit_chunks(chunks: list, max_tokens: int, separator: str = "\n\n---\n\n") -> str:
+    """Joins ranked chunks until the budget is used up; the last one that fits partly is truncated."""
+    parts, used = [], 0
+    separator_tokens = count_tokens(separator)
+    for chunk in chunks:
+        remaining = max_tokens - used - (separator_tokens if parts else 0)
+        if remaining <= 0:
+            break
+        tokens = count_tokens(chunk)
+        if tokens > remaining:
+            parts.append(truncate_to_tokens(chunk, remaining))
+            break
+        parts.append(chunk)
+        used += tokens + (separator_tokens if len(parts) > 1 else 0)
+    return separator.join(parts)
+
+
+def fit_record(record: dict, max_tokens: int, long_field: str) -> dict:
+    """Truncates a record's longest text field so that its JSON form fits in `max_tokens`."""
+    text = record.get(long_field)
+    if not isinstance(text, str) or count_tokens(json.dumps(record, ensure_ascii=False)) <= max_tokens:
+        return record
+    rest_tokens = count_tokens(json.dumps({**record, long_field: ""}, ensure_ascii=False))
+    return {**record, long_field: truncate_to_tokens(text, max(0, max_tokens - rest_tokens))}
+
+
+def record_truncation(tool_name: str, full_tokens: int, budgeted_tokens: int) -> None:
+    metrics.inc("hr_tool_output_truncated_total", tool=tool_name)
+    logger.info(f"Tool '{tool_name}' output budgeted from {full_tokens} to {budgeted_tokens} tokens.")
+
+
+def log_tool_output(tool_name: str, output) -> int:
+    """Logs and records the token count of a tool's output as seen by the agent. Returns the count."""
+    tokens = count_tokens(str(output))
+    metrics.observe("hr_tool_output_tokens", tokens, tool=tool_name)
+    logger.info(f"Tool '{tool_name}' returned {tokens} tokens to the agent.")
+    return tokens
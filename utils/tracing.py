@@ -0,0 +1,238 @@
+# utils/tracing.py
+import contextvars
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import settings
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_stage_seconds", "Latency of one stage of a chat turn (llm, tool, retrieval, http, ...), by operation.")
+metrics.describe("hr_turn_seconds", "End-to-end latency of a chat turn, by routing tier.")
+metrics.describe("hr_turn_llm_tokens", "Model tokens (prompt + completion) spent on one chat turn.")
+
+# A turn trace collects the spans of one chat turn. It lives in a context variable, so
+# spans opened anywhere below app.py::main (tools, retrieval, HTTP calls, LLM callbacks)
+# attach to it; asyncio tasks and asyncio.to_thread copy the context and keep it.
+# Spans outside a turn (startup, background jobs) still feed the stage histograms.
+
+STAGE_TURN = "turn"
+STAGE_AGENT_STEP = "agent_step"
+STAGE_LLM = "llm"
+STAGE_LLM_QUEUE = "llm_queue"
+STAGE_TOOL = "tool"
+STAGE_RETRIEVAL = "retrieval"
+STAGE_EMBEDDING = "embedding"
+STAGE_HTTP = "http"
+STAGE_CACHE = "cache"
+
+
+class TurnTrace:
+    """The spans of one chat turn, in the order they finished."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = []  # (stage, name, seconds, attrs)
+        self.llm_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, name: str, seconds: float, attrs: dict) -> None:
+        with self._lock:
+            self.spans.append((stage, name, seconds, attrs))
+            self.llm_tokens += attrs.get("tokens", 0) if stage == STAGE_LLM else 0
+
+    def breakdown(self) -> dict:
+        """Returns {stage: (count, total seconds)}. Nested stages overlap (a tool includes its HTTP calls)."""
+        totals = {}
+        with self._lock:
+            for stage, _, seconds, _ in self.spans:
+                count, total = totals.get(stage, (0, 0.0))
+                totals[stage] = (count + 1, total + seconds)
+        return totals
+
+    def summary(self) -> str:
+        parts = [f"total={self.seconds * 1000:.0f}ms"] if self.seconds is not None else []
+        for stage, (count, total) in sorted(self.breakdown().items(), key=lambda item: -item[1][1]):
+            parts.append(f"{stage}={total * 1000:.0f}ms/{count}")
+        if self.llm_tokens:
+            parts.append(f"tokens={self.llm_tokens}")
+        return " ".join(parts)
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("hr_turn_trace", default=None)
+
+
+def current_trace() -> TurnTrace | None:
+    return _current_trace.get()
+
+
+def record_span(stage: str, name: str, seconds: float, **attrs) -> None:
+    """Records a finished span: observes the stage histogram and adds it to the current turn."""
+    metrics.observe("hr_stage_seconds", seconds, stage=stage, operation=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, name, seconds, attrs)
+
+
+@contextmanager
+def span(stage: str, name: str | None = None, **attrs):
+    """Times the enclosed block as one span; also usable around awaits."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        attrs["error"] = True
+        raise
+    finally:
+        record_span(stage, name or stage, time.perf_counter() - started, **attrs)
+
+
+def traced(stage: str, name: str | None = None):
+    """Decorator that wraps every call of a sync or async function in a span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def turn_trace(name: str, **attrs):
+    """Collects the spans of one chat turn and logs its latency breakdown when it ends."""
+    trace = TurnTrace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.seconds = time.perf_counter() - trace.started
+        tier = trace.attrs.get("tier", "unknown")
+        metrics.observe("hr_turn_seconds", trace.seconds, tier=tier)
+        if trace.llm_tokens:
+            metrics.observe("hr_turn_llm_tokens", trace.llm_tokens, tier=tier)
+        context = " ".join(f"{key}={value}" for key, value in trace.attrs.items())
+        logger.info(f"Turn latency breakdown ({name} {context}): {trace.summary()}")
+
+
+# --- LangChain Integration ---
+
+def llm_response_tokens(response) -> int:
+    """Total tokens a model call reported, from llm_output or the messages' usage metadata."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if "total_tokens" in usage:
+        return usage["total_tokens"]
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            total += metadata.get("total_tokens", 0)
+    return total
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain run events into spans: one per model call (with its token usage)
+    and one per tool call. Pass it in the run config of the agent executor.
+    """
+
+    # Called directly in the caller's context rather than in a worker thread, so the
+    # timings are not skewed and the current turn trace is visible.
+    run_inline = True
+
+    def __init__(self):
+        self._runs = {}  # run_id -> (stage, name, started, trace)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, stage: str, name: str) -> None:
+        with self._lock:
+            self._runs[run_id] = (stage, name, time.perf_counter(), _current_trace.get())
+
+    def _end(self, run_id, **attrs) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        stage, name, started, trace = run
+        seconds = time.perf_counter() - started
+        metrics.observe("hr_stage_seconds", seconds, stage=stage, operation=name)
+        if trace is not None:
+            trace.add(stage, name, seconds, attrs)
+
+    @staticmethod
+    def _model_name(serialized: dict, kwargs: dict) -> str:
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model") or params.get("model_name") or (serialized or {}).get("name") or STAGE_LLM
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id, STAGE_LLM, self._model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id, STAGE_LLM, self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._end(run_id, tokens=llm_response_tokens(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id, STAGE_TOOL, (serialized or {}).get("name") or kwargs.get("name") or STAGE_TOOL)
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+
+def sample_agent_trace() -> bool:
+    """Decides whether this turn's full agent trace is logged (see AGENT_TRACE_SAMPLE_RATE)."""
+    return random.random() < settings.AGENT_TRACE_SAMPLE_RATE
+
+
+class AgentTraceLogger(BaseCallbackHandler):
+    """
+    Logs the prompts, model outputs and tool calls of a sampled turn, as structured
+    records instead of verbose=True console output. The log formatter bounds field sizes.
+    """
+
+    run_inline = True
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        prompt = "\n".join(f"{message.type}: {message.content}" for batch in messages for message in batch)
+        logger.info("Agent trace: model call", extra={"trace_event": "llm_start", "prompt": prompt})
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                output = generation.text or str(getattr(message, "tool_calls", ""))
+                logger.info("Agent trace: model output", extra={"trace_event": "llm_end", "output": output})
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        tool = (serialized or {}).get("name") or kwargs.get("name")
+        logger.info(f"Agent trace: calling {tool}", extra={"trace_event": "tool_start", "tool": tool, "tool_input": input_str})
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        logger.info("Agent trace: tool output", extra={"trace_event": "tool_end", "output": str(output)})
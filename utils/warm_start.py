@@ -0,0 +1,277 @@
+# utils/warm_start.py
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from config import settings
+from utils import metrics
+from utils.embeddings import embedding_model_name
+from utils.index_version import current_index_version, read_index_version
+from utils.speculative_retrieval import query_similarity
+from utils.text_normalizer import normalize_key
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("hr_warm_start_entries", "Questions loaded from the warm-start snapshot, by cache.")
+metrics.describe("hr_warm_start_context_hits_total", "Knowledge-base tool calls answered from the warm-start snapshot.")
+
+# A restart empties the answer cache, so the first candidates of the day pay full latency
+# for the same popular questions. This module is both the batch job that prepares for
+# that and the loader that runs during warmup:
+#   1. mine the JSON logs (KB_QUESTION_FIELD lines) and the Feedbacks table for the most
+#      frequent knowledge-base questions, and the answers users rated good;
+#   2. embed them in one request and retrieve their context, and save it all, with the
+#      embedding model and index version, to WARM_START_SNAPSHOT_PATH;
+#   3. at startup, add the approved answers to the answer cache and keep the contexts
+#      for the knowledge-base tool. A snapshot of another model or index is ignored.
+
+# Logged by app.py for every turn answered from the knowledge base alone.
+KB_QUESTION_FIELD = "kb_question"
+GOOD_RATING = "خوب"
+# Logged once per chat turn by utils/tracing.py; counts all traffic for the hit-rate report.
+_TURN_LOG_PREFIX = "Turn latency breakdown (chat_turn"
+
+_warm_contexts = []  # (question, context) pairs of the loaded snapshot
+_warm_index_version = None
+
+
+def question_key(text: str) -> str:
+    # Same normalization as the answer cache, so a snapshot key is a cache key.
+    return normalize_key(text)
+
+
+# --- Mining ---
+
+def read_log_questions(paths: list) -> tuple:
+    """
+    Reads JSON log files. Returns the knowledge-base questions as (day, question) pairs
+    and the number of chat turns per day. Lines that are not JSON log records are skipped.
+    """
+    questions, turns = [], Counter()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                day = str(entry.get("timestamp", ""))[:10]
+                if entry.get(KB_QUESTION_FIELD):
+                    questions.append((day, entry[KB_QUESTION_FIELD]))
+                elif str(entry.get("message", "")).startswith(_TURN_LOG_PREFIX):
+                    turns[day] += 1
+    return questions, turns
+
+
+def fetch_feedback() -> list:
+    """Every feedback record (internal field names): User, Query, Response, Rating."""
+    from tools.nocodb_tools import fetch_all_records
+    from utils.record_codec import get_codec
+    return get_codec("Feedbacks").decode_many_dicts(fetch_all_records("Feedbacks"))
+
+
+def _is_knowledge_question(question: str) -> bool:
+    """Questions the router sends to the knowledge base only; others may have personal answers."""
+    from utils.router import route_message
+    return route_message(question).intent == "knowledge"
+
+
+def select_questions(log_questions: list, feedback: list, max_questions: int = None, min_count: int = None) -> list:
+    """
+    Ranks questions by how often they were asked plus how often their answer was rated
+    good. Questions rated bad more often than good are left out, and an answer is only
+    approved for questions known to be answered from the knowledge base alone (logged
+    as such, or routed to it). Returns dicts of question, key, count, answer (or None).
+    """
+    max_questions = max_questions or settings.WARM_START_MAX_QUESTIONS
+    min_count = min_count or settings.WARM_START_MIN_COUNT
+    asked, forms = Counter(), defaultdict(Counter)
+    for question in log_questions:
+        key = question_key(question)
+        if key:
+            asked[key] += 1
+            forms[key][question.strip()] += 1
+    good, bad, good_answers = Counter(), Counter(), defaultdict(Counter)
+    for record in feedback:
+        key = question_key(record.get("Query") or "")
+        if not key or not record.get("Response"):
+            continue
+        forms[key][record["Query"].strip()] += 1
+        if record.get("Rating") == GOOD_RATING:
+            good[key] += 1
+            good_answers[key][record["Response"]] += 1
+        else:
+            bad[key] += 1
+
+    selected = []
+    for key in set(asked) | set(good):
+        if bad[key] > good[key] or asked[key] + good[key] < min_count:
+            continue
+        question = forms[key].most_common(1)[0][0]
+        if key not in asked and not _is_knowledge_question(question):
+            continue
+        answer = good_answers[key].most_common(1)[0][0] if good[key] else None
+        selected.append({"question": question, "key": key, "count": asked[key] + good[key], "answer": answer})
+    selected.sort(key=lambda entry: (-entry["count"], entry["key"]))
+    return selected[:max_questions]
+
+
+def embed_questions(questions: list, embeddings=None) -> np.ndarray:
+    """Unit embeddings of the normalized questions, in one request."""
+    if embeddings is None:
+        from tools.rag_tool import get_embedding_function
+        embeddings = get_embedding_function()
+    matrix = np.asarray(embeddings.embed_documents([question_key(q) for q in questions]), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def projected_hit_rate(snapshot_entries: list, snapshot_matrix: np.ndarray, question_matrix: np.ndarray,
+                       threshold: float = None) -> float:
+    """Share of the questions the answer cache would answer from the snapshot's approved answers."""
+    threshold = threshold if threshold is not None else settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+    answered = [i for i, entry in enumerate(snapshot_entries) if entry["answer"]]
+    if not answered or not len(question_matrix):
+        return 0.0
+    similarities = question_matrix @ snapshot_matrix[answered].T
+    return float(np.mean(similarities.max(axis=1) >= threshold))
+
+
+# --- Snapshot ---
+
+def build_snapshot(entries: list, path: str = None, embeddings=None) -> int:
+    """Embeds the questions, retrieves their context and saves the snapshot. Returns the entry count."""
+    from tools.rag_tool import retrieve_context
+    path = path or settings.WARM_START_SNAPSHOT_PATH
+    matrix = embed_questions([entry["question"] for entry in entries], embeddings) if entries else \
+        np.zeros((0, 0), dtype=np.float32)
+    entries = [{**entry, "context": retrieve_context(entry["question"])} for entry in entries]
+    meta = json.dumps({
+        "embedding_model": embedding_model_name(),
+        "index_version": read_index_version(),
+        "entries": entries,
+    }, ensure_ascii=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, matrix=matrix, meta=np.array(meta))
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def load_snapshot(path: str = None) -> int:
+    """
+    Loads the snapshot into the answer cache and the knowledge-base tool. Returns the
+    number of questions loaded (0 without a usable snapshot).
+    """
+    global _warm_contexts, _warm_index_version
+    path = path or settings.WARM_START_SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return 0
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        matrix = data["matrix"]
+    index_version = read_index_version()
+    if index_version is None:
+        logger.info(f"Not loading warm-start snapshot {path}: no index is served yet.")
+        return 0
+    if meta["embedding_model"] != embedding_model_name() or meta["index_version"] != index_version:
+        logger.info(f"Ignoring warm-start snapshot {path}: it was built for another embedding model or index.")
+        return 0
+
+    entries = meta["entries"]
+    answers = 0
+    if settings.ANSWER_CACHE_ENABLED:
+        from utils.answer_cache import get_answer_cache
+        answer_cache = get_answer_cache()
+        for entry, vector in zip(entries, matrix):
+            if entry["answer"]:
+                answer_cache.add(entry["question"], entry["answer"], vector)
+                answers += 1
+    _warm_contexts = [(entry["question"], entry["context"]) for entry in entries if entry.get("context")]
+    _warm_index_version = meta["index_version"]
+    metrics.set_gauge("hr_warm_start_entries", answers, cache="answers")
+    metrics.set_gauge("hr_warm_start_entries", len(_warm_contexts), cache="contexts")
+    logger.info(f"Loaded warm-start snapshot: {answers} approved answers, {len(_warm_contexts)} retrieval contexts.")
+    return len(entries)
+
+
+def warm_context(query: str) -> str | None:
+    """The snapshot's retrieved context for a knowledge-base query close enough to a snapshot question."""
+    if not _warm_contexts or _warm_index_version != current_index_version():
+        return None
+    best_score, best_context = 0.0, None
+    for question, context in _warm_contexts:
+        score = query_similarity(query, question)
+        if score > best_score:
+            best_score, best_context = score, context
+    if best_score < settings.WARM_START_QUERY_MATCH_THRESHOLD:
+        return None
+    metrics.inc("hr_warm_start_context_hits_total")
+    return best_context
+
+
+# --- Batch Job ---
+
+def _report(log_questions: list, turns: Counter, feedback: list, embeddings=None) -> None:
+    """Builds a snapshot from every day but the last and replays the last day against it."""
+    days = sorted({day for day, _ in log_questions})
+    if len(days) < 2:
+        print("Projected hit rate: needs logs of at least two days (one to build from, one to replay).")
+        return
+    last_day = days[-1]
+    history = [question for day, question in log_questions if day != last_day]
+    replay = [question for day, question in log_questions if day == last_day]
+    entries = select_questions(history, feedback)
+    if not entries:
+        print(f"Projected hit rate for {last_day}: 0% (no question qualified from the earlier days).")
+        return
+    matrix = embed_questions([entry["question"] for entry in entries] + replay, embeddings)
+    rate = projected_hit_rate(entries, matrix[:len(entries)], matrix[len(entries):])
+    hits = round(rate * len(replay))
+    # The question stands in for the agent's tool query, which is usually a shortened form of it.
+    context_hits = sum(
+        1 for question in replay
+        if max(query_similarity(question, entry["question"]) for entry in entries)
+        >= settings.WARM_START_QUERY_MATCH_THRESHOLD
+    )
+    print(f"Projected hit rates for {last_day} (snapshot built from {len(days) - 1} earlier days):")
+    print(f"  answer cache:      {rate:.1%} of {len(replay)} knowledge-base questions")
+    if turns.get(last_day):
+        print(f"                     {hits / turns[last_day]:.1%} of {turns[last_day]} chat turns")
+    print(f"  retrieval context: {context_hits / len(replay):.1%} of {len(replay)} knowledge-base questions")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the warm-start snapshot from the feedback table and the app's JSON logs."
+    )
+    parser.add_argument("--logs", nargs="*", default=[], help="JSON log files of the app")
+    parser.add_argument("--no-feedback", action="store_true", help="do not read the Feedbacks table")
+    parser.add_argument("--output", help=f"snapshot path (default: {settings.WARM_START_SNAPSHOT_PATH})")
+    parser.add_argument("--max-questions", type=int, default=settings.WARM_START_MAX_QUESTIONS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    log_questions, turns = read_log_questions(args.logs)
+    feedback = [] if args.no_feedback else fetch_feedback()
+    print(f"Read {len(log_questions)} knowledge-base questions from the logs and {len(feedback)} feedback records.",
+          file=sys.stderr)
+    _report(log_questions, turns, feedback)
+
+    entries = select_questions([question for _, question in log_questions], feedback, args.max_questions)
+    count = build_snapshot(entries, args.output)
+    approved = sum(1 for entry in entries if entry["answer"])
+    print(f"Wrote {count} questions ({approved} with approved answers) to "
+          f"{args.output or settings.WARM_START_SNAPSHOT_PATH}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# utils/warmup.py
+import asyncio
+import logging
+import time
+
+from config import settings
+from utils import embeddings, metrics
+from utils.index_version import index_version_file, read_index_state
+from utils.llm_scheduler import PRIORITY_BACKGROUND, llm_priority
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(metrics.READY_GAUGE, "1 once startup warmup has finished and the worker can take traffic.")
+metrics.describe("hr_warmup_step_seconds", "Duration of each startup warmup step.")
+metrics.describe("hr_warmup_step_failures_total", "Startup warmup steps that failed or timed out.")
+
+# The server starts listening as soon as app.py is imported; everything slow happens
+# here, after that and before the worker reports ready: building the index if it is
+# missing, loading the heavy modules the first turn needs, opening the vector store,
+# connecting to NocoDB and OpenAI and loading the warm-start snapshot into the caches,
+# so the first users do not pay for any of it.
+
+_done = asyncio.Event()
+_ready = False
+
+# A sample question for the first retrieval; it loads the index files and the tokenizer.
+_WARMUP_QUERY = "ساعت کاری شرکت"
+
+
+def index_needs_ingestion() -> bool:
+    """True if no ingestion of the main index has completed, or the last one ran degraded."""
+    # An index is only served (given a version) once its ingestion completes (see ingest.py).
+    state = read_index_state()
+    if state is None:
+        return True
+    # A degraded run publishes the fallback index only, so it has indexed other sources than the main one.
+    fallback = read_index_state(index_version_file(settings.FALLBACK_VECTOR_STORE_PATH))
+    return bool(embeddings.fallback_enabled() and fallback and fallback.get("sources") != state.get("sources"))
+
+
+def ensure_index() -> None:
+    logger.info(f"Checking for vector store at path: '{settings.VECTOR_STORE_PATH}'")
+    if not index_needs_ingestion():
+        logger.info("Vector store directory exists and is complete. Skipping ingestion.")
+        return
+    logger.info("Vector store path does not exist, is empty or incomplete. Running ingestion process.")
+    # Imported here: document parsing (unstructured, spaCy) is slow to import and rarely needed.
+    from ingest import ingest_data
+    ingest_data()
+
+
+def open_knowledge_base() -> None:
+    """Runs one retrieval: opens the vector store (and the fallback index) and warms the embeddings client."""
+    from tools.rag_tool import fallback_index_available, get_fallback_vector_store, search_documents
+    search_documents(_WARMUP_QUERY, k=1)
+    if fallback_index_available():
+        get_fallback_vector_store().similarity_search(_WARMUP_QUERY, k=1)
+
+
+def load_agents() -> None:
+    # The agent stack (langchain.agents and every tool) is imported on first use, not at startup.
+    import agents  # noqa: F401
+
+
+def connect_nocodb() -> None:
+    """Fills the open-jobs cache shown at every login, which also opens the pooled NocoDB connection."""
+    from tools.nocodb_tools import fetch_open_jobs
+    if fetch_open_jobs() is None:
+        raise RuntimeError("NocoDB did not return the open jobs")
+
+
+def load_warm_start() -> None:
+    """Fills the answer cache with the popular questions of the warm-start snapshot, if there is one."""
+    from utils.warm_start import load_snapshot
+    load_snapshot()
+
+
+async def connect_openai() -> None:
+    """Opens the HTTP connection the chat models share, with a request that costs no tokens."""
+    if not settings.OPENAI_API_KEY:
+        return
+    from utils.llm_scheduler import scheduled_chat_model
+    # Creating the client imports langchain_openai; keep that off the event loop.
+    llm = await asyncio.to_thread(scheduled_chat_model, settings.OPENAI_API_MODEL)
+    # with_options shares the client's connection pool; a failed warmup is not worth retrying.
+    await llm.root_async_client.with_options(max_retries=0).models.retrieve(settings.OPENAI_API_MODEL)
+
+
+async def _run_step(name: str, step) -> bool:
+    """Runs one step (a coroutine function, or a blocking function in a thread). Failures are logged."""
+    started = time.monotonic()
+    try:
+        call = step() if asyncio.iscoroutinefunction(step) else asyncio.to_thread(step)
+        await asyncio.wait_for(call, settings.WARMUP_STEP_TIMEOUT_SECONDS)
+        ok = True
+    except Exception as e:
+        # wait_for cannot stop a step running in a thread; it finishes in the background.
+        logger.warning(f"Warmup step '{name}' failed: {type(e).__name__}: {e}")
+        metrics.inc("hr_warmup_step_failures_total", step=name)
+        ok = False
+    metrics.set_gauge("hr_warmup_step_seconds", time.monotonic() - started, step=name)
+    return ok
+
+
+async def run_warmup() -> bool:
+    """
+    Prepares the worker, then marks it ready. Only a failure to build the index keeps it
+    from becoming ready; the other steps are optimizations and are skipped if they fail.
+    """
+    global _ready
+    started = time.monotonic()
+    try:
+        with llm_priority(PRIORITY_BACKGROUND):
+            try:
+                await asyncio.to_thread(ensure_index)
+            except Exception:
+                logger.exception("Could not build the knowledge base index; this worker will not report ready.")
+                return False
+            await asyncio.gather(
+                _run_step("knowledge_base", open_knowledge_base),
+                _run_step("agents", load_agents),
+                _run_step("nocodb", connect_nocodb),
+                _run_step("openai", connect_openai),
+                _run_step("warm_start", load_warm_start),
+            )
+        _ready = True
+        metrics.set_gauge(metrics.READY_GAUGE, 1)
+        logger.info(f"Warmup finished in {time.monotonic() - started:.2f}s; ready for traffic.")
+        return True
+    finally:
+        _done.set()
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+async def wait_until_done() -> None:
+    """Waits for warmup to finish (successfully or not); returns at once afterwards."""
+    await _done.wait()